@@ -0,0 +1,97 @@
+# Bytes per DOM node for the slotted node model against the dict-based one it
+# replaced. Run from the repository root:
+#
+#     python -m benchmarks.dom_memory [--nodes 200000]
+import argparse
+import gc
+import tracemalloc
+from html.parser import HTMLParser
+
+from pyweb_api.DOM import Element, Text, TAG_MAP
+
+
+# the Element layout before __slots__: per-instance __dict__ and eagerly allocated containers
+class DictElement:
+    def __init__(self, tag, attrs=None, parent=None):
+        self.tag = tag
+        self.attrs = attrs or {}
+        self.children = []
+        self.parent = parent
+        self.listeners = {}
+        self._dirty = 0
+        self._document = None
+        self._tk_widget = None
+
+
+def synthetic_page(nodes: int) -> str:
+    parts = ["<div id='page'>"]
+    for i in range(nodes // 4):
+        parts.append(f"<div class='row r{i % 7}'><h3>Heading {i}</h3>"
+                     f"<p style='color: gray'>Paragraph {i} text</p><a href='/item/{i}'>item {i}</a></div>")
+    parts.append("</div>")
+    return "".join(parts)
+
+
+class TreeBuilder(HTMLParser):
+    def __init__(self, make_element, make_text):
+        super().__init__()
+        self.make_element = make_element
+        self.make_text = make_text
+        self.root = make_element("root", None, None)
+        self.current = self.root
+        self.count = 1
+
+    def handle_starttag(self, tag, attrs):
+        el = self.make_element(tag, dict(attrs), self.current)
+        self.current.children.append(el)
+        self.current = el
+        self.count += 1
+
+    def handle_endtag(self, tag):
+        if self.current.parent is not None:
+            self.current = self.current.parent
+
+    def handle_data(self, data):
+        if data.strip():
+            self.current.children.append(self.make_text(data.strip()))
+            self.count += 1
+
+
+def slotted_element(tag, attrs, parent):
+    cls = TAG_MAP.get(tag)
+    return cls(attrs, parent) if cls else Element(tag, attrs, parent)
+
+
+def measure(html: str, make_element, make_text):
+    gc.collect()
+    tracemalloc.start()
+    builder = TreeBuilder(make_element, make_text)
+    builder.feed(html)
+    builder.close()
+    # the parser's own buffers are not part of the tree
+    builder.rawdata = ""
+    gc.collect()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return builder.count, size, peak
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--nodes", type=int, default=200_000)
+    args = arg_parser.parse_args()
+
+    html = synthetic_page(args.nodes)
+    results = {
+        "dict": measure(html, DictElement, str),
+        "slots": measure(html, slotted_element, Text),
+    }
+    print(f"{'model':<8}{'nodes':>10}{'bytes':>14}{'bytes/node':>12}{'peak':>14}")
+    for name, (count, size, peak) in results.items():
+        print(f"{name:<8}{count:>10}{size:>14}{size / count:>12.1f}{peak:>14}")
+    before, after = results["dict"][1], results["slots"][1]
+    print(f"saved {100 * (1 - after / before):.1f}%")
+
+
+if __name__ == "__main__":
+    main()
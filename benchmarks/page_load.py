@@ -0,0 +1,178 @@
+# Page-load benchmark: per-phase timings and peak memory over synthetic pages.
+# Run from the repository root:
+#
+#     python -m benchmarks.page_load [--scale 0.1] [--output results.json]
+#     python -m benchmarks.page_load --tk      # adds the widget phase; starts Xvfb without a display
+#
+# Phases: parse (PyHTMLParser), style (StyleResolver over every element),
+# layout (headless LayoutEngine) and, with --tk, widgets (render_element) and
+# reflow (Reflow.resize over the widths of a window being dragged narrower and back).
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from pyweb_api.DOM import Element
+from pyweb_client.html_parser import PyHTMLParser
+from pyweb_client.headless import HeadlessClient, open_display
+from pyweb_client.reflow import REFLOW_DEFAULT_WIDTH
+
+LAYOUT_WIDTH = 1000
+# a window dragged 100px narrower in 20px steps and let go, from the width pages are rendered at
+RESIZE_WIDTHS = tuple(range(REFLOW_DEFAULT_WIDTH - 20, REFLOW_DEFAULT_WIDTH - 120, -20)) + (REFLOW_DEFAULT_WIDTH,)
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def deep_page(scale: float) -> str:
+    depth = 150
+    parts = []
+    for i in range(max(1, int(200 * scale))):
+        parts.append("<div style='padding: 1px'>" * depth + f"<p>leaf {i}</p>" + "</div>" * depth)
+    return "<html><body>" + "".join(parts) + "</body></html>"
+
+
+def paragraphs_page(scale: float) -> str:
+    rng = random.Random(1)
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit"]
+    parts = [f"<p>{' '.join(rng.choice(words) for _ in range(rng.randint(5, 40)))}</p>"
+             for _ in range(max(1, int(100_000 * scale)))]
+    return "<html><body><div>" + "".join(parts) + "</div></body></html>"
+
+
+def images_page(scale: float) -> str:
+    parts = [f"<div><img src='/img/{i}.png' width='{40 + i % 60}' height='{30 + i % 40}'><p>caption {i}</p></div>"
+             for i in range(max(1, int(5_000 * scale)))]
+    return "<html><body>" + "".join(parts) + "</body></html>"
+
+
+def styles_page(scale: float) -> str:
+    rules = []
+    for i in range(500):
+        rules.append(f".c{i} {{ color: #{i * 37 % 0xffffff:06x}; padding: {i % 9}px }}")
+        rules.append(f"#e{i} {{ background-color: #eef; margin: {i % 7}px }}")
+        rules.append(f"div.c{i} > p {{ font-size: {10 + i % 10}px }}")
+    parts = [f"<div id='e{i % 500}' class='c{i % 500} c{(i * 7) % 500}'><p style='font-weight: bold'>styled {i}</p></div>"
+             for i in range(max(1, int(20_000 * scale)))]
+    return "<html><head><style>" + "\n".join(rules) + "</style></head><body>" + "".join(parts) + "</body></html>"
+
+
+def test_html_page(scale: float) -> str:
+    with open(os.path.join(REPO_ROOT, "test", "test.html"), encoding="utf-8") as f:
+        source = f.read()
+    body = source[source.index("<body>") + len("<body>"):source.index("</body>")]
+    return source.replace(body, body * max(1, int(500 * scale)))
+
+
+PAGES = {
+    "deep": deep_page,
+    "paragraphs": paragraphs_page,
+    "images": images_page,
+    "styles": styles_page,
+    "test_html": test_html_page,
+}
+
+
+def iter_elements(root: Element):
+    stack = [root]
+    while stack:
+        el = stack.pop()
+        yield el
+        stack.extend(c for c in el.children if isinstance(c, Element))
+
+
+def run_phases(html: str, tk_root=None) -> dict:
+    # returns phase -> seconds, in load order; each phase works on the previous one's result
+    timings = {}
+    start = time.perf_counter()
+    parser = PyHTMLParser()
+    parser.feed(html)
+    parser.close()
+    timings["parse"] = time.perf_counter() - start
+
+    cl = HeadlessClient(tk_root, parser.stylesheet)
+    start = time.perf_counter()
+    for el in iter_elements(parser.root):
+        cl.styles.tk_style(el)
+    timings["style"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cl.layout(parser.root, LAYOUT_WIDTH)
+    timings["layout"] = time.perf_counter() - start
+
+    if tk_root is not None:
+        start = time.perf_counter()
+        frame = cl.render(parser.root)
+        timings["widgets"] = time.perf_counter() - start
+        start = time.perf_counter()
+        for width in RESIZE_WIDTHS:
+            cl.reflow.resize(width)
+            frame.update_idletasks()
+        timings["reflow"] = time.perf_counter() - start
+        frame.destroy()
+    return timings
+
+
+def peak_memory(html: str, tk_root=None) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run_phases(html, tk_root)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--scale", type=float, default=1.0, help="multiplies the size of every page")
+    arg_parser.add_argument("--pages", nargs="*", choices=sorted(PAGES), default=list(PAGES))
+    arg_parser.add_argument("--repeat", type=int, default=3, help="timings are the best of this many runs")
+    arg_parser.add_argument("--tk", action="store_true", help="also time widget creation (needs a display)")
+    arg_parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    arg_parser.add_argument("--output", help="write the results to this JSON file")
+    args = arg_parser.parse_args()
+
+    tk_root = open_display() if args.tk else None
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10_000))
+    results = {
+        "meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "revision": git_revision(),
+                 "python": platform.python_version(), "platform": platform.platform(), "scale": args.scale,
+                 "repeat": args.repeat, "tk": args.tk},
+        "pages": {},
+    }
+    for name in args.pages:
+        html = PAGES[name](args.scale)
+        best = {}
+        for _ in range(args.repeat):
+            for phase, seconds in run_phases(html, tk_root).items():
+                best[phase] = min(seconds, best.get(phase, seconds))
+        page = {"bytes": len(html.encode("utf-8")), "seconds": best, "total_seconds": sum(best.values())}
+        if not args.no_memory:
+            page["peak_memory_bytes"] = peak_memory(html, tk_root)
+        results["pages"][name] = page
+
+        phases = "  ".join(f"{phase} {seconds * 1000:8.1f}ms" for phase, seconds in best.items())
+        memory = f"  peak {page['peak_memory_bytes'] / 2 ** 20:7.1f}MiB" if "peak_memory_bytes" in page else ""
+        print(f"{name:<12}{page['bytes'] / 2 ** 20:7.2f}MiB  {phases}{memory}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
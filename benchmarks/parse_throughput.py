@@ -0,0 +1,123 @@
+# Parse throughput of PyHTMLParser over a corpus of generated pages, next to a
+# plain html.parser.HTMLParser tree builder. Run from the repository root:
+#
+#     python -m benchmarks.parse_throughput [--size-mb 4] [--chunk 65536] [--repeat 3]
+import argparse
+import gc
+import random
+import time
+
+from pyweb_api.DOM import Element
+from pyweb_client.html_parser import PyHTMLParser
+from benchmarks.dom_memory import TreeBuilder
+
+
+def article_page(size: int, rng: random.Random) -> str:
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "&amp;", "consectetur", "adipiscing", "elit"]
+    parts = ["<!DOCTYPE html><html><head><meta charset='utf-8'><title>Article</title>"
+             "<style>.note { color: gray }</style></head><body>"]
+    length = 0
+    i = 0
+    while length < size:
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(10, 60)))
+        chunk = (f"<h2 id='s{i}'>Section {i}</h2><p class='lead'>{text}<br>{text}"
+                 f"<p>{text} <a href='/s/{i}'>more</a><img src='/i/{i}.png' width='40' height='30'>")
+        parts.append(chunk)
+        length += len(chunk)
+        i += 1
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def table_page(size: int, rng: random.Random) -> str:
+    parts = ["<html><body><table>"]
+    length = 0
+    while length < size:
+        row = "<tr>" + "".join(f"<td class='c{j}'>{rng.randint(0, 10 ** 6)}" for j in range(8))
+        parts.append(row)
+        length += len(row)
+    parts.append("</table></body></html>")
+    return "".join(parts)
+
+
+def nested_page(size: int, rng: random.Random) -> str:
+    parts = ["<html><body>"]
+    length = 0
+    while length < size:
+        depth = rng.randint(2, 12)
+        block = ("<div style='padding: 2px'>" * depth + "<span>leaf</span><input type='text' value='x'>"
+                 + "<!-- comment -->" + "</div>" * depth)
+        parts.append(block)
+        length += len(block)
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+CORPUS = {"article": article_page, "table": table_page, "nested": nested_page}
+
+
+def count_nodes(root) -> int:
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if not isinstance(node, str):
+            stack.extend(node.children)
+    return count
+
+
+def parse_fast(data: bytes, chunk: int):
+    parser = PyHTMLParser()
+    for i in range(0, len(data), chunk):
+        parser.feed(data[i:i + chunk])
+    parser.close()
+    return parser.root
+
+
+def parse_stdlib(data: bytes, chunk: int):
+    # the HTMLParser callback approach the tree builder replaced, with the same element classes
+    builder = TreeBuilder(lambda tag, attrs, parent: Element(tag, attrs, parent), str)
+    text = data.decode("utf-8")
+    for i in range(0, len(text), chunk):
+        builder.feed(text[i:i + chunk])
+    builder.close()
+    return builder.root
+
+
+def bench(parse, data: bytes, chunk: int, repeat: int):
+    best = None
+    nodes = 0
+    for _ in range(repeat):
+        # the previous tree is dropped first, so it does not weigh on this run's garbage collections
+        gc.collect()
+        start = time.perf_counter()
+        root = parse(data, chunk)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        nodes = count_nodes(root)
+        root = None
+    return best, nodes
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--size-mb", type=float, default=4)
+    arg_parser.add_argument("--chunk", type=int, default=64 * 1024)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--seed", type=int, default=1)
+    args = arg_parser.parse_args()
+
+    size = int(args.size_mb * 1024 * 1024)
+    print(f"{'page':<10}{'parser':<9}{'MB':>7}{'nodes':>10}{'seconds':>10}{'MB/s':>9}{'nodes/s':>12}")
+    for name, generate in CORPUS.items():
+        data = generate(size, random.Random(args.seed)).encode("utf-8")
+        megabytes = len(data) / (1024 * 1024)
+        for parser_name, parse in (("fast", parse_fast), ("stdlib", parse_stdlib)):
+            seconds, nodes = bench(parse, data, args.chunk, args.repeat)
+            print(f"{name:<10}{parser_name:<9}{megabytes:>7.2f}{nodes:>10}{seconds:>10.3f}"
+                  f"{megabytes / seconds:>9.2f}{nodes / seconds:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
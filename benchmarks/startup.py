@@ -0,0 +1,100 @@
+# Cold-start budget for the client, checked with `python -X importtime`; test/test_startup.py
+# runs the same check with the tests. Run from the repository root; exits with status 1
+# when over budget and prints where the time goes:
+#
+#     python -m benchmarks.startup [--budget-ms 120] [--runs 5]
+#     xvfb-run -a python -m benchmarks.startup --tk     # adds time to first frame
+#
+# Import time is the median over fresh interpreters of the cumulative time
+# `-X importtime` reports for pyweb_client.main. Modules in DEFERRED_MODULES
+# must not be imported at startup at all: they are loaded on first use.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_MODULE = "pyweb_client.main"
+IMPORT_BUDGET_MS = 120.0
+FIRST_FRAME_BUDGET_MS = 600.0
+DEFERRED_MODULES = ("requests", "urllib3", "PIL", "PIL.Image", "PIL.ImageTk", "email.utils")
+
+FIRST_FRAME_SCRIPT = """
+import time
+started = time.perf_counter()
+import tkinter as tk
+from pyweb_client.main import PyWebClient
+root = tk.Tk()
+client = PyWebClient(root=root)
+client.tab.location.navigate("app://home")
+root.update()
+print((time.perf_counter() - started) * 1000)
+root.destroy()
+"""
+
+
+def import_times(module: str = ENTRY_MODULE) -> dict:
+    # module -> cumulative import time in ms, from a fresh interpreter
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=REPO_ROOT,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        try:
+            times[name.strip()] = int(cumulative) / 1000
+        except ValueError:
+            continue  # the header line
+    return times
+
+
+def first_frame_ms() -> float:
+    result = subprocess.run([sys.executable, "-c", FIRST_FRAME_SCRIPT], cwd=REPO_ROOT, capture_output=True,
+                            text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    arg_parser.add_argument("--runs", type=int, default=5, help="the median of this many interpreters is used")
+    arg_parser.add_argument("--tk", action="store_true", help="also time the first frame (needs a display)")
+    arg_parser.add_argument("--frame-budget-ms", type=float, default=FIRST_FRAME_BUDGET_MS)
+    arg_parser.add_argument("--output", help="write the results to this JSON file")
+    args = arg_parser.parse_args()
+
+    runs = [import_times() for _ in range(args.runs)]
+    import_ms = statistics.median(times[ENTRY_MODULE] for times in runs)
+    deferred = sorted(name for name in DEFERRED_MODULES if name in runs[0])
+    slowest = sorted(((ms, name) for name, ms in runs[0].items() if name.startswith("pyweb")), reverse=True)[:8]
+
+    failures = []
+    print(f"import {ENTRY_MODULE}: {import_ms:.1f}ms (budget {args.budget_ms:.0f}ms)")
+    for ms, name in slowest:
+        print(f"  {name:<32}{ms:8.1f}ms")
+    if import_ms > args.budget_ms:
+        failures.append(f"import time {import_ms:.1f}ms is over the {args.budget_ms:.0f}ms budget")
+    if deferred:
+        failures.append(f"imported at startup, should be lazy: {', '.join(deferred)}")
+
+    results = {"import_ms": import_ms, "budget_ms": args.budget_ms, "eager_deferred_modules": deferred}
+    if args.tk:
+        frame_ms = statistics.median(first_frame_ms() for _ in range(args.runs))
+        print(f"first frame: {frame_ms:.1f}ms (budget {args.frame_budget_ms:.0f}ms)")
+        results["first_frame_ms"] = frame_ms
+        if frame_ms > args.frame_budget_ms:
+            failures.append(f"first frame {frame_ms:.1f}ms is over the {args.frame_budget_ms:.0f}ms budget")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import re
+from functools import lru_cache
+from typing import List, Dict, Tuple, FrozenSet, Iterable
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pyweb_api.DOM import Element
+
+_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_COMPOUND_RE = re.compile(r"([#.]?)([\w-]+|\*)")
+
+
+@lru_cache(maxsize=8192)
+def parse_declarations(text: str) -> Dict[str, str]:
+    # interned per unique declaration block - callers must not mutate the result
+    declarations = {}
+    for rule in text.split(";"):
+        if ":" in rule:
+            key, value = rule.split(":", 1)
+            declarations[key.strip()] = value.strip()
+    return declarations
+
+
+def class_names(element: 'Element') -> FrozenSet[str]:
+    return _split_classes(element.get_attribute("class") or "")
+
+
+@lru_cache(maxsize=4096)
+def _split_classes(value: str) -> FrozenSet[str]:
+    return frozenset(value.split())
+
+
+class Compound:
+    def __init__(self, text: str):
+        self.tag = None
+        self.id = None
+        classes = []
+        parts = _COMPOUND_RE.findall(text)
+        # attribute selectors, pseudo-classes and the + and ~ combinators are not supported
+        if not parts or "".join(prefix + name for prefix, name in parts) != text:
+            raise ValueError(f"unsupported selector: {text!r}")
+        for prefix, name in parts:
+            if prefix == "#":
+                self.id = name
+            elif prefix == ".":
+                classes.append(name)
+            elif name != "*":
+                self.tag = name.lower()
+        self.classes = frozenset(classes)
+
+    @property
+    def specificity(self) -> Tuple[int, int, int]:
+        return int(self.id is not None), len(self.classes), int(self.tag is not None)
+
+    def matches(self, element: 'Element') -> bool:
+        if self.tag is not None and element.tag != self.tag:
+            return False
+        if self.id is not None and element.id != self.id:
+            return False
+        return not self.classes or self.classes <= class_names(element)
+
+
+class Selector:
+    def __init__(self, text: str):
+        self.text = text.strip()
+        # compounds right to left, each with the combinator that links it to the next one
+        self.parts: List[Tuple[Compound, str]] = []
+        combinator = ""
+        for token in reversed(self.text.replace(">", " > ").split()):
+            if token == ">":
+                if not self.parts or combinator:
+                    raise ValueError(f"unsupported selector: {self.text!r}")
+                combinator = ">"
+                continue
+            if self.parts:
+                self.parts[-1] = (self.parts[-1][0], combinator or " ")
+            self.parts.append((Compound(token), ""))
+            combinator = ""
+        if combinator:
+            raise ValueError(f"unsupported selector: {self.text!r}")
+        ids, classes, tags = zip(*(c.specificity for c, _ in self.parts)) if self.parts else ((0,), (0,), (0,))
+        self.specificity = (sum(ids), sum(classes), sum(tags))
+
+    @property
+    def key(self) -> Compound:
+        return self.parts[0][0]
+
+    def matches(self, element: 'Element') -> bool:
+        if not self.parts:
+            return False
+        return self._matches_from(0, element)
+
+    def _matches_from(self, index: int, element: 'Element') -> bool:
+        compound, combinator = self.parts[index]
+        if not compound.matches(element):
+            return False
+        if not combinator:
+            return True
+        ancestor = element.parent
+        while ancestor is not None:
+            if self._matches_from(index + 1, ancestor):
+                return True
+            if combinator == ">":
+                return False
+            ancestor = ancestor.parent
+        return False
+
+    def __repr__(self):
+        return f"<Selector {self.text}>"
+
+
+class Rule:
+    def __init__(self, selector: Selector, declarations: Dict[str, str], order: int):
+        self.selector = selector
+        self.declarations = declarations
+        self.order = order
+        self.sort_key = (selector.specificity, order)
+
+
+def parse_selectors(text: str) -> List[Selector]:
+    return [Selector(part) for part in text.split(",") if part.strip()]
+
+
+class StyleSheet:
+    def __init__(self, css_text: str = ""):
+        # rules bucketed by the rightmost compound, so an element only checks rules that can match it
+        self._by_id: Dict[str, List[Rule]] = {}
+        self._by_class: Dict[str, List[Rule]] = {}
+        self._by_tag: Dict[str, List[Rule]] = {}
+        self._universal: List[Rule] = []
+        self._count = 0
+        if css_text:
+            self.add(css_text)
+
+    def __len__(self):
+        return self._count
+
+    def add(self, css_text: str):
+        css_text = _COMMENT_RE.sub("", css_text)
+        for block in css_text.split("}"):
+            if "{" not in block:
+                continue
+            selector_text, body = block.split("{", 1)
+            try:
+                selectors = parse_selectors(selector_text)
+            except ValueError:
+                continue  # as in CSS, one selector that cannot be matched drops the whole rule
+            declarations = parse_declarations(body.strip())
+            for selector in selectors:
+                self._add_rule(Rule(selector, declarations, self._count))
+                self._count += 1
+
+    def _add_rule(self, rule: Rule):
+        key = rule.selector.key
+        if key.id is not None:
+            self._by_id.setdefault(key.id, []).append(rule)
+        elif key.classes:
+            self._by_class.setdefault(min(key.classes), []).append(rule)
+        elif key.tag is not None:
+            self._by_tag.setdefault(key.tag, []).append(rule)
+        else:
+            self._universal.append(rule)
+
+    def candidate_rules(self, element: 'Element') -> Iterable[Rule]:
+        element_id = element.id
+        if element_id is not None:
+            yield from self._by_id.get(element_id, ())
+        for name in class_names(element):
+            yield from self._by_class.get(name, ())
+        yield from self._by_tag.get(element.tag, ())
+        yield from self._universal
+
+    def match(self, element: 'Element') -> Dict[str, str]:
+        matched = [rule for rule in self.candidate_rules(element) if rule.selector.matches(element)]
+        style = {}
+        for rule in sorted(matched, key=lambda r: r.sort_key):
+            style.update(rule.declarations)
+        return style
@@ -1,4 +1,26 @@
-from typing import List, Dict, Optional
+import sys
+from types import MappingProxyType
+from typing import List, Dict, Optional, Callable, Mapping
+
+from pyweb_api.CSS import parse_declarations
+
+DIRTY_CHILDREN = 1
+DIRTY_TEXT = 2
+DIRTY_ATTRS = 4
+
+# shared by every element that has no attributes / listeners yet; writes go
+# through set_attribute / add_event_listener, which allocate the real dict
+_NO_ATTRS: Mapping[str, str] = MappingProxyType({})
+_NO_LISTENERS: Mapping[tuple, list] = MappingProxyType({})
+
+_mutation_observer: Callable[['Element'], None] | None = None
+
+
+def set_mutation_observer(observer: Callable[['Element'], None] | None):
+    # observer is told once per element when it goes from clean to dirty
+    global _mutation_observer
+    _mutation_observer = observer
+
 
 class Event:
     def __init__(self, type_, target):
@@ -6,84 +28,251 @@ class Event:
         self.target = target
         self.current_target = None
         self._stopped = False
+        self._default_prevented = False
 
     def stop_propagation(self):
         self._stopped = True
 
+    def prevent_default(self):
+        self._default_prevented = True
+
+    @property
+    def default_prevented(self) -> bool:
+        return self._default_prevented
+
+
+# Text children stay plain strings to everything that walks children
+# (isinstance(c, str)), this only gives them a type of their own.
+class Text(str):
+    __slots__ = ()
+
+    @property
+    def data(self) -> str:
+        return str(self)
+
+    def __repr__(self):
+        return f"<#text {str.__repr__(self)}>"
+
+
+def intern_attrs(attrs: Dict[str, str]) -> Dict[str, str]:
+    return {sys.intern(k): v for k, v in attrs.items()}
 
 
 class Element:
+    __slots__ = ("tag", "_attrs", "children", "parent", "_listeners", "_dirty", "_document", "_tk_widget",
+                 "_path_cache")
+
     def __init__(self,
                  tag: str,
                  attrs: Optional[Dict[str, str]] = None,
                  parent=None,
                  _id: str | None = None):
-        self.tag = tag
-        self.id = _id
-        self.attrs = attrs or {}
+        self.tag = sys.intern(tag)
+        self._attrs: Dict[str, str] | None = intern_attrs(attrs) if attrs else None
         self.children: List[Element | str] = []
         self.parent = parent
-        self.listeners = {}
+        self._listeners: Dict[tuple, list] | None = None
+        self._dirty = 0
+        # the Document whose indexes include this element, if any
+        self._document = None
+        self._tk_widget = None
+        # (document, its structure and listener versions, ancestors, listener keys on the path)
+        self._path_cache = None
+        if _id is not None:
+            self.set_attribute("id", _id)
+
+    @property
+    def attrs(self) -> Mapping[str, str]:
+        # read-only: changes go through set_attribute / remove_attribute, which keep the
+        # Document indexes and the dirty flags up to date
+        return MappingProxyType(self._attrs) if self._attrs is not None else _NO_ATTRS
+
+    @attrs.setter
+    def attrs(self, value: Dict[str, str]):
+        value = value or {}
+        for name in [name for name in self.attrs if name not in value]:
+            self.remove_attribute(name)
+        for name, item in value.items():
+            self.set_attribute(name, item)
+
+    @property
+    def listeners(self) -> Mapping[tuple, list]:
+        return self._listeners if self._listeners is not None else _NO_LISTENERS
+
+    @property
+    def id(self) -> str | None:
+        return (self._attrs or _NO_ATTRS).get("id")
+
+    @id.setter
+    def id(self, value: str | None):
+        if value is None:
+            self.remove_attribute("id")
+        else:
+            self.set_attribute("id", value)
+
+    @property
+    def class_list(self) -> List[str]:
+        return (self._attrs or _NO_ATTRS).get("class", "").split()
+
+    def add_class(self, name: str):
+        if name not in self.class_list:
+            self.set_attribute("class", " ".join(self.class_list + [name]))
+
+    def remove_class(self, name: str):
+        if name in self.class_list:
+            self.set_attribute("class", " ".join(c for c in self.class_list if c != name))
+
+    def toggle_class(self, name: str) -> bool:
+        if name in self.class_list:
+            self.remove_class(name)
+            return False
+        self.add_class(name)
+        return True
 
     def append_child(self, child: 'Element | str'):
         if isinstance(child, Element):
+            # an element already in the tree moves, to the end of its own parent's children too
+            if child.parent is not None and child in child.parent.children:
+                child.parent.remove_child(child)
             child.parent = self
         self.children.append(child)
+        if isinstance(child, Element) and self._document is not None:
+            self._document._index_subtree(child)
+        self._mark_dirty(DIRTY_CHILDREN)
         return child
 
+    def remove_child(self, child: 'Element | str'):
+        self.children.remove(child)
+        if isinstance(child, Element):
+            child.parent = None
+            if child._document is not None:
+                child._document._unindex_subtree(child)
+        self._mark_dirty(DIRTY_CHILDREN)
+        return child
+
+    def get_attribute(self, name: str) -> str | None:
+        return (self._attrs or _NO_ATTRS).get(name)
+
+    def set_attribute(self, name: str, value: str):
+        if self._attrs is None:
+            self._attrs = {}
+        old = self._attrs.get(name)
+        self._attrs[sys.intern(name)] = value
+        if self._document is not None:
+            self._document._attribute_changed(self, name, old, value)
+        self._mark_dirty(DIRTY_ATTRS)
+
+    def remove_attribute(self, name: str):
+        old = self._attrs.pop(name, None) if self._attrs is not None else None
+        if old is not None:
+            if self._document is not None:
+                self._document._attribute_changed(self, name, old, None)
+            self._mark_dirty(DIRTY_ATTRS)
+
+    def set_style(self, name: str, value: str | None):
+        style = dict(self._get_inline_style())
+        if value is None:
+            style.pop(name, None)
+        else:
+            style[name] = value
+        self.set_attribute("style", "; ".join(f"{k}: {v}" for k, v in style.items()))
+
     def add_event_listener(self, type_, handler, phase="bubble"):
-        key = (type_, phase)
-        if key not in self.listeners:
-            self.listeners[key] = []
-        self.listeners[key].append(handler)
+        if self._listeners is None:
+            self._listeners = {}
+        self._listeners.setdefault((type_, phase), []).append(handler)
+        if self._document is not None:
+            self._document._listeners_changed(type_, 1)
+
+    def remove_event_listener(self, type_, handler, phase="bubble"):
+        handlers = self.listeners.get((type_, phase))
+        if handlers and handler in handlers:
+            handlers.remove(handler)
+            if not handlers:
+                del self._listeners[(type_, phase)]
+            if self._document is not None:
+                self._document._listeners_changed(type_, -1)
 
     def dispatch_event(self, event):
-        path = self._get_ancestry_path()
+        document = self._document
+        if document is not None and not document._listener_counts.get(event.type):
+            return
+        path, keys = self._propagation()
+        capture, bubble = (event.type, "capture"), (event.type, "bubble")
 
         # CAPTURING PHASE
-        for el in reversed(path):
-            event.current_target = el
-            handlers = el.listeners.get((event.type, "capture"), [])
-            for handler in handlers:
-                handler(event)
-                if event._stopped:
-                    return
+        if capture in keys:
+            for el in reversed(path):
+                if el._listeners and capture in el._listeners:
+                    event.current_target = el
+                    for handler in list(el._listeners[capture]):
+                        handler(event)
+                        if event._stopped:
+                            return
+
+        if bubble not in keys:
+            return
 
         # TARGET PHASE
         event.current_target = self
-        for handler in self.listeners.get((event.type, "bubble"), []):
-            handler(event)
-            if event._stopped:
-                return
-
-        # BUBBLING PHASE
-        for el in path:
-            event.current_target = el
-            handlers = el.listeners.get((event.type, "bubble"), [])
-            for handler in handlers:
+        if self._listeners and bubble in self._listeners:
+            for handler in list(self._listeners[bubble]):
                 handler(event)
                 if event._stopped:
                     return
 
+        # BUBBLING PHASE
+        for el in path:
+            if el._listeners and bubble in el._listeners:
+                event.current_target = el
+                for handler in list(el._listeners[bubble]):
+                    handler(event)
+                    if event._stopped:
+                        return
+
+    def _propagation(self):
+        # ancestors, nearest first, and the (type, phase) keys listened to on self or any of them
+        # only cached inside a document, whose versions tell when the path may have changed
+        document, cache = self._document, self._path_cache
+        if (cache is not None and document is not None and cache[0] is document
+                and cache[1] == document._structure_version and cache[2] == document._listener_version):
+            return cache[3], cache[4]
+        path = self._get_ancestry_path()
+        keys = set(self._listeners or ())
+        for el in path:
+            if el._listeners:
+                keys.update(el._listeners)
+        if document is not None:
+            self._path_cache = (document, document._structure_version, document._listener_version, path, keys)
+        return path, keys
+
     def set_text(self, new_text: str):
-        self.children = [new_text]
-        if hasattr(self, "_tk_widget") and self._tk_widget:
-            self._tk_widget.config(text=new_text)
+        removed = [c for c in self.children if isinstance(c, Element)]
+        for child in removed:
+            child.parent = None
+            if child._document is not None:
+                child._document._unindex_subtree(child)
+        had_elements = bool(removed)
+        self.children = [Text(new_text)]
+        self._mark_dirty(DIRTY_TEXT | (DIRTY_CHILDREN if had_elements else 0))
+
+    def _mark_dirty(self, flags: int):
+        was_clean = not self._dirty
+        self._dirty |= flags
+        if was_clean and _mutation_observer is not None:
+            _mutation_observer(self)
 
     def _get_style_dict(self) -> Dict[str, str]:
-        styles = {}
-
-        for k, v in self.attrs.items():
-            if k not in ["style", "id", "class"]:
-                styles[k] = v
+        styles = self._get_presentational_style()
+        styles.update(self._get_inline_style())
+        return styles
 
-        style_attr = self.attrs.get("style", "")
-        for rule in style_attr.split(";"):
-            if ":" in rule:
-                key, value = rule.split(":", 1)
-                styles[key.strip()] = value.strip()
+    def _get_presentational_style(self) -> Dict[str, str]:
+        return {k: v for k, v in (self._attrs or _NO_ATTRS).items() if k not in ["style", "id", "class"]}
 
-        return styles
+    def _get_inline_style(self) -> Dict[str, str]:
+        # shared between elements with the same style attribute, so read-only
+        return parse_declarations((self._attrs or _NO_ATTRS).get("style", ""))
 
     def _get_ancestry_path(self):
         current: Element = self.parent
@@ -94,50 +283,68 @@ class Element:
         return path
 
     def __repr__(self):
-        return f"<{self.tag} {self.attrs} children={len(self.children)}/>"
+        return f"<{self.tag} {dict(self.attrs)} children={len(self.children)}/>"
 
 
 class Input(Element):
+    __slots__ = ()
+
     def __init__(self, attrs=None, parent=None):
         super().__init__('button', attrs, parent)
 
 
 class Div(Element):
+    __slots__ = ()
+
     def __init__(self, attrs=None, parent=None):
         super().__init__('div', attrs, parent)
 
 
 class P(Element):
+    __slots__ = ()
+
     def __init__(self, attrs=None, parent=None):
         super().__init__('p', attrs, parent)
 
 
 class Button(Element):
+    __slots__ = ()
+
     def __init__(self, attrs=None, parent=None):
         super().__init__('button', attrs, parent)
 
 
 class A(Element):
+    __slots__ = ()
+
     def __init__(self, attrs=None, parent=None):
         super().__init__('a', attrs, parent)
 
 
 class H1(Element):
+    __slots__ = ()
+
     def __init__(self, attrs=None, parent=None):
         super().__init__('h1', attrs, parent)
 
 
 class H2(Element):
+    __slots__ = ()
+
     def __init__(self, attrs=None, parent=None):
         super().__init__('h2', attrs, parent)
 
 
 class H3(Element):
+    __slots__ = ()
+
     def __init__(self, attrs=None, parent=None):
         super().__init__('h3', attrs, parent)
 
 
 class DocumentEL(Element):
+    __slots__ = ()
+
     def __init__(self, attrs=None):
         super().__init__("document", attrs)
 
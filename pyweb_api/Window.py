@@ -1,42 +1,177 @@
-from typing import List
+from typing import List, Dict
 
+from pyweb_api.CSS import parse_selectors, class_names
 from pyweb_api.DOM import Element, DocumentEL
 
 
 class Document:
 
-    def __init__(self):
-        self.children = List[Element | None] = []
-        doc_el = DocumentEL()
+    def __init__(self, root: Element | None = None):
+        self.children: List[Element] = []
+        # live indexes, kept up to date by Element.append_child/remove_child/set_attribute
+        self._by_id: Dict[str, Dict[Element, None]] = {}
+        self._by_tag: Dict[str, Dict[Element, None]] = {}
+        self._by_class: Dict[str, Dict[Element, None]] = {}
+        # bumped whenever an element is attached to or detached from the tree
+        self._structure_version = 0
+        self._order_version = -1
+        self._order: Dict[Element, int] = {}
+        # event type -> number of listeners for it on elements of this document, and a version
+        # bumped on every change; both also follow subtrees that are attached or detached
+        self._listener_counts: Dict[str, int] = {}
+        self._listener_version = 0
+
+        doc_el = root or DocumentEL()
         self.children.append(doc_el)
+        self._index_subtree(doc_el)
+
+    @property
+    def root(self) -> Element:
+        return self.children[0]
 
     def get_element_by_id(self, _id: str) -> Element | None:
-        def recurse_search(element: Element) -> Element | None:
-            if hasattr(element, "id") and element.id == _id:
-                return element
-            for child in element.children:
-                if isinstance(child, Element):
-                    result = recurse_search(child)
-                    if result:
-                        return result
+        elements = self._by_id.get(_id)
+        if not elements:
             return None
-
-        root = self.children[0] if self.children else None
-        if root:
-            return recurse_search(root)
-        return None
+        if len(elements) == 1:
+            return next(iter(elements))
+        return self._in_document_order(elements)[0]
+
+    def get_elements_by_tag_name(self, tag_name: str) -> List[Element]:
+        return self._in_document_order(self._by_tag.get(tag_name.lower(), {}))
+
+    def get_elements_by_class_name(self, class_name: str) -> List[Element]:
+        names = class_name.split()
+        if not names:
+            return []
+        candidates = self._by_class.get(names[0], {})
+        wanted = frozenset(names)
+        return self._in_document_order([el for el in candidates if wanted <= class_names(el)])
+
+    def query_selector(self, selector: str) -> Element | None:
+        matches = self.query_selector_all(selector)
+        return matches[0] if matches else None
+
+    def query_selector_all(self, selector: str) -> List[Element]:
+        matches = {}
+        for sel in parse_selectors(selector):
+            key = sel.key
+            if key.id is not None:
+                candidates = self._by_id.get(key.id, {})
+            elif key.classes:
+                candidates = self._by_class.get(min(key.classes), {})
+            elif key.tag is not None:
+                candidates = self._by_tag.get(key.tag, {})
+            else:
+                candidates = self._iter_elements()
+            for el in candidates:
+                if el not in matches and sel.matches(el):
+                    matches[el] = None
+        return self._in_document_order(matches)
+
+    def has_listeners(self, type_: str) -> bool:
+        return self._listener_counts.get(type_, 0) > 0
 
     def create_element(self, tag_name: str) -> Element:
         el = Element(tag_name)
-        self.children[0].children.append(el)
+        self.children[0].append_child(el)
         return el
 
+    def _iter_elements(self):
+        stack = [self.children[0]]
+        while stack:
+            el = stack.pop()
+            yield el
+            stack.extend(reversed([c for c in el.children if isinstance(c, Element)]))
+
+    def _in_document_order(self, elements) -> List[Element]:
+        elements = list(elements)
+        if len(elements) < 2:
+            return elements
+        if self._order_version != self._structure_version:
+            self._order = {el: i for i, el in enumerate(self._iter_elements())}
+            self._order_version = self._structure_version
+        return sorted(elements, key=self._order.__getitem__)
+
+    def _index_subtree(self, element: Element):
+        self._structure_version += 1
+        # runs over every node of a freshly parsed page, so the _add calls are inlined
+        by_tag, by_id, by_class = self._by_tag, self._by_id, self._by_class
+        stack = [element]
+        while stack:
+            el = stack.pop()
+            el._document = self
+            by_tag.setdefault(el.tag, {})[el] = None
+            if el._attrs:
+                if el.id is not None:
+                    by_id.setdefault(el.id, {})[el] = None
+                for name in class_names(el):
+                    by_class.setdefault(name, {})[el] = None
+            if el._listeners:
+                self._count_listeners(el, 1)
+            stack.extend(c for c in el.children if isinstance(c, Element))
+
+    def _unindex_subtree(self, element: Element):
+        self._structure_version += 1
+        stack = [element]
+        while stack:
+            el = stack.pop()
+            el._document = None
+            self._discard(self._by_tag, el.tag, el)
+            if el.id is not None:
+                self._discard(self._by_id, el.id, el)
+            for name in class_names(el):
+                self._discard(self._by_class, name, el)
+            if el._listeners:
+                self._count_listeners(el, -1)
+            stack.extend(c for c in el.children if isinstance(c, Element))
+
+    def _count_listeners(self, element: Element, sign: int):
+        for (type_, _), handlers in element._listeners.items():
+            self._listeners_changed(type_, sign * len(handlers))
+
+    def _listeners_changed(self, type_: str, delta: int):
+        self._listener_version += 1
+        count = self._listener_counts.get(type_, 0) + delta
+        if count > 0:
+            self._listener_counts[type_] = count
+        else:
+            self._listener_counts.pop(type_, None)
+
+    def _attribute_changed(self, element: Element, name: str, old: str | None, new: str | None):
+        if name == "id":
+            if old is not None:
+                self._discard(self._by_id, old, element)
+            if new is not None:
+                self._add(self._by_id, new, element)
+        elif name == "class":
+            old_names = frozenset((old or "").split())
+            new_names = frozenset((new or "").split())
+            for class_name in old_names - new_names:
+                self._discard(self._by_class, class_name, element)
+            for class_name in new_names - old_names:
+                self._add(self._by_class, class_name, element)
+
+    @staticmethod
+    def _add(index: Dict[str, Dict[Element, None]], key: str, element: Element):
+        index.setdefault(key, {})[element] = None
+
+    @staticmethod
+    def _discard(index: Dict[str, Dict[Element, None]], key: str, element: Element):
+        elements = index.get(key)
+        if elements is not None:
+            elements.pop(element, None)
+            if not elements:
+                del index[key]
+
 
 class Location:
     def __init__(self, on_location_change):
         self.history = []
         self.current_index = -1
         self._current_url = None
+        # "navigate" for a new history entry, "back_forward" when moving within history
+        self.navigation_type = "navigate"
         self.on_location_change = on_location_change
 
     def navigate(self, url: str):
@@ -46,12 +181,20 @@ class Location:
         self.history.append(url)
         self.current_index += 1
         self._current_url = url
+        self.navigation_type = "navigate"
         self.on_location_change(url)
 
+    def replace(self, url: str):
+        # rewrites the current history entry, without a navigation
+        if self.current_index >= 0:
+            self.history[self.current_index] = url
+            self._current_url = url
+
     def back(self):
         if self.current_index > 0:
             self.current_index -= 1
             self._current_url = self.history[self.current_index]
+            self.navigation_type = "back_forward"
             self.on_location_change(self._current_url)
             return self._current_url
         self.on_location_change(None)
@@ -61,6 +204,7 @@ class Location:
         if self.current_index < len(self.history) - 1:
             self.current_index += 1
             self._current_url = self.history[self.current_index]
+            self.navigation_type = "back_forward"
             self.on_location_change(self._current_url)
             return self._current_url
         self.on_location_change(None)
@@ -87,10 +231,18 @@ class Console:
         print("---WARN:", self._args_to_str(args))
         self.write_to_console("warn", self._args_to_str(args))
 
-    def _args_to_str(*args):
+    def _args_to_str(self, args):
         return " ".join([str(a) for a in args])
 
 
 class Window:
-    def __init__(self):
-        pass
+    def __init__(self, document: Document | None = None, console: Console | None = None, alert=None):
+        self.document = document
+        self.console = console
+        self._alert = alert
+
+    def alert(self, message):
+        if self._alert is not None:
+            self._alert(str(message))
+        elif self.console is not None:
+            self.console.log(message)
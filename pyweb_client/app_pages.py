@@ -0,0 +1,49 @@
+import os
+
+from pyweb_client.snapshot import SnapshotCache, ParsedPage, load_page
+
+# Built-in app:// pages. Their DOM snapshots ship in PRECOMPILED_DIR, so showing
+# one at startup maps a file instead of running the parser; regenerate them after
+# editing a page with
+#
+#     python -m pyweb_client.app_pages
+#
+# A page whose snapshot is missing or stale is parsed (and its snapshot written if
+# the directory is writable).
+PRECOMPILED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "precompiled")
+HOME_BUTTON_ID = "home-button"
+
+APP_PAGES = {
+    "app://home": f"""<div>
+<p>ברוך הבא ל-PyWeb Client!</p>
+<button id="{HOME_BUTTON_ID}" value="Click"></button>
+</div>""",
+    "app://example_page": """<div>
+<p>זהו דף לדוגמה.</p>
+<button value="חזור לדף הבית"></button>
+</div>""",
+}
+
+app_snapshots = SnapshotCache(PRECOMPILED_DIR)
+
+
+def load_app_page(url: str, cache: SnapshotCache = app_snapshots) -> ParsedPage | None:
+    source = APP_PAGES.get(url)
+    if source is None:
+        return None
+    return load_page(source.encode("utf-8"), cache, min_bytes=0)
+
+
+def precompile(cache: SnapshotCache = app_snapshots):
+    # drops snapshots of earlier page versions, then writes the current ones
+    if os.path.isdir(cache.cache_dir):
+        for name in os.listdir(cache.cache_dir):
+            if name.endswith(".dom"):
+                os.remove(os.path.join(cache.cache_dir, name))
+    for url in APP_PAGES:
+        load_app_page(url, cache)
+        print(f"precompiled {url}")
+
+
+if __name__ == "__main__":
+    precompile()
@@ -0,0 +1,125 @@
+import tkinter as tk
+from collections import OrderedDict
+from typing import List, Tuple
+
+from pyweb_api.DOM import Element
+from pyweb_api.Window import Document
+from pyweb_client.style import StyleResolver
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pyweb_client.reflow import Reflow
+
+BFCACHE_MAX_ENTRIES = 6
+BFCACHE_MAX_BYTES = 64 * 1024 * 1024
+# rough per-object costs used to estimate what an entry keeps alive
+NODE_BYTES = 260  # see benchmarks/dom_memory.py
+WIDGET_BYTES = 2048
+
+
+def estimate_bytes(roots: List[Element], widget_count: int) -> int:
+    size = 0
+    stack = list(roots)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            size += 50 + len(node)
+        else:
+            size += NODE_BYTES
+            stack.extend(node.children)
+    return size + widget_count * WIDGET_BYTES
+
+
+def count_widgets(widgets: List[tk.Widget]) -> int:
+    count = 0
+    stack = list(widgets)
+    while stack:
+        widget = stack.pop()
+        count += 1
+        stack.extend(widget.winfo_children())
+    return count
+
+
+# A rendered page as it was when the user navigated away from it. Widgets are
+# only kept for the plain widget engine: they are unpacked, not destroyed, and
+# packed again on restore.
+class PageEntry:
+    def __init__(self, url: str, roots: List[Element], document: Document, styles: StyleResolver,
+                 engine: Tuple[str, bool], scroll: float, widgets: List[Tuple[tk.Widget, dict]] | None = None,
+                 images: List[tuple] | None = None, reflow: 'Reflow | None' = None):
+        self.url = url
+        self.roots = roots
+        self.document = document
+        self.styles = styles
+        self.engine = engine
+        self.scroll = scroll
+        self.widgets = widgets
+        # image requests of the kept widgets that had not been loaded yet
+        self.images = images or []
+        # wraps the kept Labels, see Reflow
+        self.reflow = reflow
+        self.size = estimate_bytes(roots, count_widgets([w for w, _ in widgets]) if widgets else 0)
+
+    def drop_widgets(self):
+        if self.widgets:
+            for widget, _ in self.widgets:
+                widget.destroy()
+        self.widgets = None
+        self.images = []
+        self.reflow = None
+
+
+# Recent history entries by index into Location.history, bounded by entry
+# count and by the estimated size of the trees and widgets they hold.
+class BackForwardCache:
+    def __init__(self, max_entries: int = BFCACHE_MAX_ENTRIES, max_bytes: int = BFCACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[int, PageEntry] = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, index: int, entry: PageEntry):
+        self.remove(index)
+        if entry.size > self.max_bytes:
+            entry.drop_widgets()
+            return
+        self._entries[index] = entry
+        self.size += entry.size
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            self.remove(next(iter(self._entries)))
+
+    def take(self, index: int, url: str) -> PageEntry | None:
+        entry = self._entries.pop(index, None)
+        if entry is None:
+            return None
+        self.size -= entry.size
+        if entry.url != url:
+            entry.drop_widgets()
+            return None
+        return entry
+
+    def remove(self, index: int):
+        entry = self._entries.pop(index, None)
+        if entry is not None:
+            self.size -= entry.size
+            entry.drop_widgets()
+
+    def drop_widgets(self):
+        # entries stay, but will be rendered again from their DOM
+        for entry in self._entries.values():
+            self.size -= entry.size
+            entry.drop_widgets()
+            entry.size = estimate_bytes(entry.roots, 0)
+            self.size += entry.size
+
+    def discard_from(self, index: int):
+        # history entries from index on were replaced by a new navigation
+        for key in [k for k in self._entries if k >= index]:
+            self.remove(key)
+
+    def clear(self):
+        for key in list(self._entries):
+            self.remove(key)
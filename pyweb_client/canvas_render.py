@@ -0,0 +1,251 @@
+import tkinter as tk
+from typing import Dict, List
+
+from pyweb_api.DOM import Element, DIRTY_TEXT
+from pyweb_client.fonts import DEFAULT_FONT, LINK_FONT
+from pyweb_client.images import image_size
+from pyweb_client.render import (SKIPPED_TAGS, TEXT_TAGS, is_container, in_subtree, text_label_options,
+                                 list_item_texts, element_text, render_element)
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pyweb_client.main import PyWebClient
+
+PAGE_TAG = "page"
+LINK_TAG = "link"
+TEXT_PADDING = 4
+LIST_ITEM_INDENT = 10
+EMBEDDED_TAGS = {"button", "input", "textarea"}
+
+
+def _px(value: str | None) -> int:
+    try:
+        return int((value or "").replace("px", "").strip())
+    except ValueError:
+        return 0
+
+
+# Stands in for a Tk widget where the rest of the client expects one
+# (Element._tk_widget, show_photo), and forwards config() to the canvas item.
+class CanvasItem:
+    def __init__(self, canvas: tk.Canvas, item: int):
+        self.canvas = canvas
+        self.item = item
+        self.image = None
+
+    def winfo_exists(self) -> bool:
+        return bool(self.canvas.type(self.item))
+
+    def config(self, **options):
+        valid = self.canvas.itemconfigure(self.item)
+        self.canvas.itemconfigure(self.item, **{k: v for k, v in options.items() if k in valid})
+
+    configure = config
+
+
+class CanvasRenderer:
+    def __init__(self, canvas: tk.Canvas, cl: 'PyWebClient'):
+        self.canvas = canvas
+        self.cl = cl
+        self.roots: List[Element] = []
+        self.y = 0
+        self._width = 0
+        self._embedded: List[tk.Widget] = []
+        # canvas item -> element drawn by it, for EventDelegator
+        self._items: Dict[int, Element] = {}
+        # one binding for every link on the page
+        canvas.tag_bind(LINK_TAG, "<Enter>", self._on_link_enter)
+        canvas.tag_bind(LINK_TAG, "<Leave>", self._on_link_leave)
+
+    def append(self, element: Element):
+        self.roots.append(element)
+        self._width = self.canvas.winfo_width()
+        self.y = self._layout(element, 0, self.y, self._width)
+
+    def refresh(self):
+        self.canvas.configure(scrollregion=(0, 0, self._width, self.y))
+        self.cl.load_pending_images()
+
+    def update(self):
+        pass
+
+    def resize(self):
+        if self.canvas.winfo_width() != self._width:
+            self.relayout()
+
+    def relayout(self):
+        roots = self.roots
+        self.clear()
+        for root in roots:
+            self.append(root)
+        self.refresh()
+
+    def relayout_elements(self, dirty: Dict[Element, int]):
+        # dirty: element -> its dirty flags. New text that keeps its element's height is patched
+        # into the canvas item, any other change on the page lays it out again
+        relayout = False
+        for element, flags in dirty.items():
+            if not any(in_subtree(element, root) for root in self.roots):
+                continue  # not on this page
+            if flags != DIRTY_TEXT or not self._patch_text(element):
+                relayout = True
+        if relayout:
+            self.relayout()
+
+    def _patch_text(self, element: Element) -> bool:
+        target = element._tk_widget
+        if not isinstance(target, CanvasItem) or self._items.get(target.item) is not element:
+            return False
+        if element.tag == "li":
+            text = dict(list_item_texts(element.parent)).get(element) if element.parent is not None else None
+            if text is None:
+                return False
+        else:
+            text = element_text(element)
+        old = self.canvas.bbox(target.item)
+        self.canvas.itemconfigure(target.item, text=text)
+        new = self.canvas.bbox(target.item)
+        return old is not None and new is not None and new[3] - new[1] == old[3] - old[1]
+
+    def clear(self):
+        self.canvas.delete(PAGE_TAG)
+        for widget in self._embedded:
+            widget.destroy()
+        self._embedded = []
+        self._items = {}
+        self.roots = []
+        self.y = 0
+
+    destroy = clear
+
+    def element_at(self, x: int, y: int) -> Element | None:
+        for item in reversed(self.canvas.find_overlapping(x, y, x, y)):
+            element = self._items.get(item)
+            if element is not None:
+                return element
+        return None
+
+    def _on_link_enter(self, event: tk.Event):
+        self.canvas.configure(cursor="hand2")
+        self.cl.prefetcher.hover(self.element_at(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)))
+
+    def _on_link_leave(self, event: tk.Event):
+        self.canvas.configure(cursor="")
+        self.cl.prefetcher.cancel_hover()
+
+    def _layout(self, element: Element, x: int, y: int, width: int) -> int:
+        # draws element at (x, y) within width and returns the y below it
+        if isinstance(element, str) or element.tag in SKIPPED_TAGS or element.tag == "li":
+            return y
+        style = self.cl.styles.computed_style(element)
+        tk_style = self.cl.styles.tk_style(element)
+        widget_opts = tk_style["widget"]
+        margin_x = tk_style["pack"].get("padx", 0)
+        margin_y = tk_style["pack"].get("pady", 0)
+        x += margin_x
+        y += margin_y
+        width = max(1, width - 2 * margin_x)
+        tag = element.tag
+
+        if tag in TEXT_TAGS or tag == "a":
+            y = self._layout_text(element, x, y, width)
+        elif tag in ("ul", "ol"):
+            for li, li_text in list_item_texts(element):
+                y = self._draw_text(li, li_text, x + LIST_ITEM_INDENT, y, width - LIST_ITEM_INDENT, DEFAULT_FONT)
+        elif tag == "br":
+            y += self.cl.text_metrics.linespace(DEFAULT_FONT)
+        elif tag == "hr":
+            self.canvas.create_line(x, y + 1, x + width, y + 1, fill="gray", width=2, tags=PAGE_TAG)
+            y += 2
+        elif tag == "img":
+            y = self._layout_image(element, x, y)
+        elif tag in EMBEDDED_TAGS:
+            y = self._layout_embedded(element, x, y, margin_y)
+        else:
+            if not is_container(tag):
+                self.cl.console.log(f"UNKNOWN EL TAG: {tag}")
+            y = self._layout_box(element, widget_opts, _px(style.get("padding")), x, y, width)
+
+        return y + margin_y
+
+    def _layout_box(self, element: Element, widget_opts: Dict[str, any], padding: int, x: int, y: int,
+                    width: int) -> int:
+        border = widget_opts.get("bd", 0) if widget_opts.get("relief", "flat") != "flat" else 0
+        background = None
+        if "bg" in widget_opts or border:
+            # drawn first so the children end up on top of it, sized once they are laid out
+            background = self.canvas.create_rectangle(x, y, x + width, y, fill=widget_opts.get("bg", ""),
+                                                      outline="gray" if border else "", width=border,
+                                                      tags=PAGE_TAG)
+        inset = border + padding
+        bottom = y + inset
+        for child in element.children:
+            if isinstance(child, Element):
+                bottom = self._layout(child, x + inset, bottom, width - 2 * inset)
+        bottom += inset
+        if "height" in widget_opts:
+            bottom = max(bottom, y + widget_opts["height"])
+        if background is not None:
+            self.canvas.coords(background, x, y, x + width, bottom)
+        return bottom
+
+    def _layout_text(self, element: Element, x: int, y: int, width: int) -> int:
+        if element.tag == "a":
+            text = element_text(element)
+            bottom = self._draw_text(element, text, x, y, width, LINK_FONT, fill="blue")
+            self.canvas.addtag_withtag(LINK_TAG, element._tk_widget.item)
+            return bottom
+
+        text, widget_opts, _ = text_label_options(element, self.cl)
+        if "bg" in widget_opts:
+            background = self.canvas.create_rectangle(x, y, x + width, y, fill=widget_opts["bg"], outline="",
+                                                      tags=PAGE_TAG)
+        else:
+            background = None
+        bottom = self._draw_text(element, text, x, y, width, widget_opts.get("font", DEFAULT_FONT),
+                                 fill=widget_opts.get("fg", "black"), justify=widget_opts.get("justify", "left"))
+        if background is not None:
+            self.canvas.coords(background, x, y, x + width, bottom)
+        return bottom
+
+    def _draw_text(self, element: Element, text: str, x: int, y: int, width: int, font, fill="black",
+                   justify="left") -> int:
+        anchor, text_x = "nw", x + TEXT_PADDING
+        if justify == "center":
+            anchor, text_x = "n", x + width // 2
+        elif justify == "right":
+            anchor, text_x = "ne", x + width - TEXT_PADDING
+        item = self.canvas.create_text(text_x, y + TEXT_PADDING, text=text, font=self.cl.fonts.name(font), fill=fill, anchor=anchor,
+                                       justify=justify, width=max(1, width - 2 * TEXT_PADDING), tags=PAGE_TAG)
+        element._tk_widget = CanvasItem(self.canvas, item)
+        self._items[item] = element
+        bbox = self.canvas.bbox(item)
+        return (bbox[3] if bbox else y) + TEXT_PADDING
+
+    def _layout_image(self, element: Element, x: int, y: int) -> int:
+        src = element.attrs.get("src", "")
+        size = image_size(element)
+        self.canvas.create_rectangle(x, y, x + size[0], y + size[1], outline="lightgray", tags=PAGE_TAG)
+        item = self.canvas.create_image(x, y, anchor="nw", tags=PAGE_TAG)
+        target = CanvasItem(self.canvas, item)
+        element._tk_widget = target
+        self._items[item] = element
+        photo = self.cl.image_cache.get(src, size)
+        if photo is not None:
+            target.config(image=photo)
+            target.image = photo
+        else:
+            self.cl.request_image(target, src, size)
+        return y + size[1]
+
+    def _layout_embedded(self, element: Element, x: int, y: int, margin_y: int) -> int:
+        # interactive controls stay real widgets, embedded as canvas windows. A control
+        # computes its requested size as soon as it is configured; the holder only follows
+        # once pack runs at idle, and flushing idle tasks here would run the frame callbacks
+        # (and with them a relayout) in the middle of this one
+        holder = tk.Frame(self.canvas)
+        render_element(holder, element, self.cl)
+        self.canvas.create_window(x, y, window=holder, anchor="nw", tags=PAGE_TAG)
+        self._embedded.append(holder)
+        # render_element packs the control with the element's pady, which is margin_y
+        return y + element._tk_widget.winfo_reqheight() + 2 * margin_y
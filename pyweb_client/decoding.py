@@ -0,0 +1,125 @@
+import codecs
+import re
+import zlib
+
+# How far into a document <meta charset> is looked for, as in the HTML spec's prescan.
+SNIFF_BYTES = 1024
+DEFAULT_ENCODING = "utf-8"
+# for documents that declare nothing and turn out not to be UTF-8, as browsers assume
+FALLBACK_ENCODING = "cp1252"
+
+# utf-16 decoders read the BOM themselves; utf-8-sig drops it
+_BOMS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+_META_CHARSET = re.compile(rb"""<meta[^>]*?charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+_CHARSET_PARAM = re.compile(r"""charset\s*=\s*["']?([\w.:-]+)""", re.IGNORECASE)
+
+
+def _codec_name(label: str) -> str | None:
+    try:
+        return codecs.lookup(label).name
+    except LookupError:
+        return None
+
+
+def charset_from_content_type(content_type: str | None) -> str | None:
+    # only an explicit charset: requests falls back to ISO-8859-1 for any text/* without one
+    match = _CHARSET_PARAM.search(content_type or "")
+    return _codec_name(match.group(1)) if match else None
+
+
+def declared_encoding(head: bytes) -> str | None:
+    # a byte order mark, then <meta charset=...> or <meta http-equiv content="...; charset=...">
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    match = _META_CHARSET.search(head[:SNIFF_BYTES])
+    if match:
+        name = _codec_name(match.group(1).decode("ascii"))
+        if name is not None:
+            # the meta tag itself was readable as ASCII, so the document is not UTF-16 whatever it says
+            return DEFAULT_ENCODING if name.startswith("utf-16") else name
+    return None
+
+
+def sniff_encoding(head: bytes, default: str = DEFAULT_ENCODING) -> str:
+    return declared_encoding(head) or default
+
+
+def incremental_decoder(encoding: str) -> codecs.IncrementalDecoder:
+    try:
+        return codecs.getincrementaldecoder(encoding)(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder(DEFAULT_ENCODING)(errors="replace")
+
+
+# Bytes in, str out, in arbitrary chunks. Without an encoding up front, the
+# first SNIFF_BYTES are held back until declared_encoding has seen them. When
+# they declare nothing either, the document is decoded as default, strictly,
+# and from the first byte that does not fit on as FALLBACK_ENCODING; guessed
+# tells the two apart from a declared encoding.
+class StreamDecoder:
+    def __init__(self, encoding: str | None = None, default: str = DEFAULT_ENCODING):
+        self.encoding = encoding
+        self.default = default
+        self.guessed = False
+        self._decoder = incremental_decoder(encoding) if encoding else None
+        self._head = b""
+        self._strict = False
+
+    def decode(self, data: bytes, final: bool = False) -> str:
+        if self._decoder is None:
+            self._head += data
+            if len(self._head) < SNIFF_BYTES and not final:
+                return ""
+            data, self._head = self._head, b""
+            self.encoding = declared_encoding(data)
+            if self.encoding is None:
+                self.encoding, self.guessed, self._strict = self.default, True, True
+                self._decoder = codecs.getincrementaldecoder(self.default)()
+            else:
+                self._decoder = incremental_decoder(self.encoding)
+        if not self._strict:
+            return self._decoder.decode(data, final)
+        buffered = self._decoder.getstate()[0]
+        try:
+            return self._decoder.decode(data, final)
+        except UnicodeDecodeError as e:
+            # everything before the offending bytes did decode
+            data = buffered + data
+            self.encoding, self._strict = FALLBACK_ENCODING, False
+            self._decoder = incremental_decoder(FALLBACK_ENCODING)
+            return data[:e.start].decode(self.default) + self._decoder.decode(data[e.start:], final)
+
+
+# Content-Encoding: deflate is meant to be zlib-wrapped, but some servers send
+# raw deflate data; which one it is shows in the first bytes.
+class _Inflate:
+    def __init__(self):
+        self._decompress = None
+
+    def decompress(self, data: bytes) -> bytes:
+        if self._decompress is None:
+            if not data:
+                return b""
+            zlib_header = len(data) >= 2 and (data[0] & 0x0F) == 8 and ((data[0] << 8) | data[1]) % 31 == 0
+            self._decompress = zlib.decompressobj(zlib.MAX_WBITS if zlib_header else -zlib.MAX_WBITS)
+        return self._decompress.decompress(data)
+
+    def flush(self) -> bytes:
+        return self._decompress.flush() if self._decompress is not None else b""
+
+
+def decompressor(content_encoding: str | None):
+    # an incremental decompressor (decompress(chunk), flush()) for a Content-Encoding,
+    # None for identity and for encodings left to urllib3
+    encoding = (content_encoding or "").strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return _Inflate()
+    return None
+
+
+def decompress(data: bytes, content_encoding: str | None) -> bytes:
+    inflate = decompressor(content_encoding)
+    return inflate.decompress(data) + inflate.flush() if inflate is not None else data
@@ -0,0 +1,80 @@
+import tkinter as tk
+
+from pyweb_api.DOM import Element, Event
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pyweb_client.main import PyWebClient
+
+# Tk event sequence -> DOM event type
+TK_EVENT_TYPES = {
+    "<ButtonPress-1>": "mousedown",
+    "<ButtonRelease-1>": "click",
+    "<Motion>": "mousemove",
+    "<KeyPress>": "keydown",
+    "<KeyRelease>": "keyup",
+}
+# DOM event types with a default action, dispatched even when nothing listens
+DEFAULT_ACTION_TYPES = {"click"}
+
+
+# One application-wide binding per event type routes Tk events to the element
+# behind the widget (Widget._dom_element, set by create_widget) or, on the page
+# canvas, behind the canvas item (block renderer element_at).
+class EventDelegator:
+    def __init__(self, cl: 'PyWebClient'):
+        self.cl = cl
+
+    def install(self):
+        for sequence, type_ in TK_EVENT_TYPES.items():
+            self.cl.root.bind_all(sequence, lambda e, t=type_: self.handle(t, e), add="+")
+        # hovering a link lets the prefetcher start on its target
+        self.cl.root.bind_all("<Enter>", self._on_enter, add="+")
+        self.cl.root.bind_all("<Leave>", lambda e: self.cl.prefetcher.cancel_hover(), add="+")
+
+    def handle(self, type_: str, tk_event: tk.Event):
+        # mouse moves and key presses are frequent: bail out before any lookup when nothing listens
+        if type_ not in DEFAULT_ACTION_TYPES and not self.cl.tab.document.has_listeners(type_):
+            return
+        widget = tk_event.widget
+        if not isinstance(widget, tk.Misc):
+            return
+        if type_ == "click" and not self._inside(widget, tk_event):
+            return  # released outside of the widget that was pressed
+        element = self.target(widget, tk_event)
+        if element is None:
+            return
+        event = Event(type_, element)
+        element.dispatch_event(event)
+        if type_ == "click" and not event.default_prevented:
+            self._follow_link(element)
+
+    def _on_enter(self, tk_event: tk.Event):
+        widget = tk_event.widget
+        # canvas links are items, CanvasRenderer reports those through its link tag binding
+        if isinstance(widget, tk.Misc) and widget is not self.cl.tab.render_area_canvas:
+            self.cl.prefetcher.hover(self.target(widget, tk_event))
+
+    def target(self, widget: tk.Misc, tk_event: tk.Event) -> Element | None:
+        tab = self.cl.tab
+        if widget is tab.render_area_canvas:
+            if tab.block_renderer is None:
+                return None
+            return tab.block_renderer.element_at(widget.canvasx(tk_event.x), widget.canvasy(tk_event.y))
+        while widget is not None:
+            element = getattr(widget, "_dom_element", None)
+            if element is not None:
+                return element
+            widget = widget.master
+        return None
+
+    @staticmethod
+    def _inside(widget: tk.Misc, tk_event: tk.Event) -> bool:
+        return 0 <= tk_event.x < widget.winfo_width() and 0 <= tk_event.y < widget.winfo_height()
+
+    def _follow_link(self, element: Element):
+        while element is not None:
+            if element.tag == "a":
+                self.cl.tab.location.navigate(element.attrs.get("href", "#"))
+                return
+            element = element.parent
@@ -0,0 +1,152 @@
+import tkinter as tk
+from functools import lru_cache
+from tkinter import font as tkfont
+from typing import Dict, Tuple
+
+DEFAULT_FONT = ("Arial", 12)
+LINK_FONT = ("Arial", 12, "underline")
+HEADING_FONT_SIZES = {"h1": 22, "h2": 18, "h3": 16}
+TEXT_METRICS_MAX_ENTRIES = 8192  # per kind of measurement (widths, wrapped lines, line counts)
+
+# family, size, weight, slant, decoration ("", "underline", "overstrike" or both)
+FontKey = Tuple[str, int, str, str, str]
+
+
+def heading_font(tag: str) -> tuple:
+    return "Arial", HEADING_FONT_SIZES[tag], "bold"
+
+
+@lru_cache(maxsize=1024)
+def font_key(font: tuple) -> FontKey:
+    # ("Arial", 12, "bold"), ("Arial", 12, "bold", "italic"), ("Arial", 12, "underline"), ...
+    family, size, *styles = font
+    weight, slant, decoration = "normal", "roman", []
+    for word in " ".join(str(s) for s in styles).split():
+        if word in ("bold", "normal"):
+            weight = word
+        elif word in ("italic", "roman"):
+            slant = word
+        elif word in ("underline", "overstrike") and word not in decoration:
+            decoration.append(word)
+    return family, int(size), weight, slant, " ".join(sorted(decoration))
+
+
+# Named Tk fonts, one per FontKey, shared by every widget and canvas item of the
+# client. Widgets get the font name, so Tk resolves each font once instead of
+# parsing a font tuple per Label. Also a metrics backend for TextMeasurer.
+# Tk thread only.
+class FontRegistry:
+    def __init__(self, root: tk.Misc | None = None):
+        self.root = root
+        self._fonts: Dict[FontKey, tkfont.Font] = {}
+        # font name -> Font, for names handed out here and Tk's own (TkDefaultFont, ...)
+        self._names: Dict[str, tkfont.Font] = {}
+
+    def __len__(self):
+        return len(self._fonts)
+
+    def get(self, font) -> tkfont.Font:
+        if isinstance(font, str):
+            named = self._names.get(font)
+            if named is None:
+                named = self._names[font] = tkfont.nametofont(font, root=self.root)
+            return named
+        key = font_key(font)
+        named = self._fonts.get(key)
+        if named is None:
+            family, size, weight, slant, decoration = key
+            named = tkfont.Font(root=self.root, name=f"pyweb-font-{len(self._fonts)}", exists=False,
+                                family=family, size=size, weight=weight, slant=slant,
+                                underline="underline" in decoration, overstrike="overstrike" in decoration)
+            self._fonts[key] = named
+            self._names[named.name] = named
+        return named
+
+    def name(self, font) -> str:
+        # what to pass as the font option of a widget or canvas item
+        return font if isinstance(font, str) else self.get(font).name
+
+    def linespace(self, font) -> int:
+        return self.get(font).metrics("linespace")
+
+    def text_width(self, text: str, font) -> int:
+        return self.get(font).measure(text)
+
+
+# Memoized text measurement over a metrics backend (FontRegistry, or
+# layout.ApproxTextMetrics without a display): string widths, line heights and
+# greedy word wrap at a given width, like Tk's wraplength. Widths, wrapped lines
+# and line counts are each kept in an LRU of max_entries. Fonts are cache keys
+# as given; FontRegistry maps equivalent tuples to one Tk font.
+class TextMeasurer:
+    def __init__(self, metrics, max_entries: int = TEXT_METRICS_MAX_ENTRIES):
+        self.metrics = metrics
+        self._linespaces: Dict[object, int] = {}
+        # per instance, so every client measures with its own backend
+        self.text_width = lru_cache(maxsize=max_entries)(metrics.text_width)
+        self._wrap_cached = lru_cache(maxsize=max_entries)(self._wrap)
+        self._count_cached = lru_cache(maxsize=max_entries)(self._count)
+
+    def linespace(self, font) -> int:
+        linespace = self._linespaces.get(font)
+        if linespace is None:
+            linespace = self._linespaces[font] = self.metrics.linespace(font)
+        return linespace
+
+    def wrap(self, text: str, font, width: int | None = None) -> Tuple[str, ...]:
+        # the lines text is broken into; without a width (or <= 0) only at newlines
+        if not width or width <= 0:
+            return tuple(text.split("\n"))
+        return self._wrap_cached(text, font, width)
+
+    def line_count(self, text: str, font, width: int | None = None) -> int:
+        # counting does not build the lines
+        if not width or width <= 0:
+            return text.count("\n") + 1
+        return self._count_cached(text, font, width)
+
+    def text_height(self, text: str, font, width: int | None = None) -> int:
+        return self.line_count(text, font, width) * self.linespace(font)
+
+    def cache_info(self) -> Dict[str, tuple]:
+        return {"widths": self.text_width.cache_info(), "lines": self._wrap_cached.cache_info(),
+                "counts": self._count_cached.cache_info()}
+
+    def clear(self):
+        self._linespaces.clear()
+        self.text_width.cache_clear()
+        self._wrap_cached.cache_clear()
+        self._count_cached.cache_clear()
+
+    def _wrap(self, text: str, font, width: int) -> Tuple[str, ...]:
+        text_width = self.text_width
+        space = text_width(" ", font)
+        lines = []
+        for paragraph in text.split("\n"):
+            line, used = [], 0
+            for word in paragraph.split():
+                word_width = text_width(word, font)
+                if line and used + space + word_width > width:
+                    lines.append(" ".join(line))
+                    line, used = [word], word_width
+                else:
+                    used += word_width + (space if line else 0)
+                    line.append(word)
+            lines.append(" ".join(line))
+        return tuple(lines)
+
+    def _count(self, text: str, font, width: int) -> int:
+        text_width = self.text_width
+        space = text_width(" ", font)
+        lines = 0
+        for paragraph in text.split("\n"):
+            lines += 1
+            used = 0
+            for word in paragraph.split():
+                word_width = text_width(word, font)
+                if used and used + space + word_width > width:
+                    lines += 1
+                    used = word_width
+                else:
+                    used += word_width + (space if used else 0)
+        return lines
@@ -0,0 +1,26 @@
+import tkinter as tk
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+# Runs callbacks once per Tk idle pass. Scheduling the same key again before
+# then replaces the pending call, so a burst of events costs one update.
+class FrameScheduler:
+    def __init__(self, root: tk.Misc):
+        self.root = root
+        self._pending: Dict[Hashable, Tuple[Callable[..., Any], tuple]] = {}
+        self._scheduled = False
+
+    def schedule(self, key: Hashable, callback: Callable[..., Any], *args):
+        self._pending[key] = (callback, args)
+        if not self._scheduled:
+            self._scheduled = True
+            self.root.after_idle(self._run)
+
+    def cancel(self, key: Hashable):
+        self._pending.pop(key, None)
+
+    def _run(self):
+        pending, self._pending = self._pending, {}
+        self._scheduled = False
+        for callback, args in pending.values():
+            callback(*args)
@@ -0,0 +1,104 @@
+import atexit
+import os
+import shutil
+import subprocess
+import tkinter as tk
+from typing import List, Tuple
+
+from pyweb_api.CSS import StyleSheet
+from pyweb_api.DOM import Element
+from pyweb_api.Window import Location
+from pyweb_client.fonts import FontRegistry, TextMeasurer
+from pyweb_client.images import ImageCache
+from pyweb_client.layout import LayoutEngine, Box, ApproxTextMetrics
+from pyweb_client.reflow import Reflow
+from pyweb_client.render import render_element
+from pyweb_client.style import StyleResolver
+
+
+class MessageLog:
+    def __init__(self):
+        self.messages: List[Tuple[str, str]] = []
+
+    def log(self, *args):
+        self.messages.append(("log", " ".join(str(a) for a in args)))
+
+    def warn(self, *args):
+        self.messages.append(("warn", " ".join(str(a) for a in args)))
+
+    def error(self, *args):
+        self.messages.append(("error", " ".join(str(a) for a in args)))
+
+
+# The parts of PyWebClient that render.py and the layout code use, without the
+# browser shell around them. root is only needed to create widgets, see open_display
+# for getting one without a display.
+class HeadlessClient:
+    def __init__(self, root: tk.Misc | None = None, stylesheet: StyleSheet | None = None):
+        self.root = root
+        self.styles = StyleResolver(stylesheet)
+        self.fonts = FontRegistry(root)
+        # real font metrics need the display, layout falls back to approximations without one
+        self.text_metrics = TextMeasurer(self.fonts if root is not None else ApproxTextMetrics())
+        self.image_cache = ImageCache()
+        self.console = MessageLog()
+        self.location = Location(lambda url: None)
+        self.block_renderer = None
+        self.reflow = Reflow(self)
+        self.requested_images: List[Tuple[str, Tuple[int, int]]] = []
+
+    def request_image(self, widget, src, size):
+        self.requested_images.append((src, size))
+
+    def load_pending_images(self):
+        pass
+
+    def layout(self, element: Element, width: int, metrics=None) -> Box:
+        text = self.text_metrics if metrics is None else TextMeasurer(metrics)
+        return LayoutEngine(self.styles, text).layout(element, width)
+
+    def render(self, element: Element) -> tk.Frame:
+        # builds the widget tree into a fresh frame and lets Tk compute its geometry
+        frame = tk.Frame(self.root)
+        frame.pack(fill="both", expand=True)
+        render_element(frame, element, self)
+        frame.update_idletasks()
+        return frame
+
+
+def start_xvfb() -> subprocess.Popen:
+    # starts Xvfb on a free display number and points DISPLAY at it; stopped at exit
+    read_fd, write_fd = os.pipe()
+    try:
+        server = subprocess.Popen(["Xvfb", "-displayfd", str(write_fd), "-nolisten", "tcp", "-screen", "0",
+                                   "1280x1024x24"], pass_fds=(write_fd,),
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    finally:
+        os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        # Xvfb writes the display number once it accepts connections, nothing if it fails to start
+        number = f.readline().strip()
+    if not number:
+        server.wait()
+        raise tk.TclError("Xvfb failed to start")
+    atexit.register(_stop_xvfb, server)
+    os.environ["DISPLAY"] = f":{number}"
+    return server
+
+
+def _stop_xvfb(server: subprocess.Popen):
+    server.terminate()
+    try:
+        server.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def open_display() -> tk.Tk:
+    # without DISPLAY, starts a private Xvfb when it is installed;
+    # raises tk.TclError when there is still no display to connect to
+    if not os.environ.get("DISPLAY") and shutil.which("Xvfb"):
+        start_xvfb()
+    root = tk.Tk()
+    root.withdraw()
+    return root
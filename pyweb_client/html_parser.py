@@ -1,25 +1,302 @@
-from html.parser import HTMLParser
-from pyweb_api.DOM import Element, TAG_MAP
+import gc
+import re
+import threading
+from functools import lru_cache
+from html import unescape
+from sys import intern
+from typing import Dict, List
 
-class PyHTMLParser(HTMLParser):
+from pyweb_api.CSS import StyleSheet
+from pyweb_api.DOM import Element, Text, TAG_MAP
+from pyweb_api.Window import Document
+from pyweb_client import tracing
+from pyweb_client.decoding import StreamDecoder
+from pyweb_client.scripts import is_python_script
+
+# part of the DOM snapshot keys (see snapshot.source_key): bump it with any change
+# to the trees the parser builds, so snapshots of the old trees are not used
+PARSER_VERSION = 1
+
+# elements that never have children or an end tag
+VOID_ELEMENTS = frozenset({"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+                           "source", "track", "wbr"})
+# elements whose content is text up to their end tag; only the second set decodes entities
+RAW_TEXT_ELEMENTS = frozenset({"script", "style", "textarea", "title"})
+ESCAPABLE_RAW_TEXT_ELEMENTS = frozenset({"textarea", "title"})
+_P_CLOSERS = frozenset({"address", "article", "aside", "blockquote", "details", "div", "dl", "fieldset",
+                        "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header",
+                        "hr", "main", "menu", "nav", "ol", "p", "pre", "section", "table", "ul"})
+# open element -> start tags that implicitly end it
+IMPLIED_END_TAGS: Dict[str, frozenset] = {
+    "p": _P_CLOSERS,
+    "li": frozenset({"li"}),
+    "dt": frozenset({"dt", "dd"}),
+    "dd": frozenset({"dt", "dd"}),
+    "option": frozenset({"option", "optgroup"}),
+    "optgroup": frozenset({"optgroup"}),
+    "tr": frozenset({"tr", "tbody", "thead", "tfoot"}),
+    "td": frozenset({"td", "th", "tr", "tbody", "thead", "tfoot"}),
+    "th": frozenset({"td", "th", "tr", "tbody", "thead", "tfoot"}),
+    "thead": frozenset({"tbody", "tfoot"}),
+    "tbody": frozenset({"tbody", "tfoot"}),
+}
+
+ATTR_VALUE_MAX = 4096  # a quoted attribute value running longer than this is taken as unterminated
+
+_MARKUP_RE = re.compile(r"<[a-zA-Z/!?]")
+# a quote only opens a value right after "="; elsewhere it is part of the attribute text
+_START_TAG_RE = re.compile(r"""<([a-zA-Z][^\t\n\f\r />]*)((?:[^>"'=]|=\s*"[^"]{0,%d}"|=\s*'[^']{0,%d}'"""
+                           r"""|=(?!\s*["'])|["'])*)>""" % (ATTR_VALUE_MAX, ATTR_VALUE_MAX))
+# for a start tag with an unterminated quoted value: it ends at the first ">"
+_START_TAG_TOLERANT_RE = re.compile(r"<([a-zA-Z][^\t\n\f\r />]*)([^>]*)>")
+_END_TAG_RE = re.compile(r"</([a-zA-Z][^\t\n\f\r />]*)[^>]*>")
+_ATTR_RE = re.compile(r"""([^\t\n\f\r />"'=][^\t\n\f\r />=]*)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\t\n\f\r >]+)))?""")
+_RAW_END_RES = {tag: re.compile(rf"</{tag}[\t\n\f\r />]", re.I) for tag in RAW_TEXT_ELEMENTS}
+
+
+def _start_tag_may_continue(buf: str, start: int) -> bool:
+    # whether more data could still complete the start tag at start, i.e. buf ends
+    # inside it: in a name, before its ">" or in a quoted value
+    rest = buf[start:]
+    return any(_START_TAG_RE.match(rest + tail) for tail in (">", "\">", "'>"))
+
+
+@lru_cache(maxsize=4096)
+def _parse_attrs(text: str) -> Dict[str, str]:
+    # shared between tags with the same attribute text; Element copies it
+    attrs = {}
+    for name, double, single, bare in _ATTR_RE.findall(text):
+        name = name.lower()
+        if name not in attrs:
+            value = double or single or bare
+            attrs[name] = unescape(value) if "&" in value else value
+    return attrs
+
+
+# Holds off the cyclic garbage collector while chunks are parsed. The tree is
+# young, reachable and all containers, so every collection during a parse finds
+# nothing, and once the tree outgrows the rest of the heap the full collections
+# walk the whole tree again and again: unpaused, a 4MB table page spent over a
+# third of its parse time in them. Allocations keep counting while paused, so
+# the collections owed run once the chunk is done, and across a page one young
+# collection per chunk takes the place of one per 700 containers. Nested and
+# concurrent parses share the pause; the collector is only turned back on if it
+# was on before.
+class _CollectorPause:
     def __init__(self):
-        super().__init__()
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._was_enabled = False
+
+    def __enter__(self):
+        with self._lock:
+            if self._depth == 0:
+                self._was_enabled = gc.isenabled()
+                gc.disable()
+            self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self._depth -= 1
+            if self._depth == 0 and self._was_enabled:
+                gc.enable()
+        return False
+
+
+_collector_pause = _CollectorPause()
+
+
+# Tokenizes with a handful of regexes over whatever has been fed so far and
+# builds the tree directly, so feed() can take arbitrarily split str or bytes.
+class PyHTMLParser:
+    def __init__(self, encoding: str | None = "utf-8"):
         self.root = Element("root")
         self.current = self.root
+        self.stylesheet = StyleSheet()
+        self.document: Document | None = None
+        # <script type="text/python"> elements in document order, run once the page is loaded
+        self.scripts: List[Element] = []
+        # of bytes fed; None sniffs it from a BOM or <meta charset>, see StreamDecoder
+        self.encoding = encoding
+        self._decoder = None
+        self._buf = ""
+        # text is only appended once the next tag shows up, so adjacent runs end up as one node
+        self._pending_text: List[str] = []
+        # set while inside script/style/textarea/title, whose content is not markup
+        self._raw_tag: str | None = None
+        # how much of _buf is known not to hold the end of the token it starts with,
+        # so waiting for a long token does not rescan it on every feed
+        self._scanned = 0
+
+    def feed(self, data: str | bytes):
+        if isinstance(data, bytes):
+            if self._decoder is None:
+                self._decoder = StreamDecoder(self.encoding)
+            data = self._decoder.decode(data)
+            self.encoding = self._decoder.encoding
+        with tracing.span("parse.feed", chars=len(data)), _collector_pause:
+            self._buf += data
+            self._parse(final=False)
+        tracing.count("chars_parsed", len(data))
+
+    def close(self):
+        if self._decoder is not None:
+            # a document shorter than the sniffed head only gets its encoding here
+            self._buf += self._decoder.decode(b"", final=True)
+            self.encoding = self._decoder.encoding
+        with tracing.span("parse.close"), _collector_pause:
+            self._parse(final=True)
+            self._flush_text()
+            while self.current is not self.root:
+                self._pop()
+            self.document = Document(self.root)
+
+    def open_elements(self) -> dict:
+        # open element -> number of children it had at this point, so the
+        # snapshot stays valid while another thread keeps feeding the parser
+        opened = {}
+        el = self.current
+        while el is not None:
+            opened[el] = len(el.children)
+            el = el.parent
+        return opened
+
+    def _parse(self, final: bool):
+        buf = self._buf
+        pos = 0
+        end = len(buf)
+        pending = self._pending_text
+        scanned, self._scanned = self._scanned, 0
+        while pos < end:
+            if self._raw_tag is not None:
+                # an end tag split across feeds is at most this long at the end of what was scanned
+                resume, scanned = scanned - len(self._raw_tag) - 3, 0
+                match = _RAW_END_RES[self._raw_tag].search(buf, max(pos, resume))
+                if match is None:
+                    if not final:
+                        self._scanned = end - pos
+                        break
+                    pending.append(buf[pos:])
+                    pos = end
+                    self._end_raw()
+                    break
+                pending.append(buf[pos:match.start()])
+                pos = match.start()
+                self._end_raw()
+                continue
+
+            match = _MARKUP_RE.search(buf, pos)
+            if match is None:
+                # keep a trailing "<" back, it may start a tag in the next chunk
+                stop = end if final or buf[-1] != "<" else end - 1
+                pending.append(buf[pos:stop])
+                pos = stop
+                break
+            start = match.start()
+            if start > pos:
+                pending.append(buf[pos:start])
+                pos = start
+            # only a token left waiting at the start of the buffer has been scanned before
+            resume, scanned = scanned if start == 0 else 0, 0
 
-    def handle_starttag(self, tag, attrs):
+            kind = buf[start + 1]
+            if kind == "!" and buf.startswith("<!--", start):
+                close = buf.find("-->", max(start + 4, resume - 2))
+                token_end = close + 3 if close != -1 else -1
+            elif kind in "!?":
+                close = buf.find(">", max(start, resume))
+                token_end = close + 1 if close != -1 else -1
+            elif kind == "/":
+                match = _END_TAG_RE.match(buf, start)
+                if match:
+                    token_end = match.end()
+                    self._end_tag(match.group(1).lower())
+                else:
+                    # "</" without a tag name: up to the next ">" is a bogus comment, as in html.parser
+                    close = buf.find(">", max(start, resume))
+                    token_end = close + 1 if close != -1 else -1
+            else:
+                match = _START_TAG_RE.match(buf, start)
+                if match is None and (final or not _start_tag_may_continue(buf, start)):
+                    # a quote that is never closed: the tag ends at the first ">"
+                    match = _START_TAG_TOLERANT_RE.match(buf, start)
+                token_end = match.end() if match else -1
+                if match:
+                    self._start_tag(match.group(1).lower(), match.group(2))
+
+            if token_end == -1:
+                if not final:
+                    # no end in sight yet, it may come with the next chunk
+                    self._scanned = end - start
+                    break
+                # unterminated markup at the end of the document is text
+                pending.append("<")
+                pos = start + 1
+                continue
+            pos = token_end
+
+        self._buf = buf[pos:]
+
+    def _start_tag(self, tag: str, attr_text: str):
+        self._flush_text()
+        tag = intern(tag)
+        current = self.current
+        while current.tag in IMPLIED_END_TAGS and tag in IMPLIED_END_TAGS[current.tag]:
+            self._pop()
+            current = self.current
+
+        attrs = _parse_attrs(attr_text) if attr_text.strip(" \t\n\r\f/") else None
         element_cls = TAG_MAP.get(tag)
-        if not element_cls:
-            el = Element(tag, dict(attrs), parent=self.current)
+        if element_cls is None:
+            el = Element(tag, attrs, parent=current)
         else:
-            el = element_cls(dict(attrs), parent=self.current)
-        self.current.append_child(el)
+            el = element_cls(attrs, parent=current)
+        # tree construction is not a mutation the renderer needs to hear about
+        current.children.append(el)
+
+        if tag in VOID_ELEMENTS or attr_text.endswith("/"):
+            return
         self.current = el
+        if tag in RAW_TEXT_ELEMENTS:
+            self._raw_tag = tag
+            if tag == "script" and is_python_script(el):
+                self.scripts.append(el)
+
+    def _end_tag(self, tag: str):
+        self._flush_text()
+        el = self.current
+        while el is not self.root and el.tag != tag:
+            el = el.parent
+        if el is self.root:
+            return  # stray end tag
+        while self.current is not el:
+            self._pop()
+        self._pop()
+
+    def _end_raw(self):
+        # the end tag itself is consumed by the regular end tag path
+        tag, self._raw_tag = self._raw_tag, None
+        raw = "".join(self._pending_text)
+        self._pending_text.clear()
+        if tag in ESCAPABLE_RAW_TEXT_ELEMENTS:
+            raw = unescape(raw)
+        if raw.strip():
+            # script text keeps its indentation, it may be code
+            self.current.children.append(Text(raw if tag == "script" else raw.strip()))
 
-    def handle_endtag(self, tag):
-        if self.current.parent:
-            self.current = self.current.parent
+    def _pop(self):
+        el = self.current
+        if el.tag == "style":
+            self.stylesheet.add("".join(c for c in el.children if isinstance(c, str)))
+        self.current = el.parent
 
-    def handle_data(self, data):
-        if data.strip():
-            self.current.append_child(data.strip())
+    def _flush_text(self):
+        if self._pending_text:
+            data = "".join(self._pending_text)
+            self._pending_text.clear()
+            if "&" in data:
+                data = unescape(data)
+            data = data.strip()
+            if data:
+                self.current.children.append(Text(data))
@@ -0,0 +1,116 @@
+import io
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from typing import Tuple
+
+from pyweb_api.DOM import Element
+from pyweb_client import tracing
+
+# PIL is imported on first decode; pages without images never load it
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from PIL import Image, ImageTk
+
+DEFAULT_IMAGE_SIZE = (150, 100)
+IMAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+PLACEHOLDER_COLOR = "#eeeeee"
+
+Size = Tuple[int, int]
+
+
+def image_size(element: Element) -> Size:
+    width, height = DEFAULT_IMAGE_SIZE
+    try:
+        width = int(element.attrs.get("width", "").replace("px", "").strip())
+    except ValueError:
+        pass
+    try:
+        height = int(element.attrs.get("height", "").replace("px", "").strip())
+    except ValueError:
+        pass
+    return width, height
+
+
+def decode_image(data: bytes | str, size: Size) -> 'Image.Image':
+    # raw bytes of a fetched image, or a local file path
+    from PIL import Image
+    with tracing.span("image.decode", width=size[0], height=size[1]):
+        im = Image.open(io.BytesIO(data) if isinstance(data, bytes) else data)
+        # JPEGs get scaled down by the decoder itself, so the full-size bitmap is never built
+        im.draft(im.mode, size)
+        # reducing_gap shrinks by an integer factor first, which is much cheaper than resampling the whole image
+        im = im.resize(size, reducing_gap=2.0)
+    tracing.count("images_decoded")
+    return im
+
+
+class ImageCache:
+    def __init__(self, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._photos: OrderedDict[Tuple[str, Size], 'ImageTk.PhotoImage'] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._photos)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _photo_bytes(photo: 'ImageTk.PhotoImage') -> int:
+        return photo.width() * photo.height() * 4
+
+    def get(self, src: str, size: Size) -> 'ImageTk.PhotoImage | None':
+        with self._lock:
+            photo = self._photos.get((src, size))
+            if photo is not None:
+                self._photos.move_to_end((src, size))
+            return photo
+
+    def put(self, src: str, size: Size, im: 'Image.Image') -> 'ImageTk.PhotoImage':
+        from PIL import ImageTk
+        # PhotoImage has to be created on the Tk thread
+        photo = ImageTk.PhotoImage(im)
+        with self._lock:
+            old = self._photos.pop((src, size), None)
+            if old is not None:
+                self._size -= self._photo_bytes(old)
+            self._photos[(src, size)] = photo
+            self._size += self._photo_bytes(photo)
+            # evicted images stay alive as long as a widget still shows them
+            while self._size > self.max_bytes and len(self._photos) > 1:
+                _, evicted = self._photos.popitem(last=False)
+                self._size -= self._photo_bytes(evicted)
+        return photo
+
+    def clear(self):
+        with self._lock:
+            self._photos.clear()
+            self._size = 0
+
+
+def _blank_photo(master: tk.Misc) -> tk.PhotoImage:
+    # one transparent pixel per Tk interpreter; giving a Label any image makes width/height pixels
+    root = master._root()
+    photo = getattr(root, "_pyweb_blank_photo", None)
+    if photo is None:
+        photo = root._pyweb_blank_photo = tk.PhotoImage(master=root, width=1, height=1)
+    return photo
+
+
+def image_placeholder(parent: tk.Widget, size: Size) -> tk.Label:
+    # reserves the image's box until it is loaded, so the page does not jump
+    return tk.Label(parent, image=_blank_photo(parent), width=size[0], height=size[1], compound="center",
+                    text="[Loading Image]", bg=PLACEHOLDER_COLOR)
+
+
+def show_photo(widget: tk.Label, photo: 'ImageTk.PhotoImage'):
+    widget.config(image=photo, text="")
+    widget.image = photo
+
+
+def show_image_error(widget: tk.Label, error: Exception):
+    widget.config(text="[Image Load Error]")
@@ -0,0 +1,107 @@
+import math
+from typing import List
+
+from pyweb_api.DOM import Element
+from pyweb_client import tracing
+from pyweb_client.canvas_render import TEXT_PADDING, LIST_ITEM_INDENT, _px
+from pyweb_client.fonts import DEFAULT_FONT, LINK_FONT, HEADING_FONT_SIZES, TextMeasurer, heading_font
+from pyweb_client.images import image_size
+from pyweb_client.render import SKIPPED_TAGS, TEXT_TAGS, element_text, list_item_texts
+from pyweb_client.style import StyleResolver
+
+# the canvas engine measures embedded controls once they exist; without widgets these stand in
+EMBEDDED_HEIGHTS = {"button": 30, "input": 25, "textarea": 90}
+
+
+def _font_size(font) -> int:
+    return abs(int(font[1])) if isinstance(font, tuple) and len(font) > 1 else DEFAULT_FONT[1]
+
+
+# Text metrics without a display: every character is a fixed fraction of the font size wide.
+# With a Tk root, fonts.FontRegistry provides the real ones.
+class ApproxTextMetrics:
+    CHAR_WIDTH = 0.55
+    LINE_HEIGHT = 1.25
+
+    def linespace(self, font) -> int:
+        return math.ceil(_font_size(font) * self.LINE_HEIGHT)
+
+    def text_width(self, text: str, font) -> int:
+        return math.ceil(len(text) * _font_size(font) * self.CHAR_WIDTH)
+
+
+class Box:
+    __slots__ = ("element", "x", "y", "width", "height", "children", "lines")
+
+    def __init__(self, element: Element, x: int, y: int, width: int):
+        self.element = element
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = 0
+        self.children: List[Box] = []
+        self.lines = 0
+
+    def __repr__(self):
+        return f"<Box {self.element.tag} {self.x},{self.y} {self.width}x{self.height}>"
+
+
+# Computes element boxes with the canvas engine's box model (see CanvasRenderer._layout)
+# without creating any Tk objects, so layout costs can be measured headless.
+class LayoutEngine:
+    def __init__(self, styles: StyleResolver, text: TextMeasurer | None = None):
+        self.styles = styles
+        self.text = text or TextMeasurer(ApproxTextMetrics())
+
+    def layout(self, element: Element, width: int) -> Box:
+        with tracing.span("layout", width=width):
+            root = Box(element, 0, 0, width)
+            root.height = self._layout_children(root, element, 0, 0, width)
+        return root
+
+    def _layout_children(self, parent: Box, element: Element, x: int, y: int, width: int) -> int:
+        for child in element.children:
+            if isinstance(child, Element):
+                y = self._layout(parent, child, x, y, width)
+        return y
+
+    def _layout(self, parent: Box, element: Element, x: int, y: int, width: int) -> int:
+        tag = element.tag
+        if tag in SKIPPED_TAGS or tag == "li":
+            return y
+        tk_style = self.styles.tk_style(element)
+        margin_x = tk_style["pack"].get("padx", 0)
+        margin_y = tk_style["pack"].get("pady", 0)
+        box = Box(element, x + margin_x, y + margin_y, max(1, width - 2 * margin_x))
+        parent.children.append(box)
+
+        if tag in TEXT_TAGS or tag == "a":
+            font = LINK_FONT if tag == "a" else tk_style["widget"].get("font", DEFAULT_FONT)
+            if tag in HEADING_FONT_SIZES:
+                font = heading_font(tag)
+            box.lines = self.text.line_count(element_text(element), font, box.width - 2 * TEXT_PADDING)
+            box.height = box.lines * self.text.linespace(font) + 2 * TEXT_PADDING
+        elif tag in ("ul", "ol"):
+            for li, li_text in list_item_texts(element):
+                item = Box(li, box.x + LIST_ITEM_INDENT, box.y + box.height, box.width - LIST_ITEM_INDENT)
+                item.lines = self.text.line_count(li_text, DEFAULT_FONT, item.width - 2 * TEXT_PADDING)
+                item.height = item.lines * self.text.linespace(DEFAULT_FONT) + 2 * TEXT_PADDING
+                box.children.append(item)
+                box.height += item.height
+        elif tag == "br":
+            box.height = self.text.linespace(DEFAULT_FONT)
+        elif tag == "hr":
+            box.height = 2
+        elif tag == "img":
+            box.width, box.height = image_size(element)
+        elif tag in EMBEDDED_HEIGHTS:
+            box.height = EMBEDDED_HEIGHTS[tag]
+        else:
+            widget_opts = tk_style["widget"]
+            border = widget_opts.get("bd", 0) if widget_opts.get("relief", "flat") != "flat" else 0
+            inset = border + _px(self.styles.computed_style(element).get("padding"))
+            bottom = self._layout_children(box, element, box.x + inset, box.y + inset, box.width - 2 * inset)
+            box.height = bottom + inset - box.y
+            if "height" in widget_opts:
+                box.height = max(box.height, widget_opts["height"])
+        return box.y + box.height + margin_y
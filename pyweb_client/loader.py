@@ -0,0 +1,67 @@
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Any
+
+
+class LoadToken:
+    def __init__(self, loader: 'PageLoader', generation: int):
+        self._loader = loader
+        self._generation = generation
+
+    @property
+    def cancelled(self) -> bool:
+        return self._generation != self._loader.generation
+
+    def post(self, callback: Callable[..., Any], *args):
+        # hand a result back to the Tk thread; dropped if the load went stale meanwhile
+        if not self.cancelled:
+            self._loader.root.after(0, self._deliver, callback, args)
+
+    def _deliver(self, callback, args):
+        if not self.cancelled:
+            callback(*args)
+
+
+class PageLoader:
+    def __init__(self, root: tk.Misc, max_workers: int = 4):
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pyweb-loader")
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def cancel(self):
+        with self._lock:
+            self._generation += 1
+
+    def token(self) -> LoadToken:
+        # for work outside of the pool that should still stop with the current page
+        return LoadToken(self, self._generation)
+
+    def submit(self,
+               work: Callable[[LoadToken], Any],
+               on_done: Callable[[Any], None],
+               on_error: Callable[[Exception], None] | None = None) -> LoadToken:
+        token = self.token()
+
+        def run():
+            if token.cancelled:
+                return
+            try:
+                result = work(token)
+            except Exception as e:
+                if on_error:
+                    token.post(on_error, e)
+                return
+            token.post(on_done, result)
+
+        self._executor.submit(run)
+        return token
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
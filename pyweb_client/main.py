@@ -1,23 +1,58 @@
+import os
 import tkinter as tk
-from tkinter import filedialog, scrolledtext
-
-from pyweb_api.DOM import Div, P, Button
-from pyweb_api.Window import Location, Console
-from pyweb_client.html_parser import PyHTMLParser
-from pyweb_client.network import fetch_html
-from pyweb_client.render import render_element
+from collections import deque
+from tkinter import filedialog, scrolledtext, messagebox, ttk
+from typing import List
+
+from pyweb_api.DOM import set_mutation_observer
+from pyweb_api.Window import Console
+from pyweb_client.network import close_session
+from pyweb_client.fonts import FontRegistry, TextMeasurer
+from pyweb_client.images import ImageCache
+from pyweb_client.events import EventDelegator
+from pyweb_client.frames import FrameScheduler
+from pyweb_client.profiler import ProfilerPanel
+from pyweb_client.prefetch import Prefetcher
+from pyweb_client.parse_pool import shutdown_pool
+from pyweb_client.scripts import script_origins
+from pyweb_client.tab import Tab, LIVE
+from pyweb_client import tracing
+
+CONSOLE_MAX_LINES = 1000  # kept in the console widget, and pending between two frames
+TRACE_ENV = "PYWEB_TRACE"  # records from startup and writes a Chrome trace to this path on exit
+TABS_MAX_BYTES = 256 * 1024 * 1024  # estimated, see Tab.memory_bytes
+TAB_TITLE_CHARS = 28
 
 
 class PyWebClient:
     def __init__(self, root):
-        self.render_area_canvas = None
         self.root = root
         self.address_input = None
-        self.render_area = None
+        self.notebook = None
         self.console_output = None
+        self.profiler = None
+        self.trace_path = os.environ.get(TRACE_ENV)
+        if self.trace_path:
+            tracing.enable()
+
+        self.frames = FrameScheduler(self.root)
+        self._console_lines = deque(maxlen=CONSOLE_MAX_LINES)
+        self._console_dropped = 0
+        self._wheel_units = 0
 
-        self.location = Location(self._on_location_change)
         self.console = Console(self._render_log)
+        self.image_cache = ImageCache()
+        self.fonts = FontRegistry(self.root)
+        self.text_metrics = TextMeasurer(self.fonts)
+        self.virtualize = tk.BooleanVar(self.root, value=False)
+        self.render_engine = tk.StringVar(self.root, value="widgets")
+        set_mutation_observer(self._on_mutation)
+        self.events = EventDelegator(self)
+        self.prefetcher = Prefetcher(self)
+        self.tabs: List[Tab] = []
+        self.tab: Tab | None = None
+        # background tabs are frozen, then discarded, least recently used first, while over this
+        self.tab_memory_limit = TABS_MAX_BYTES
 
         # Maximize window and focus
         self.root.state('zoomed')  # For Windows/Linux
@@ -25,109 +60,129 @@ class PyWebClient:
 
         self.render_layout()
         self.build_menu()
+        self.events.install()
+        self.new_tab()
 
     def render(self):
         self.root.mainloop()
+        for tab in self.tabs:
+            tab.loader.shutdown()
+        self.prefetcher.shutdown()
+        shutdown_pool()
+        close_session()
+        if self.trace_path:
+            tracing.export_chrome_trace(self.trace_path)
 
     def on_open_file(self):
         file_path = filedialog.askopenfilename(filetypes=[("HTML files", "*.html")])
         if file_path:
-            self.location.navigate(f"file://{file_path}")
+            self.tab.location.navigate(f"file://{file_path}")
 
-    def _render_log(self, level, message):
-        if self.console_output:
-            self.console_output.insert(tk.END, f"<{level}>: {message}\n")
-            self.console_output.see(tk.END)
+    def set_scripts_allowed(self, allowed: bool):
+        # for the origin of the page on screen, which is loaded again to apply it
+        if self.tab.url:
+            (script_origins.allow if allowed else script_origins.block)(self.tab.url)
+            self.tab.reload()
 
-    def _on_location_change(self, url):
-        self.console.log(f"Navigating to: {url}")
-        self.clear_render_area()
+    def alert(self, message):
+        messagebox.showinfo("PyWeb", message, parent=self.root)
+
+    def _render_log(self, level, message):
+        if len(self._console_lines) == self._console_lines.maxlen:
+            self._console_dropped += 1
+        self._console_lines.append(f"<{level}>: {message}\n")
+        self.frames.schedule("console", self._flush_console)
+
+    def _flush_console(self):
+        if not self.console_output or not self._console_lines:
+            return
+        text = "".join(self._console_lines)
+        if self._console_dropped:
+            text = f"<warn>: {self._console_dropped} console lines dropped\n" + text
+        self._console_lines.clear()
+        self._console_dropped = 0
+        self.console_output.insert(tk.END, text)
+        # keep the widget itself bounded too
+        lines = int(self.console_output.index("end-1c").split(".")[0])
+        if lines > CONSOLE_MAX_LINES:
+            self.console_output.delete("1.0", f"{lines - CONSOLE_MAX_LINES + 1}.0")
+        self.console_output.see(tk.END)
+
+    def new_tab(self, url: str | None = None) -> Tab:
+        tab = Tab(self, self.notebook)
+        self.tabs.append(tab)
+        self.notebook.add(tab.container, text="New Tab")
+        self._activate(tab)
+        if url:
+            tab.location.navigate(url)
+        return tab
+
+    def close_tab(self, tab: Tab | None = None):
+        tab = tab or self.tab
+        index = self.tabs.index(tab)
+        self.tabs.remove(tab)
+        self.notebook.forget(tab.container)
+        tab.close()
+        if not self.tabs:
+            self.new_tab()
+        elif tab is self.tab:
+            self._activate(self.tabs[min(index, len(self.tabs) - 1)])
+
+    def _activate(self, tab: Tab):
+        if self.notebook.select() != str(tab.container):
+            self.notebook.select(tab.container)
+        if tab is self.tab:
+            return
+        self.tab = tab
+        self.prefetcher.page_changed()
+        tab.activate()
+        self._show_address(tab.url or "app://home")
+        self.enforce_tab_memory()
+
+    def _on_tab_changed(self, event):
+        selected = self.notebook.select()
+        for tab in self.tabs:
+            if str(tab.container) == selected:
+                self._activate(tab)
+                return
+
+    def tab_navigated(self, tab: Tab, url: str):
+        self.notebook.tab(tab.container, text=url if len(url) <= TAB_TITLE_CHARS else url[:TAB_TITLE_CHARS - 1] + "…")
+        if tab is self.tab:
+            self._show_address(url)
+
+    def _show_address(self, url: str):
         self.address_input.delete(0, tk.END)
         self.address_input.insert(0, url)
 
-        if url == "app://home":
-            root_dom_element = Div()
-            p = P()
-            p.append_child("ברוך הבא ל-PyWeb Client!")
-            root_dom_element.append_child(p)
-
-
-            btn = Button(attrs={"value": "Click"})
-
-            def click_test(event):
-                self.console.log(event)
-                btn.set_text("Clicked!")
-
-            root_dom_element.append_child(btn)
-            btn.add_event_listener("click", click_test)
-
-
-            render_element(self.render_area, root_dom_element, self)
-            self.console.log("Home page rendered.")
-
-        elif url == "app://example_page":
-            root_dom_element = Div()
-            root_dom_element.append_child(P())
-            root_dom_element.children[-1].append_child("זהו דף לדוגמה.")
-            btn = Button(attrs={"value": "חזור לדף הבית"})
-            root_dom_element.append_child(btn)
-            render_element(self.render_area, root_dom_element, self)
-            self.console.log("Example page rendered.")
-
-        elif url.startswith("file://"):
-            file_path = url[len("file://"):]
-            self._load_html_file(file_path)
-
-        elif url.startswith("http"):
-            try:
-                content = fetch_html(url)
-                parser = PyHTMLParser()
-                parser.feed(content)
-                render_element(self.render_area, parser.root, self)
-            except Exception as e:
-                content = P()
-                content.children.append(f"ERROR: {e}")
-                render_element(self.render_area, content, self)
-
-        elif url.startswith("/"):
-            try:
-                content = fetch_html(self.address_input.get() + url)
-                parser = PyHTMLParser()
-                parser.feed(content)
-                render_element(self.render_area, parser.root, self)
-            except Exception as e:
-                content = P()
-                content.children.append(f"ERROR: {e}")
-                render_element(self.render_area, content, self)
-
-        else:
-            self.console.error(f"Unknown URL scheme or page: {url}")
-            root_dom_element = Div()
-            root_dom_element.append_child(P())
-            root_dom_element.children[-1].append_child(f"שגיאה: לא ניתן לטעון את הכתובת: {url}")
-            render_element(self.render_area, root_dom_element, self)
-
-    def _load_html_file(self, file_path):
-        try:
-            with open(file_path, 'r') as f:
-                self.console.log(f"Selected file: {file_path}")
-                parser = PyHTMLParser()
-                parser.feed(f.read())
-                render_element(self.render_area, parser.root, self)
-                self.console.log(f'file {file_path} rendered!')
-        except Exception as e:
-            self.console.error(e)
-
-    def clear_render_area(self):
-        for widget in self.render_area.winfo_children():
-            widget.destroy()
-
-    def _on_render_area_conf(self, event):
-        self.render_area_canvas.configure(scrollregion=self.render_area_canvas.bbox("all"))
+    def enforce_tab_memory(self):
+        # freezing keeps the DOM, so it is tried on every background tab before anything is discarded
+        total = sum(tab.memory_bytes() for tab in self.tabs)
+        background = sorted((tab for tab in self.tabs if tab is not self.tab), key=lambda tab: tab.last_active)
+        for release in (Tab.freeze, Tab.discard):
+            for tab in background:
+                if total <= self.tab_memory_limit:
+                    return
+                before = tab.memory_bytes()
+                release(tab)
+                total -= before - tab.memory_bytes()
+                if tab.state != LIVE:
+                    self.console.log(f"Tab {tab.url} {tab.state} to stay within the tab memory limit.")
+
+    def _on_mutation(self, element):
+        # may run on a script thread: the tab list is only read. An element outside of any
+        # document belongs to the tab that renders the tree it hangs in, if any
+        document = element._document
+        top = element
+        if document is None:
+            while top.parent is not None:
+                top = top.parent
+        for tab in self.tabs:
+            if tab.document is document if document is not None else tab.renders(top):
+                tab.reconciler.mark(element)
+                return
 
     def _on_mouse_wheel(self, event):
-        self.console.log(f"Mouse Wheel Event: {event}")
-
         scroll_val = 0
         if event.num == 5 or (hasattr(event, 'delta') and event.delta < 0):  # Scroll Down
             scroll_val = 1
@@ -135,7 +190,14 @@ class PyWebClient:
             scroll_val = -1
 
         if scroll_val != 0:
-            self.render_area_canvas.yview_scroll(scroll_val, "units")
+            # a fast wheel fires many events per frame, they are applied together
+            self._wheel_units += scroll_val
+            self.frames.schedule("wheel", self._apply_wheel)
+
+    def _apply_wheel(self):
+        units, self._wheel_units = self._wheel_units, 0
+        if units:
+            self.tab.render_area_canvas.yview_scroll(units, "units")
 
     def render_layout(self):
         self.root.title("PyWeb Client v0")
@@ -145,17 +207,19 @@ class PyWebClient:
         top_bar = tk.Frame(self.root, pady=5, relief="groove")
         top_bar.pack(fill="x", padx=10, pady=(10, 0))
 
-        back_btn = tk.Button(top_bar, text="<", command=self.location.back, bg="#4285F4", relief="raised")
+        back_btn = tk.Button(top_bar, text="<", command=lambda: self.tab.location.back(), bg="#4285F4",
+                             relief="raised")
         back_btn.pack(side="left", pady=5, padx=(0, 5))
 
-        forward_btn = tk.Button(top_bar, text=">", command=self.location.forward, bg="#4285F4", relief="raised")
+        forward_btn = tk.Button(top_bar, text=">", command=lambda: self.tab.location.forward(), bg="#4285F4",
+                                relief="raised")
         forward_btn.pack(side="left", pady=5, padx=(0, 10))
         #
         self.address_input = tk.Entry(top_bar, width=60, relief="sunken", bd=2, bg="white")
         self.address_input.insert(0, "app://home")
         self.address_input.pack(side="left", pady=5, fill="y")
         #
-        go_btn = tk.Button(top_bar, text="Go", command=lambda: self.location.navigate(self.address_input.get()),
+        go_btn = tk.Button(top_bar, text="Go", command=lambda: self.tab.location.navigate(self.address_input.get()),
                            bg="#4285F4",
                            relief="raised")
         go_btn.pack(side="left", pady=5)
@@ -163,23 +227,24 @@ class PyWebClient:
         file_btn = tk.Button(top_bar, text="Open HTML", command=self.on_open_file, bg="#34A853", relief="raised")
         file_btn.pack(side="left", padx=(10, 0), pady=5)
 
-        # Console area - We pack it FIRST with side=bottom
-        self.console_output = scrolledtext.ScrolledText(self.root, height=8, bg="black", fg="lime",
-                                                        insertbackground="black")
-        self.console_output.pack(side="bottom", fill="x", padx=10, pady=(5, 10))
-
-        # Render area - This will now fill the remaining space
-        self.render_area_canvas = tk.Canvas(self.root, borderwidth=0)
-        self.render_area = tk.Frame(self.render_area_canvas)
-        self.vsb = tk.Scrollbar(self.root, orient="vertical", command=self.render_area_canvas.yview)
-        self.render_area_canvas.configure(yscrollcommand=self.vsb.set)
-        #
-        self.vsb.pack(side="right", fill="y", pady=(10, 0))
-        self.render_area_canvas.pack(side="left", fill="both", expand=True, padx=(10, 0), pady=(10, 0))
+        new_tab_btn = tk.Button(top_bar, text="+", command=lambda: self.new_tab("app://home"), relief="raised")
+        new_tab_btn.pack(side="left", padx=(10, 0), pady=5)
 
-        self.render_area_canvas.create_window((0, 0), window=self.render_area, anchor="nw")
+        # Console area - We pack it FIRST with side=bottom, the profiler panel sits to its right
+        bottom_bar = tk.Frame(self.root)
+        bottom_bar.pack(side="bottom", fill="x", padx=10, pady=(5, 10))
+        self.profiler = ProfilerPanel(bottom_bar, self)
+        self.profiler.pack(side="right", fill="y", padx=(5, 0))
+        self.console_output = scrolledtext.ScrolledText(bottom_bar, height=8, bg="black", fg="lime",
+                                                        insertbackground="black")
+        self.console_output.pack(side="left", fill="x", expand=True)
 
-        self.render_area.bind("<Configure>", self._on_render_area_conf)
+        # Tabs - each one brings its own render area (see Tab), filling the remaining space
+        self.notebook = ttk.Notebook(self.root)
+        self.notebook.pack(side="left", fill="both", expand=True, padx=(10, 0), pady=(10, 0))
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+        self.root.bind("<Control-t>", lambda e: self.new_tab("app://home"))
+        self.root.bind("<Control-w>", lambda e: self.close_tab())
 
         # Bind mouse wheel scrolling
         self.root.bind_all("<MouseWheel>", self._on_mouse_wheel)  # For Windows and MacOS
@@ -193,13 +258,29 @@ class PyWebClient:
         menubar = tk.Menu(self.root)
 
         file_menu = tk.Menu(menubar, tearoff=0)
+        file_menu.add_command(label="New Tab", command=lambda: self.new_tab("app://home"), accelerator="Ctrl+T")
+        file_menu.add_command(label="Close Tab", command=lambda: self.close_tab(), accelerator="Ctrl+W")
         file_menu.add_command(label="Open", command=self.on_open_file)
+        file_menu.add_command(label="Export Chrome Trace...", command=self.profiler.export)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.root.quit)
         menubar.add_cascade(label="File", menu=file_menu)
 
+        view_menu = tk.Menu(menubar, tearoff=0)
+        view_menu.add_radiobutton(label="Widget Engine", variable=self.render_engine, value="widgets")
+        view_menu.add_radiobutton(label="Canvas Engine", variable=self.render_engine, value="canvas")
+        view_menu.add_separator()
+        view_menu.add_checkbutton(label="Virtualized Rendering", variable=self.virtualize)
+        view_menu.add_separator()
+        view_menu.add_command(label="Allow Scripts on This Site", command=lambda: self.set_scripts_allowed(True))
+        view_menu.add_command(label="Block Scripts on This Site", command=lambda: self.set_scripts_allowed(False))
+        view_menu.add_separator()
+        view_menu.add_checkbutton(label="Record Performance Trace", variable=self.profiler.recording,
+                                  command=self.profiler.on_toggle)
+        menubar.add_cascade(label="View", menu=view_menu)
+
         history_menu = tk.Menu(menubar, tearoff=0)
-        history_menu.add_command(label="Print History", command=lambda: self.console.log(";-".join(self.location.history)))
+        history_menu.add_command(label="Print History", command=lambda: self.console.log(";-".join(self.tab.location.history)))
         menubar.add_cascade(label="History", menu=history_menu)
 
         help_menu = tk.Menu(menubar, tearoff=0)
@@ -209,11 +290,15 @@ class PyWebClient:
         self.root.config(menu=menubar)
 
 
-def run():
+def run(url: str | None = None):
     root = tk.Tk()
     client = PyWebClient(root=root)
+    if url:
+        # the window is drawn first, the page loads once Tk is idle
+        root.after_idle(client.tab.location.navigate, url)
     client.render()
 
 
 if __name__ == "__main__":
-    run()
+    import sys
+    run(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -1,6 +1,401 @@
-import requests
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, Iterable, Tuple, Dict
+
+from pyweb_client import tracing
+from pyweb_client.decoding import StreamDecoder, charset_from_content_type, decompressor, decompress
+
+# requests (with urllib3 and certifi) is most of the client's import time, and
+# sessions that only open local files never need it: it is imported on first use.
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    import requests
+
+STREAM_CHUNK_SIZE = 16 * 1024
+POOL_HOSTS = 16  # number of hosts kept alive at once
+POOL_PER_HOST = 6  # connections per host, like mainstream browsers
+MAX_PARALLEL_FETCHES = 16
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+CACHE_MAX_ENTRY_BYTES = 4 * 1024 * 1024
+CACHE_MAX_DISK_BYTES = 256 * 1024 * 1024
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pyweb", "http")
+
+_session: 'requests.Session | None' = None
+_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+
+
+def get_session() -> 'requests.Session':
+    global _session
+    with _lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            _session = requests.Session()
+            # pool_block makes POOL_PER_HOST a hard limit instead of opening throwaway connections
+            adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_PER_HOST, pool_block=True)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_FETCHES, thread_name_prefix="pyweb-fetch")
+        return _executor
+
+
+def _parse_http_date(value: str | None) -> float | None:
+    if not value:
+        return None
+    from email.utils import parsedate_to_datetime
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_cache_control(value: str | None) -> Dict[str, str | None]:
+    directives = {}
+    for part in (value or "").split(","):
+        if not part.strip():
+            continue
+        key, _, arg = part.partition("=")
+        directives[key.strip().lower()] = arg.strip().strip('"') or None
+    return directives
+
+
+class CacheEntry:
+    def __init__(self, url: str, headers: Dict[str, str], body: bytes, encoding: str | None,
+                 content_encoding: str | None = None):
+        from requests.structures import CaseInsensitiveDict
+        self.url = url
+        self.headers = CaseInsensitiveDict(headers)
+        # as it came over the wire: still compressed when content_encoding is set
+        self.body = body
+        self.encoding = encoding
+        self.content_encoding = content_encoding
+        self.stored_at = time.time()
+        self.freshness = 0.0
+        self._update_freshness()
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.headers.items())
+
+    @property
+    def etag(self) -> str | None:
+        return self.headers.get("ETag")
+
+    @property
+    def last_modified(self) -> str | None:
+        return self.headers.get("Last-Modified")
+
+    def _update_freshness(self):
+        cache_control = parse_cache_control(self.headers.get("Cache-Control"))
+        try:
+            age = float(self.headers.get("Age", 0))
+        except ValueError:
+            age = 0.0
+        self.stored_at -= age
+
+        if "no-cache" in cache_control:
+            self.freshness = 0.0
+        elif cache_control.get("max-age") is not None:
+            try:
+                self.freshness = float(cache_control["max-age"])
+            except ValueError:
+                self.freshness = 0.0
+        else:
+            expires = _parse_http_date(self.headers.get("Expires"))
+            date = _parse_http_date(self.headers.get("Date")) or self.stored_at
+            self.freshness = max(0.0, expires - date) if expires else 0.0
+
+    def is_fresh(self) -> bool:
+        return time.time() - self.stored_at < self.freshness
+
+    def validators(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def revalidated(self, headers: Dict[str, str]) -> 'CacheEntry':
+        # a 304 carries updated caching headers but no body. The result is a new entry:
+        # HttpCache accounts for an entry's size when it is stored, so stored ones are not changed
+        updated = dict(self.headers)
+        for key in ("Cache-Control", "Expires", "Date", "Age", "ETag", "Last-Modified"):
+            if key in headers:
+                updated[key] = headers[key]
+        return CacheEntry(self.url, updated, self.body, self.encoding, self.content_encoding)
+
+    def content(self) -> bytes:
+        return decompress(self.body, self.content_encoding)
+
+    def text(self) -> str:
+        # without a stored encoding the body is sniffed again, see StreamDecoder
+        return StreamDecoder(self.encoding).decode(self.content(), final=True)
+
+    def iter_text(self, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+        # decompresses and decodes a chunk at a time
+        inflate = decompressor(self.content_encoding)
+        decoder = StreamDecoder(self.encoding)
+        body = memoryview(self.body)
+        for start in range(0, len(body), chunk_size):
+            data = body[start:start + chunk_size].tobytes()
+            text = decoder.decode(inflate.decompress(data) if inflate is not None else data)
+            if text:
+                yield text
+        text = decoder.decode(inflate.flush() if inflate is not None else b"", final=True)
+        if text:
+            yield text
+
+    @staticmethod
+    def storable(headers) -> bool:
+        cache_control = parse_cache_control(headers.get("Cache-Control"))
+        return "no-store" not in cache_control and headers.get("Vary", "").strip() != "*"
+
+
+class HttpCache:
+    def __init__(self,
+                 max_bytes: int = CACHE_MAX_BYTES,
+                 max_entry_bytes: int = CACHE_MAX_ENTRY_BYTES,
+                 disk_dir: str | None = None,
+                 max_disk_bytes: int = CACHE_MAX_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, url: str) -> CacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+                return entry
+        entry = self._read_disk(url)
+        if entry is not None:
+            self._put_memory(url, entry)
+        return entry
+
+    def put(self, url: str, entry: CacheEntry):
+        self._put_memory(url, entry)
+        self._write_disk(url, entry)
+
+    def remove(self, url: str):
+        with self._lock:
+            entry = self._entries.pop(url, None)
+            if entry is not None:
+                self._size -= entry.size
+        if self.disk_dir:
+            try:
+                os.remove(self._disk_path(url))
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _put_memory(self, url: str, entry: CacheEntry):
+        with self._lock:
+            old = self._entries.pop(url, None)
+            if old is not None:
+                self._size -= old.size
+            if entry.size > self.max_entry_bytes:
+                return
+            self._entries[url] = entry
+            self._size += entry.size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.size
+
+    def _disk_path(self, url: str) -> str:
+        return os.path.join(self.disk_dir, hashlib.sha256(url.encode()).hexdigest())
+
+    def _read_disk(self, url: str) -> CacheEntry | None:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(url), "rb") as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url:
+            return None
+        entry = CacheEntry(url, meta["headers"], body, meta["encoding"], meta.get("content_encoding"))
+        entry.stored_at = meta["stored_at"]
+        entry.freshness = meta["freshness"]
+        return entry
+
+    def _write_disk(self, url: str, entry: CacheEntry):
+        if not self.disk_dir:
+            return
+        meta = {"url": url, "headers": dict(entry.headers), "encoding": entry.encoding,
+                "content_encoding": entry.content_encoding, "stored_at": entry.stored_at,
+                "freshness": entry.freshness}
+        path = self._disk_path(url)
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(json.dumps(meta).encode() + b"\n")
+                f.write(entry.body)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            return
+        self._trim_disk()
+
+    def _trim_disk(self):
+        files = []
+        for name in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+http_cache = HttpCache(disk_dir=CACHE_DIR)
+
+
+def _cached_get(url: str, stream: bool = False) -> Tuple[CacheEntry | None, 'requests.Response | None']:
+    # returns the cache entry when it can be used as-is, otherwise the live response
+    entry = http_cache.get(url)
+    if entry is not None and entry.is_fresh():
+        tracing.count("http_cache.hits")
+        return entry, None
+
+    headers = entry.validators() if entry is not None else {}
+    with tracing.span("fetch.request", url=url):
+        response = get_session().get(url, headers=headers, stream=stream)
+    if response.status_code == 304 and entry is not None:
+        response.close()
+        entry = entry.revalidated(response.headers)
+        http_cache.put(url, entry)
+        tracing.count("http_cache.revalidated")
+        return entry, None
 
-def fetch_html(url: str) -> str:
-    response = requests.get(url)
     response.raise_for_status()
-    return response.text
+    return None, response
+
+
+def _store(url: str, response: 'requests.Response', body: bytes, encoding: str | None = None,
+           content_encoding: str | None = None):
+    if CacheEntry.storable(response.headers):
+        # not response.encoding: requests assumes ISO-8859-1 for any text/* without a charset
+        encoding = encoding or charset_from_content_type(response.headers.get("Content-Type"))
+        http_cache.put(url, CacheEntry(url, response.headers, body, encoding, content_encoding))
+
+
+def fetch_html(url: str) -> str:
+    with tracing.span("fetch", url=url):
+        return "".join(stream_html(url))
+
+
+def fetch_bytes(url: str) -> bytes:
+    with tracing.span("fetch", url=url):
+        entry, response = _cached_get(url)
+        if entry is not None:
+            return entry.content()
+        _store(url, response, response.content)
+        tracing.count("bytes_fetched", len(response.content))
+        return response.content
+
+
+def cached_html(url: str) -> str | None:
+    # the body of a fresh cached response, without touching the network
+    entry = http_cache.get(url)
+    if entry is not None and entry.is_fresh():
+        return entry.text()
+    return None
+
+
+def stream_html(url: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    # gzip and deflate bodies are decompressed here a chunk at a time and cached compressed;
+    # without a charset in Content-Type the encoding is sniffed from the body
+    entry, response = _cached_get(url, stream=True)
+    if entry is not None:
+        yield from entry.iter_text(chunk_size)
+        return
+
+    with response:
+        content_encoding = response.headers.get("Content-Encoding")
+        inflate = decompressor(content_encoding)
+        if inflate is None:
+            # identity, or an encoding urllib3 decodes itself
+            content_encoding = None
+            chunks = response.iter_content(chunk_size=chunk_size)
+        else:
+            chunks = response.raw.stream(chunk_size, decode_content=False)
+        decoder = StreamDecoder(charset_from_content_type(response.headers.get("Content-Type")))
+        body = bytearray() if CacheEntry.storable(response.headers) else None
+        for chunk in chunks:
+            tracing.count("bytes_fetched", len(chunk))
+            if body is not None:
+                body.extend(chunk)
+            text = decoder.decode(inflate.decompress(chunk) if inflate is not None else chunk)
+            if text:
+                yield text
+        text = decoder.decode(inflate.flush() if inflate is not None else b"", final=True)
+        if text:
+            yield text
+    if body is not None:
+        # a guess is made again from the whole body when it is replayed
+        _store(url, response, bytes(body), None if decoder.guessed else decoder.encoding, content_encoding)
+
+
+def fetch_all(urls: Iterable[str]) -> Iterator[Tuple[str, bytes | Exception]]:
+    # yields (url, body or the error it failed with) in completion order
+    executor = _get_executor()
+    futures = {executor.submit(fetch_bytes, url): url for url in dict.fromkeys(urls)}
+    try:
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                yield futures[future], e
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def close_session():
+    global _session, _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,101 @@
+import mmap
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from pyweb_client import tracing
+from pyweb_client.html_parser import PyHTMLParser
+from pyweb_client.snapshot import (SnapshotCache, ParsedPage, snapshot_cache, source_key, dump_tree, load_tree,
+                                   page_from_tree, load_page)
+
+# one core is left to the Tk thread; on a single core the pool would only add overhead
+PARSE_POOL_WORKERS = min(8, (os.cpu_count() or 1) - 1)
+# below this the pickling round trip costs more than parsing on the calling thread
+PARSE_POOL_MIN_BYTES = 64 * 1024
+# local files from this size on are memory-mapped and fed to the parser in chunks
+FILE_MAP_MIN_BYTES = 8 * 1024 * 1024
+FILE_CHUNK_BYTES = 1024 * 1024
+
+_pool: ProcessPoolExecutor | None = None
+_lock = threading.Lock()
+
+
+def _parse_to_snapshot(data: bytes, encoding: str | None) -> bytes:
+    # runs in a worker process; the tree comes back in the compact snapshot format
+    parser = PyHTMLParser(encoding)
+    parser.feed(data)
+    parser.close()
+    return dump_tree(parser.root)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            # forking a process that runs Tk and worker threads is unsafe, workers start fresh
+            _pool = ProcessPoolExecutor(max_workers=PARSE_POOL_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+# Parses pages in a process pool shared by all tabs, so several large pages parse
+# in parallel instead of contending for the GIL. Blocks until the page is parsed:
+# call it from a loader thread. Snapshot hits skip parsing altogether; small pages,
+# a broken pool and machines without a spare core use load_page on the calling thread.
+def parse_page(data: bytes, cache: SnapshotCache = snapshot_cache, encoding: str | None = "utf-8") -> ParsedPage:
+    if PARSE_POOL_WORKERS < 1 or len(data) < PARSE_POOL_MIN_BYTES:
+        return load_page(data, cache, encoding=encoding)
+    key = source_key(data, encoding)
+    with tracing.span("snapshot.load"):
+        root = cache.load(key)
+    if root is None:
+        try:
+            with tracing.span("parse.process", bytes=len(data)):
+                tree = get_pool().submit(_parse_to_snapshot, data, encoding).result()
+        except (BrokenProcessPool, OSError):
+            shutdown_pool()
+            return load_page(data, cache, encoding=encoding)
+        with tracing.span("parse.load_tree"):
+            root = load_tree(tree)
+        cache.write(key, tree)
+    return page_from_tree(root)
+
+
+# Opens a local file, in whatever encoding its BOM or <meta charset> declares
+# (UTF-8 otherwise). Large files are mapped rather than read: the source is
+# hashed in place and decoded a chunk at a time, so besides the tree only a
+# chunk of the document is in memory at once. They parse on the calling
+# thread, handing them to the pool would copy them whole.
+def load_file(path: str, cache: SnapshotCache = snapshot_cache) -> ParsedPage:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < FILE_MAP_MIN_BYTES:
+            return parse_page(f.read(), cache, encoding=None)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return _parse_mapped(data, cache)
+
+
+def _parse_mapped(data: mmap.mmap, cache: SnapshotCache) -> ParsedPage:
+    key = source_key(data, None)
+    with tracing.span("snapshot.load"):
+        root = cache.load(key)
+    if root is not None:
+        tracing.count("snapshot.hits")
+        return page_from_tree(root)
+    parser = PyHTMLParser(encoding=None)
+    with tracing.span("parse.file", bytes=len(data)):
+        for start in range(0, len(data), FILE_CHUNK_BYTES):
+            parser.feed(data[start:start + FILE_CHUNK_BYTES])
+        parser.close()
+    with tracing.span("snapshot.store"):
+        cache.store(key, parser.root)
+    return ParsedPage(parser.root, parser.stylesheet, parser.document, parser.scripts)
+
+
+def shutdown_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
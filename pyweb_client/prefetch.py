@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from pyweb_api.DOM import Element
+from pyweb_client import tracing
+from pyweb_client.network import stream_html, cached_html
+from pyweb_client.snapshot import ParsedPage, load_page
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pyweb_client.main import PyWebClient
+
+PREFETCH_MAX_CONCURRENT = 2
+PREFETCH_BUDGET_BYTES = 4 * 1024 * 1024  # per page the user is on; a prefetch over it is abandoned
+PREFETCH_MAX_PAGES = 8
+PREFETCH_TTL = 300.0  # seconds a prefetched page may be used for, like the prefetch cache of browsers
+PREFETCH_HOVER_DELAY_MS = 80  # hovering shorter than this is just the pointer passing by
+PREFETCH_IDLE_DELAY_MS = 2000
+PREFETCH_IDLE_LINKS = 4
+
+
+class PrefetchBudgetExceeded(Exception):
+    pass
+
+
+def link_target(element: Element | None) -> str | None:
+    # the absolute http(s) href of element or the link around it; relative links are not prefetched
+    while element is not None:
+        if element.tag == "a":
+            href = element.attrs.get("href", "")
+            return href if href.startswith(("http://", "https://")) else None
+        element = element.parent
+    return None
+
+
+# Fetches and parses pages the user is likely to open next: the target of a link
+# hovered for PREFETCH_HOVER_DELAY_MS, and the first links of a page once it has
+# been idle for a while. Prefetches have their own workers, so they survive the
+# navigation they anticipate, and share a byte budget that is reset per page.
+# take() hands a prefetched page over to the navigation, waiting for it if needed.
+class Prefetcher:
+    def __init__(self, cl: 'PyWebClient',
+                 max_concurrent: int = PREFETCH_MAX_CONCURRENT,
+                 budget_bytes: int = PREFETCH_BUDGET_BYTES,
+                 max_pages: int = PREFETCH_MAX_PAGES,
+                 ttl: float = PREFETCH_TTL):
+        self.cl = cl
+        self.max_concurrent = max_concurrent
+        self.budget_bytes = budget_bytes
+        self.max_pages = max_pages
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="pyweb-prefetch")
+        self._lock = threading.Lock()
+        # url -> (time it was requested, future of the parsed page)
+        self._pages: OrderedDict[str, tuple] = OrderedDict()
+        self._spent = 0
+        self._hover_job = None
+        self._idle_job = None
+
+    def page_changed(self):
+        # a new page gets a fresh budget; pending hover and idle prefetches of the old one are dropped
+        self.cancel_hover()
+        if self._idle_job is not None:
+            self.cl.root.after_cancel(self._idle_job)
+            self._idle_job = None
+        with self._lock:
+            self._spent = 0
+
+    def hover(self, element: Element | None):
+        self.cancel_hover()
+        url = link_target(element)
+        if url is not None:
+            self._hover_job = self.cl.root.after(PREFETCH_HOVER_DELAY_MS, self.prefetch, url)
+
+    def cancel_hover(self):
+        if self._hover_job is not None:
+            self.cl.root.after_cancel(self._hover_job)
+            self._hover_job = None
+
+    def schedule_idle(self, links):
+        # links: the <a> elements of the page that just finished loading
+        if self._idle_job is not None:
+            self.cl.root.after_cancel(self._idle_job)
+        self._idle_job = self.cl.root.after(PREFETCH_IDLE_DELAY_MS, self._prefetch_idle, list(links))
+
+    def _prefetch_idle(self, links):
+        self._idle_job = None
+        urls = []
+        for link in links:
+            url = link_target(link)
+            if url is not None and url not in urls:
+                urls.append(url)
+        for url in urls[:PREFETCH_IDLE_LINKS]:
+            self.prefetch(url)
+
+    def prefetch(self, url: str):
+        self._hover_job = None
+        with self._lock:
+            entry = self._pages.get(url)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                return
+            in_flight = sum(1 for _, future in self._pages.values() if not future.done())
+            if in_flight >= self.max_concurrent or self._spent >= self.budget_bytes:
+                return
+            self._pages[url] = (time.monotonic(), self._executor.submit(self._fetch, url))
+            self._pages.move_to_end(url)
+            while len(self._pages) > self.max_pages:
+                _, (_, future) = self._pages.popitem(last=False)
+                future.cancel()
+
+    def take(self, url: str) -> ParsedPage | None:
+        # a page can only be used once; blocks while it is still being fetched, so call it off the Tk thread
+        with self._lock:
+            entry = self._pages.pop(url, None)
+        if entry is None or time.monotonic() - entry[0] >= self.ttl:
+            return None
+        future: Future = entry[1]
+        try:
+            page = future.result()
+        except Exception:
+            return None
+        tracing.count("prefetch.used")
+        return page
+
+    def _fetch(self, url: str) -> ParsedPage:
+        with tracing.span("prefetch", url=url):
+            text = cached_html(url)
+            if text is not None:
+                return load_page(text.encode("utf-8"))  # costs no bandwidth
+            chunks = []
+            for chunk in stream_html(url):
+                data = chunk.encode("utf-8")
+                chunks.append(data)
+                with self._lock:
+                    self._spent += len(data)
+                    if self._spent > self.budget_bytes:
+                        raise PrefetchBudgetExceeded(url)
+            return load_page(b"".join(chunks))
+
+    def clear(self):
+        self.cancel_hover()
+        with self._lock:
+            for _, future in self._pages.values():
+                future.cancel()
+            self._pages.clear()
+
+    def shutdown(self):
+        self.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
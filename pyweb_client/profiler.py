@@ -0,0 +1,86 @@
+import threading
+import tkinter as tk
+from tkinter import filedialog
+
+from pyweb_client import tracing
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pyweb_client.main import PyWebClient
+
+PROFILER_REFRESH_MS = 500
+PROFILER_WIDTH = 420
+LANE_HEIGHT = 16
+LABEL_WIDTH = 110
+UI_THREAD_COLOR = "#4285F4"
+WORKER_THREAD_COLOR = "#34A853"
+
+
+# Navigation timeline shown next to the console: one lane per span name with a
+# bar for every span of the current navigation (blue on the Tk thread, green on
+# workers), followed by the navigation's counters. Redraws only while recording.
+class ProfilerPanel(tk.Frame):
+    def __init__(self, master: tk.Misc, cl: 'PyWebClient'):
+        super().__init__(master, bg="black")
+        self.cl = cl
+        self.recording = tk.BooleanVar(self, value=tracing.is_enabled())
+        self._ui_thread = threading.get_ident()
+        self._refresh_job = None
+
+        controls = tk.Frame(self, bg="black")
+        controls.pack(side="top", fill="x")
+        tk.Checkbutton(controls, text="Record", variable=self.recording, command=self.on_toggle,
+                       bg="black", fg="lime", selectcolor="black").pack(side="left")
+        tk.Button(controls, text="Export Trace", command=self.export).pack(side="right")
+
+        self.canvas = tk.Canvas(self, width=PROFILER_WIDTH, height=110, bg="black", highlightthickness=0)
+        self.canvas.pack(side="top", fill="both", expand=True)
+        self.on_toggle()
+
+    def on_toggle(self):
+        if self.recording.get():
+            tracing.enable()
+            self.refresh()
+        else:
+            tracing.disable()
+
+    def refresh(self):
+        if self._refresh_job is not None:
+            self.after_cancel(self._refresh_job)
+            self._refresh_job = None
+        self.draw(tracing.timeline(), tracing.counters())
+        if self.recording.get():
+            self._refresh_job = self.after(PROFILER_REFRESH_MS, self.refresh)
+
+    def draw(self, spans, counters):
+        canvas = self.canvas
+        canvas.delete("all")
+        if not spans:
+            canvas.create_text(4, 4, anchor="nw", fill="gray", text="no spans recorded")
+            return
+        lanes = {}
+        for span in spans:
+            lanes.setdefault(span["name"], []).append(span)
+        end_ms = max(span["start_ms"] + span["duration_ms"] for span in spans) or 1
+        scale = max(1, canvas.winfo_width() - LABEL_WIDTH - 4) / end_ms
+
+        y = 2
+        for name, lane in lanes.items():
+            total = sum(span["duration_ms"] for span in lane)
+            canvas.create_text(2, y, anchor="nw", fill="lime", font=("Courier", 8), text=f"{name} {total:.0f}ms")
+            for span in lane:
+                x = LABEL_WIDTH + span["start_ms"] * scale
+                color = UI_THREAD_COLOR if span["tid"] == self._ui_thread else WORKER_THREAD_COLOR
+                canvas.create_rectangle(x, y + 2, x + max(1.0, span["duration_ms"] * scale), y + LANE_HEIGHT - 4,
+                                        fill=color, outline="")
+            y += LANE_HEIGHT
+        text = "  ".join(f"{name}={value}" for name, value in sorted(counters.items()))
+        canvas.create_text(2, y, anchor="nw", fill="gray", font=("Courier", 8), text=f"{end_ms:.0f}ms  {text}",
+                           width=max(1, canvas.winfo_width() - 4))
+        canvas.configure(scrollregion=canvas.bbox("all"))
+
+    def export(self):
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Chrome trace", "*.json")])
+        if path:
+            tracing.export_chrome_trace(path)
+            self.cl.console.log(f"Trace written to {path}")
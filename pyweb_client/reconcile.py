@@ -0,0 +1,156 @@
+import threading
+import tkinter as tk
+from typing import Dict, List
+
+from pyweb_api.DOM import Element, DIRTY_CHILDREN, DIRTY_TEXT, DIRTY_ATTRS
+from pyweb_client.render import is_container, render_element, element_text
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pyweb_client.main import PyWebClient
+
+FRAME_RESET_OPTIONS = ("bg", "bd", "relief", "width", "height")
+REMOTE_BATCH_MS = 16  # mutations made off the Tk thread (scripts) are handed over about once a frame
+
+
+def _live_widget(element: Element):
+    widget = element._tk_widget
+    if widget is not None and widget.winfo_exists():
+        return widget
+    return None
+
+
+# Collects DOM mutations (see Element._mark_dirty) and patches the affected
+# widgets once per Tk idle callback instead of rebuilding the page.
+class Reconciler:
+    def __init__(self, cl: 'PyWebClient'):
+        self.cl = cl
+        self._dirty: Dict[Element, None] = {}
+        self._scheduled = False
+        self._ui_thread = threading.get_ident()
+        self._remote: Dict[Element, None] = {}
+        self._remote_lock = threading.Lock()
+        self._restyled = False
+
+    def mark(self, element: Element):
+        if threading.get_ident() != self._ui_thread:
+            with self._remote_lock:
+                first = not self._remote
+                self._remote[element] = None
+            if first:
+                self.cl.root.after(REMOTE_BATCH_MS, self._take_remote)
+            return
+        self._dirty[element] = None
+        if not self._scheduled:
+            self._scheduled = True
+            self.cl.root.after_idle(self.flush)
+
+    def _take_remote(self):
+        with self._remote_lock:
+            remote, self._remote = self._remote, {}
+        for element in remote:
+            self.mark(element)
+
+    def flush(self):
+        dirty, self._dirty = self._dirty, {}
+        self._scheduled = False
+
+        flags_by_element = {}
+        for element in dirty:
+            flags_by_element[element], element._dirty = element._dirty, 0
+            self.cl.styles.invalidate(element, flags_by_element[element])
+
+        if self.cl.block_renderer:
+            # block renderers keep their own snapshot of the layout, they lay out again what changed
+            self.cl.block_renderer.relayout_elements(flags_by_element)
+            return
+
+        replaced = set()
+        self._restyled = False
+        for element, flags in flags_by_element.items():
+            if any(ancestor in replaced for ancestor in element._get_ancestry_path()):
+                continue
+            target = element
+            while target is not None and _live_widget(target) is None:
+                target = target.parent
+            if target is None:
+                continue  # not on screen
+
+            if target is not element or not self._patch(element, flags):
+                self._replace(target)
+                replaced.add(target)
+
+        if self._restyled:
+            # margins and borders take width from the Labels inside them
+            self.cl.reflow.restyled()
+
+    def _patch(self, element: Element, flags: int) -> bool:
+        # patches the widget in place, False when it has to be rebuilt instead
+        widget = _live_widget(element)
+        container = is_container(element.tag)
+        if flags & DIRTY_CHILDREN and not container:
+            return False
+        if flags & DIRTY_ATTRS:
+            if not container:
+                return False
+            self._patch_style(element, widget)
+        if flags & DIRTY_TEXT and not self._patch_text(element, widget):
+            return False
+        if flags & DIRTY_CHILDREN:
+            self._patch_children(element, widget)
+        return True
+
+    def _patch_text(self, element: Element, widget) -> bool:
+        text = element_text(element)
+        if element.tag == "button":
+            text = text or element.attrs.get("value", "<BUTTON>")
+        if isinstance(widget, tk.Text):
+            widget.delete("1.0", tk.END)
+            widget.insert("1.0", text)
+        elif "text" in widget.keys():
+            widget.config(text=text)
+        elif not isinstance(widget, tk.Frame):
+            return False
+        return True
+
+    def _patch_style(self, element: Element, widget: tk.Widget):
+        options, pack_opts = self.cl.styles.widget_options(element)
+        for key in FRAME_RESET_OPTIONS:
+            if key not in options:
+                options[key] = widget.configure(key)[3]
+        widget.config(**options)
+        widget.pack_configure(padx=pack_opts.get("padx", 0), pady=pack_opts.get("pady", 0))
+        self._restyled = True
+
+    def _patch_children(self, element: Element, widget: tk.Widget):
+        ordered: List[tk.Widget] = []
+        for child in element.children:
+            if not isinstance(child, Element):
+                continue
+            child_widget = _live_widget(child)
+            if child_widget is None or child_widget.master is not widget:
+                render_element(widget, child, self.cl)
+                child_widget = _live_widget(child)
+            if child_widget is not None:
+                ordered.append(child_widget)
+
+        keep = set(ordered)
+        for old in widget.winfo_children():
+            if old not in keep:
+                old.destroy()
+
+        # restore document order; newly rendered widgets were packed at the end
+        slaves = widget.pack_slaves()
+        if ordered and slaves and slaves[0] is not ordered[0]:
+            ordered[0].pack_configure(before=slaves[0])
+        for prev, current in zip(ordered, ordered[1:]):
+            current.pack_configure(after=prev)
+
+    def _replace(self, element: Element):
+        old = _live_widget(element)
+        parent_widget = old.master
+        render_element(parent_widget, element, self.cl)
+        new = _live_widget(element)
+        if new is not None and new is not old:
+            new.pack_configure(before=old)
+        old.destroy()
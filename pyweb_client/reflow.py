@@ -0,0 +1,116 @@
+import tkinter as tk
+from typing import Dict, List
+from weakref import WeakKeyDictionary
+
+from pyweb_api.DOM import Element
+from pyweb_client.render import element_text
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pyweb_client.fonts import TextMeasurer
+    from pyweb_client.main import PyWebClient
+
+REFLOW_DEFAULT_WIDTH = 500  # until the render area has a size of its own
+LABEL_CHROME = 6  # default Label border + padding, in px
+
+
+def viewport_width(canvas: tk.Canvas) -> int:
+    # the width a canvas shows its contents in, or REFLOW_DEFAULT_WIDTH before it is mapped
+    width = canvas.winfo_width() - 2 * (int(canvas["highlightthickness"]) + int(canvas["borderwidth"]))
+    return width if width > 1 else REFLOW_DEFAULT_WIDTH
+
+
+def rewraps(measure: 'TextMeasurer', text: str, font, old: int, new: int) -> bool:
+    # whether text breaks into different lines at wraplength new than at old
+    if old == new:
+        return False
+    natural = max(measure.text_width(line, font) for line in text.split("\n"))
+    if natural <= old and natural <= new:
+        return False  # fits on its lines either way
+    return measure.wrap(text, font, old) != measure.wrap(text, font, new)
+
+
+class _Wrapped:
+    __slots__ = ("parent", "padx", "source", "font", "wraplength")
+
+    def __init__(self, parent: Element | None, padx: int, source: Element | str, font, wraplength: int):
+        self.parent = parent
+        self.padx = padx
+        self.source = source
+        self.font = font
+        self.wraplength = wraplength
+
+    def text(self) -> str:
+        # elements are read again, their text can be patched in place by the Reconciler
+        return self.source if isinstance(self.source, str) else element_text(self.source)
+
+
+# Wraps the text Labels of the widget engine at the width available to them:
+# the render area's width less the margins and borders of their ancestors.
+# On a resize only Labels whose line breaks actually change are reconfigured;
+# line breaks come from TextMeasurer, which caches them per width, and the
+# insets of elements are cached until a restyle. Labels are held weakly, so
+# destroyed ones drop out by themselves. One per rendered page, see Tab.
+class Reflow:
+    def __init__(self, cl: 'PyWebClient', width: int = REFLOW_DEFAULT_WIDTH):
+        self.cl = cl
+        self.width = width
+        self._labels: WeakKeyDictionary[tk.Label, _Wrapped] = WeakKeyDictionary()
+        self._insets: Dict[Element, int] = {}
+
+    def __len__(self):
+        return len(self._labels)
+
+    def wraplength(self, parent: Element | None, padx: int) -> int:
+        # for a Label packed with padx into the widget of parent
+        return max(1, self.width - self._inset(parent) - 2 * padx - LABEL_CHROME)
+
+    def track(self, label: tk.Label, parent: Element | None, padx: int, source: Element | str,
+              font="TkDefaultFont"):
+        # source: the element whose text the Label shows, or the text itself
+        if self.cl.block_renderer is not None:
+            return  # block renderers place their widgets themselves
+        self._labels[label] = _Wrapped(parent, padx, source, font, self.wraplength(parent, padx))
+
+    def resize(self, width: int) -> int:
+        if width == self.width:
+            return 0
+        self.width = width
+        return self._rewrap()
+
+    def restyled(self):
+        # margins or borders changed somewhere, every inset is recomputed
+        self._insets.clear()
+        self._rewrap()
+
+    def _rewrap(self) -> int:
+        measure = self.cl.text_metrics
+        changed = 0
+        dead: List[tk.Label] = []
+        for label, entry in list(self._labels.items()):
+            wraplength = self.wraplength(entry.parent, entry.padx)
+            if not rewraps(measure, entry.text(), entry.font, entry.wraplength, wraplength):
+                continue
+            try:
+                label.configure(wraplength=wraplength)
+            except tk.TclError:
+                dead.append(label)
+                continue
+            entry.wraplength = wraplength
+            changed += 1
+        for label in dead:
+            self._labels.pop(label, None)
+        return changed
+
+    def _inset(self, element: Element | None) -> int:
+        # horizontal space taken by the margins and borders of element and its ancestors
+        chain = []
+        while element is not None and element not in self._insets:
+            chain.append(element)
+            element = element.parent
+        inset = self._insets.get(element, 0) if element is not None else 0
+        for element in reversed(chain):
+            widget_opts, pack_opts = self.cl.styles.widget_options(element)
+            inset += 2 * (pack_opts.get("padx", 0) + widget_opts.get("bd", 0))
+            self._insets[element] = inset
+        return inset
@@ -1,159 +1,111 @@
-import io
 import tkinter as tk
-from PIL import Image, ImageTk
-from urllib import request
-from typing import Dict
+from typing import Dict, List, Tuple
 
-from pyweb_api.DOM import Element, Event
+from pyweb_api.DOM import Element
+from pyweb_client import tracing
+from pyweb_client.fonts import HEADING_FONT_SIZES, LINK_FONT, heading_font
+from pyweb_client.images import image_size, image_placeholder, show_photo
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from pyweb_client.main import PyWebClient
+    from pyweb_client.html_parser import PyHTMLParser
+    from pyweb_client.virtual import VirtualRenderer
+    from pyweb_client.canvas_render import CanvasRenderer
 
 
-def parse_style_to_tk(style: Dict[str, str]) -> Dict[str, Dict[str, any]]:
-    widget_opts = {}
-    pack_opts = {}
-
-    if "color" in style:
-        widget_opts["fg"] = style["color"]
-    if "background-color" in style:
-        widget_opts["bg"] = style["background-color"]
-
-    font_family = style.get("font-family", "Arial")
-    font_size = 12
-    if "font-size" in style:
-        try:
-            font_size = int(style["font-size"].replace("px", "").strip())
-        except:
-            pass
-    font_weight = "bold" if style.get("font-weight", "") == "bold" else "normal"
-    font_slant = "italic" if style.get("font-style", "") == "italic" else "roman"
-    widget_opts["font"] = (font_family, font_size, font_weight, font_slant)
-
-    if "text-align" in style:
-        align = style["text-align"].strip()
-        if align in ["left", "center", "right"]:
-            widget_opts["justify"] = align
-
-    relief_map = {
-        "solid": "ridge",
-        "inset": "sunken",
-        "outset": "raised",
-        "none": "flat",
-        "groove": "groove",
-        "ridge": "ridge",
-    }
-    if "border-style" in style:
-        css_relief = style["border-style"].strip()
-        if css_relief in relief_map:
-            widget_opts["relief"] = relief_map[css_relief]
-    if "border-width" in style:
-        try:
-            widget_opts["bd"] = int(style["border-width"].replace("px", "").strip())
-        except:
-            pass
-
-    if "width" in style:
-        try:
-            widget_opts["width"] = int(style["width"].replace("px", "").strip())
-        except:
-            pass
-    if "height" in style:
-        try:
-            widget_opts["height"] = int(style["height"].replace("px", "").strip())
-        except:
-            pass
-
-    if "wrap-length" in style:
-        try:
-            widget_opts["wraplength"] = int(style["wrap-length"].replace("px", "").strip())
-        except:
-            pass
-
-    for side in ["top", "right", "bottom", "left"]:
-        key = f"margin-{side}"
-        if key in style:
-            val = int(style[key].replace("px", "").strip())
-            if side in ["left", "right"]:
-                pack_opts["padx"] = val
-            else:
-                pack_opts["pady"] = val
-
-    # shorthand: margin
-    if "margin" in style:
-        try:
-            val = int(style["margin"].replace("px", "").strip())
-            pack_opts["padx"] = val
-            pack_opts["pady"] = val
-        except:
-            pass
-
-    return {
-        "widget": widget_opts,
-        "pack": pack_opts
-    }
-
-
-def filter_widget_options(tag: str, options: Dict[str, any]) -> Dict[str, any]:
-    allowed = {
-        "frame": {"bg", "bd", "relief", "width", "height"},
-        "label": {"text", "bg", "fg", "font", "justify", "anchor", "wraplength", "width", "height"},
-        "button": {"text", "bg", "fg", "font", "width", "height", "state"},
-        "entry": {"bg", "fg", "font", "width", "state"},
-    }
-
-    tag_map = {
-        "div": "frame",
-        "p": "label",
-        "a": "label",
-        "h1": "label",
-        "h2": "label",
-        "h3": "label",
-        "button": "button",
-        "input": "entry"
-    }
-
-    widget_type = tag_map.get(tag, "frame")
-    allowed_keys = allowed[widget_type]
-
-    return {k: v for k, v in options.items() if k in allowed_keys}
+SKIPPED_TAGS = {"head", "script", "style", "meta", "link"}
+LEAF_TAGS = {"p", "span", "h1", "h2", "h3", "a", "button", "input", "textarea",
+             "ul", "ol", "li", "br", "hr", "img"}
 
 
-def render_element(parent_tk_widget: tk.Widget, element: Element, cl: 'PyWebClient'):
+TEXT_TAGS = {"p", "span", "h1", "h2", "h3"}
+
+
+def is_container(tag: str) -> bool:
+    return tag not in SKIPPED_TAGS and tag not in LEAF_TAGS
+
+
+def in_subtree(element: Element | None, root: Element) -> bool:
+    while element is not None:
+        if element is root:
+            return True
+        element = element.parent
+    return False
+
+
+def element_text(element: Element) -> str:
+    return "".join([c if isinstance(c, str) else "" for c in element.children])
+
+
+def text_label_options(element: Element, cl: 'PyWebClient') -> Tuple[str, Dict[str, any], Dict[str, any]]:
+    # text, Label options and pack options of a p/span/h* element
+    widget_opts, pack_opts = cl.styles.widget_options(element)
+    if element.tag in HEADING_FONT_SIZES:
+        widget_opts["font"] = heading_font(element.tag)
+    return element_text(element), _named_font(widget_opts, cl), pack_opts
+
+
+def _named_font(widget_opts: Dict[str, any], cl: 'PyWebClient') -> Dict[str, any]:
+    # font tuples become names of shared fonts, see FontRegistry
+    if "font" in widget_opts:
+        widget_opts["font"] = cl.fonts.name(widget_opts["font"])
+    return widget_opts
+
+
+def list_item_texts(element: Element) -> List[Tuple[Element, str]]:
+    items = []
+    for idx, child in enumerate(element.children):
+        if isinstance(child, Element) and child.tag == "li":
+            prefix = "• " if element.tag == "ul" else f"{idx + 1}. "
+            items.append((child, prefix + element_text(child)))
+    return items
+
+
+def _wrapping_label(parent_tk_widget: tk.Widget, parent: Element | None, padx: int, source: Element | str,
+                    cl: 'PyWebClient', **options) -> tk.Label:
+    # a Label that wraps at the width available to it, rewrapped on resize by Reflow
+    label = tk.Label(parent_tk_widget, wraplength=cl.reflow.wraplength(parent, padx), **options)
+    cl.reflow.track(label, parent, padx, source, options.get("font", "TkDefaultFont"))
+    return label
+
+
+def create_widget(parent_tk_widget: tk.Widget, element: Element, cl: 'PyWebClient') -> tk.Widget | None:
     if isinstance(element, str):
-        lbl = tk.Label(parent_tk_widget, text=element, wraplength=500)
+        lbl = _wrapping_label(parent_tk_widget, getattr(parent_tk_widget, "_dom_element", None), 5, element, cl,
+                              text=element)
         lbl.pack(anchor="w", padx=5, pady=2)
-        return
+        return None
 
-    style = element._get_style_dict()
-    tk_style = parse_style_to_tk(style)
-    widget_opts = filter_widget_options(element.tag, tk_style["widget"])
     tag = element.tag
+    if tag in SKIPPED_TAGS:
+        return None
 
-    if tag in ["head", "script", "style", "meta", "link"]:
-        return
+    widget_opts, pack_opts = cl.styles.widget_options(element)
+    _named_font(widget_opts, cl)
 
-    text = "".join([c if isinstance(c, str) else "" for c in element.children])
+    text = element_text(element)
 
     widget = None
 
     if tag == "div":
         widget = tk.Frame(parent_tk_widget, **widget_opts)
-    elif tag in ["p", "span", "h1", "h2", "h3"]:
-        font_sizes = {"h1": 22, "h2": 18, "h3": 16}
-        if tag.startswith("h"):
-            widget_opts["font"] = ("Arial", font_sizes[tag], "bold")
-        widget = tk.Label(parent_tk_widget, text=text, **widget_opts)
+    elif tag in TEXT_TAGS:
+        text, widget_opts, _ = text_label_options(element, cl)
+        if "wraplength" in widget_opts:
+            # set by the page's style, kept as it is
+            widget = tk.Label(parent_tk_widget, text=text, **widget_opts)
+        else:
+            widget = _wrapping_label(parent_tk_widget, element.parent, pack_opts.get("padx", 0), element, cl,
+                                     text=text, **widget_opts)
     elif tag == "a":
         widget_opts["fg"] = "blue"
-        widget_opts["font"] = ("Arial", 12, "underline")
-        link_url = element.attrs.get('href', '#')
-        widget = tk.Label(parent_tk_widget, text=text, **widget_opts, cursor="hand2")
-        widget.bind("<Button-1>", lambda e: cl.location.navigate(link_url))
+        widget_opts["font"] = cl.fonts.name(LINK_FONT)
+        # clicks are routed by EventDelegator, which also follows the link
+        widget = _wrapping_label(parent_tk_widget, element.parent, pack_opts.get("padx", 0), element, cl,
+                                 text=text, **widget_opts, cursor="hand2")
     elif tag == "button":
         widget = tk.Button(parent_tk_widget,
-                           command= lambda : element.dispatch_event(Event("click", element)),
                            text=text or element.attrs.get("value", "<BUTTON>"),
                            **widget_opts)
     elif tag == "input":
@@ -163,40 +115,122 @@ def render_element(parent_tk_widget: tk.Widget, element: Element, cl: 'PyWebClie
         widget.insert("1.0", text)
     elif tag in ["ul", "ol"]:
         widget = tk.Frame(parent_tk_widget, **widget_opts)
-        for idx, child in enumerate(element.children):
-            if isinstance(child, Element) and child.tag == "li":
-                li_text = "".join([c if isinstance(c, str) else "" for c in child.children])
-                prefix = "• " if tag == "ul" else f"{idx + 1}. "
-                li_label = tk.Label(widget, text=prefix + li_text, anchor="w", justify="left")
-                li_label.pack(anchor="w", padx=10)
+        for li, li_text in list_item_texts(element):
+            # a change to the list renders it again, so its items wrap as fixed text
+            li_label = _wrapping_label(widget, element, 10, li_text, cl, text=li_text, anchor="w", justify="left")
+            li_label._dom_element = li
+            li_label.pack(anchor="w", padx=10)
     elif tag == "li":
-        return  # already handled in ul/ol
+        return None  # already handled in ul/ol
     elif tag == "br":
         widget = tk.Label(parent_tk_widget, text="")
     elif tag == "hr":
         widget = tk.Frame(parent_tk_widget, height=2, bg="gray")
     elif tag == "img":
         src = element.attrs.get("src", "")
-        try:
-            if src.startswith("http"):
-                with request.urlopen(src) as u:
-                    raw_data = u.read()
-                im = Image.open(io.BytesIO(raw_data))
-            else:
-                im = Image.open(src)
-            im = im.resize((150, 100))
-            photo = ImageTk.PhotoImage(im)
-            widget = tk.Label(parent_tk_widget, image=photo)
-            widget.image = photo
-        except Exception:
-            widget = tk.Label(parent_tk_widget, text="[Image Load Error]")
+        size = image_size(element)
+        photo = cl.image_cache.get(src, size)
+        if photo is not None:
+            widget = tk.Label(parent_tk_widget)
+            show_photo(widget, photo)
+        else:
+            # fetched once it scrolls near the viewport, see PyWebClient.load_pending_images
+            widget = image_placeholder(parent_tk_widget, size)
+            cl.request_image(widget, src, size)
     else:
         cl.console.log(f"UNKNOWN EL TAG: {element.tag}")
         widget = tk.Frame(parent_tk_widget, **widget_opts)
 
     if widget:
+        tracing.count("widgets_created")
         element._tk_widget = widget
-        widget.pack(fill="x", **tk_style["pack"])
+        # lets EventDelegator find the element behind a Tk event
+        widget._dom_element = element
+        widget.pack(fill="x", **pack_opts)
+    return widget
+
+
+def render_element(parent_tk_widget: tk.Widget, element: Element, cl: 'PyWebClient'):
+    with tracing.span("render.widgets", tag=element.tag):
+        _render_tree(parent_tk_widget, element, cl)
+    cl.load_pending_images()
+
+
+def _render_tree(parent_tk_widget: tk.Widget, element: Element, cl: 'PyWebClient'):
+    widget = create_widget(parent_tk_widget, element, cl)
+    if widget:
         for child in element.children:
             if isinstance(child, Element):
-                render_element(widget, child, cl)
+                _render_tree(widget, child, cl)
+
+
+# Renders a document while PyHTMLParser is still being fed: closed subtrees are
+# rendered as a whole, open containers get their widget up front so finished
+# children can be drawn into it right away. With a block renderer (VirtualRenderer,
+# CanvasRenderer), closed subtrees are appended to it instead and open containers
+# stay flat until finish(), which lays the whole tree out again so they get their
+# own boxes (background, border, padding) like on a page rendered in one go.
+class ProgressiveRenderer:
+    def __init__(self, parent_tk_widget: tk.Widget, parser: 'PyHTMLParser', cl: 'PyWebClient',
+                 blocks: 'VirtualRenderer | CanvasRenderer | None' = None):
+        self.parser = parser
+        self.cl = cl
+        self.blocks = blocks
+        root_widget = None if blocks else create_widget(parent_tk_widget, parser.root, cl)
+        # element -> [tk widget, number of children already rendered]
+        self._cursors: Dict[Element, list] = {parser.root: [root_widget, 0]}
+
+    def flush(self, open_elements: Dict[Element, int] | None = None):
+        if open_elements is None:
+            open_elements = self.parser.open_elements()
+        with tracing.span("render.flush"):
+            self._flush(self.parser.root, open_elements)
+            self._done_pass()
+
+    def finish(self):
+        with tracing.span("render.flush"):
+            if self.blocks and len(self._cursors) > 1:
+                # some containers were laid out flat while they were open
+                self.blocks.destroy()
+                self.blocks.append(self.parser.root)
+            else:
+                self._flush(self.parser.root, {})
+            self._done_pass()
+
+    def _done_pass(self):
+        if self.blocks:
+            self.blocks.refresh()
+        else:
+            self.cl.load_pending_images()
+
+    def _flush(self, element: Element, open_elements: Dict[Element, int]):
+        cursor = self._cursors[element]
+        widget, done = cursor
+        children = element.children
+        limit = open_elements.get(element, len(children))
+
+        while done < limit:
+            child = children[done]
+            if isinstance(child, str):
+                done += 1
+                continue
+
+            child_open = child in open_elements
+            if child in self._cursors:
+                self._flush(child, open_elements)
+            elif child_open:
+                if not is_container(child.tag):
+                    break
+                child_widget = None if self.blocks else create_widget(widget, child, self.cl)
+                self._cursors[child] = [child_widget, 0]
+                self._flush(child, open_elements)
+            elif self.blocks:
+                self.blocks.append(child)
+            else:
+                _render_tree(widget, child, self.cl)
+
+            if child_open:
+                break
+            done += 1
+
+        cursor[1] = done
@@ -0,0 +1,566 @@
+import builtins
+import ctypes
+import functools
+import hashlib
+import importlib
+import marshal
+import os
+import queue
+import sys
+import textwrap
+import threading
+import time
+import tkinter as tk
+import traceback
+import types
+from collections import OrderedDict
+from typing import Callable, List, Mapping
+from urllib.parse import urlsplit
+
+from pyweb_api.DOM import Element, Text
+from pyweb_api.Window import Document, Console, Window
+from pyweb_client import tracing
+from pyweb_client.reconcile import REMOTE_BATCH_MS
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pyweb_client.main import PyWebClient
+    from pyweb_client.loader import LoadToken
+
+SCRIPT_TYPES = {"text/python"}
+SCRIPT_TIME_BUDGET = 2.0  # seconds a single script or event listener may run before it is interrupted
+SCRIPT_TIMEOUT_REPEAT = 0.1  # s; ScriptTimeout is raised again this often until the script gives up
+SCRIPT_IDLE_POLL = 0.5  # s; a page's script thread, idle between events, notices navigation this often
+# pages that always run scripts: the client's own; any other origin is opted in to, see ScriptOrigins
+BUILTIN_SCRIPT_ORIGINS = frozenset({"app://"})
+SCRIPT_ORIGINS_PATH = os.path.join(os.path.expanduser("~"), ".config", "pyweb", "script_origins")
+# modules scripts can import; they get the public, non-module names of each (see _script_module).
+# Nothing here may look attributes up by a name the script chooses (string.Formatter,
+# functools.update_wrapper, operator.attrgetter...), that would get around check_script
+SCRIPT_MODULES = frozenset({"math", "cmath", "random", "re", "json", "datetime", "time", "itertools",
+                            "collections"})
+# no object / type / getattr / setattr / vars / open / exec...: nothing that reaches a
+# class's internals or an attribute by a name built at runtime
+SCRIPT_BUILTINS = frozenset({
+    "abs", "all", "any", "ascii", "bin", "bool", "bytearray", "bytes", "callable", "chr", "classmethod",
+    "complex", "dict", "divmod", "enumerate", "filter", "float", "format", "frozenset", "hasattr",
+    "hash", "hex", "id", "int", "isinstance", "issubclass", "iter", "len", "list", "map", "max", "min",
+    "next", "oct", "ord", "pow", "print", "property", "range", "repr", "reversed", "round", "set",
+    "slice", "sorted", "staticmethod", "str", "sum", "super", "tuple", "zip", "__build_class__",
+}) | frozenset(name for name, value in vars(builtins).items()
+              if isinstance(value, type) and issubclass(value, Exception))
+# attribute names scripts may not use besides anything starting with "_": they lead
+# to frames, and from a frame to the globals of every module in the client
+SCRIPT_BLOCKED_ATTRS = frozenset({
+    "gi_frame", "gi_code", "gi_yieldfrom", "cr_frame", "cr_code", "cr_await", "ag_frame", "ag_code",
+    "ag_await", "tb_frame", "tb_next", "f_back", "f_builtins", "f_code", "f_globals", "f_locals",
+    "f_trace", "mro",
+})
+# bumped whenever check_script changes, so code the cache compiled under older rules is not reused
+SCRIPT_CHECK_VERSION = 1
+BRIDGE_POLL = 0.05  # s; a script waiting on the Tk thread wakes this often to notice a timeout
+# Element / Document methods that only change the tree; queued instead of waited for
+WRITE_METHODS = frozenset({"append_child", "remove_child", "set_attribute", "remove_attribute", "set_style",
+                           "set_text", "add_class", "remove_class", "add_event_listener",
+                           "remove_event_listener"})
+CODE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pyweb", "code")
+CODE_CACHE_MAX_ENTRIES = 256
+
+
+# not an Exception, so a script's `except Exception` does not swallow it
+class ScriptTimeout(BaseException):
+    pass
+
+
+class ScriptCancelled(Exception):
+    pass
+
+
+def is_python_script(element: Element) -> bool:
+    return element.tag == "script" and element.attrs.get("type", "").strip().lower() in SCRIPT_TYPES
+
+
+def script_source(element: Element) -> str:
+    # scripts are usually indented to match the surrounding markup
+    return textwrap.dedent("".join(c for c in element.children if isinstance(c, str))).strip()
+
+
+def check_script(source: str, filename: str):
+    # the script's syntax tree, once it is known not to name private or frame attributes,
+    # which is how Python code climbs from any object to the interpreter's internals;
+    # raises SyntaxError otherwise. Only scripts that are compiled need it.
+    import ast
+
+    tree = ast.parse(source, filename, "exec")
+    lines = source.splitlines()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute):
+            names = [node.attr]
+        elif isinstance(node, ast.Name):
+            names = [node.id] if node.id.startswith("__") else []
+        elif isinstance(node, ast.MatchClass):
+            names = node.kwd_attrs  # case C(attr=...) reads attr
+        elif isinstance(node, ast.ImportFrom):
+            names = [alias.name for alias in node.names]
+        else:
+            continue
+        for name in names:
+            if name.startswith("_") or name in SCRIPT_BLOCKED_ATTRS:
+                raise SyntaxError(f"scripts cannot use {name!r}",
+                                  (filename, node.lineno, node.col_offset + 1, lines[node.lineno - 1]))
+    return tree
+
+
+# Compiled scripts by a hash of their source, in memory and marshalled on disk.
+# Sources are checked with check_script before they are compiled.
+class CodeCache:
+    def __init__(self, cache_dir: str | None = CODE_CACHE_DIR, max_entries: int = CODE_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, types.CodeType] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compile(self, source: str) -> types.CodeType:
+        key = hashlib.sha256(f"{SCRIPT_CHECK_VERSION}\0{source}".encode("utf-8")).hexdigest()
+        with self._lock:
+            code = self._entries.get(key)
+            if code is not None:
+                self._entries.move_to_end(key)
+                return code
+        code = self._read_disk(key)
+        if code is None:
+            filename = f"<pyweb-script {key[:12]}>"
+            code = compile(check_script(source, filename), filename, "exec")
+            self._write_disk(key, code)
+        with self._lock:
+            self._entries[key] = code
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return code
+
+    def _disk_path(self, key: str) -> str:
+        # marshal output is only valid for the interpreter version that wrote it
+        return os.path.join(self.cache_dir, f"{key}.{sys.implementation.cache_tag}.pyc")
+
+    def _read_disk(self, key: str) -> types.CodeType | None:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                return marshal.load(f)
+        except (OSError, ValueError, EOFError, TypeError):
+            return None
+
+    def _write_disk(self, key: str, code: types.CodeType):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                marshal.dump(code, f)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass
+
+
+code_cache = CodeCache()
+
+
+
+
+def script_origin(url: str) -> str:
+    # http(s) pages by scheme, host and port; all app:// and all file:// pages are one origin each
+    parts = urlsplit(url)
+    if parts.scheme in ("http", "https"):
+        return f"{parts.scheme}://{parts.netloc.lower()}"
+    return f"{parts.scheme}://"
+
+
+# Origins the user let run scripts, on top of BUILTIN_SCRIPT_ORIGINS, kept one per
+# line in SCRIPT_ORIGINS_PATH. Pages from anywhere else, file:// included, do not
+# run scripts until their origin is allowed.
+class ScriptOrigins:
+    def __init__(self, path: str | None = SCRIPT_ORIGINS_PATH):
+        self.path = path
+        self._allowed: set | None = None  # read on first use
+        self._lock = threading.Lock()
+
+    def allows(self, url: str) -> bool:
+        origin = script_origin(url)
+        return origin in BUILTIN_SCRIPT_ORIGINS or origin in self._load()
+
+    def allow(self, url: str):
+        self._update(script_origin(url), True)
+
+    def block(self, url: str):
+        self._update(script_origin(url), False)
+
+    def _load(self) -> set:
+        with self._lock:
+            if self._allowed is None:
+                self._allowed = set()
+                if self.path:
+                    try:
+                        with open(self.path, encoding="utf-8") as f:
+                            self._allowed.update(line.strip() for line in f if line.strip())
+                    except OSError:
+                        pass
+            return self._allowed
+
+    def _update(self, origin: str, allowed: bool):
+        origins = self._load()
+        with self._lock:
+            if allowed:
+                origins.add(origin)
+            else:
+                origins.discard(origin)
+            if not self.path:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                    f.writelines(f"{origin}\n" for origin in sorted(origins))
+                os.replace(self.path + ".tmp", self.path)
+            except OSError:
+                pass
+
+
+script_origins = ScriptOrigins()
+
+
+@functools.lru_cache(maxsize=None)
+def _script_module(name: str) -> types.ModuleType:
+    # a copy of the module with its public names only: the modules it imported itself
+    # (json.codecs, re.enum...) lead on to sys and os. Named apart from the real one, or
+    # `from json import decoder` would find the submodule in sys.modules
+    real = importlib.import_module(name)
+    module = types.ModuleType(f"{name} (script)")
+    for attr in getattr(real, "__all__", None) or dir(real):
+        value = getattr(real, attr, None)
+        if not attr.startswith("_") and not isinstance(value, types.ModuleType):
+            setattr(module, attr, value)
+    return module
+
+
+# Interrupts the script thread once a script runs over its budget, by raising
+# ScriptTimeout in it asynchronously, and again every SCRIPT_TIMEOUT_REPEAT for
+# a script that catches it. Pure Python loops are interrupted at the next
+# bytecode; a single long C call only once it returns.
+class _Watchdog:
+    def __init__(self, budget: float):
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._thread_id = None
+        self._run = 0
+        self._timer = None
+
+    def start(self):
+        with self._lock:
+            self._run += 1
+            self._thread_id = threading.get_ident()
+            self._arm(self.budget)
+
+    def stop(self):
+        with self._lock:
+            thread_id, self._thread_id = self._thread_id, None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if thread_id is not None:
+                # a ScriptTimeout set but not raised yet would surface in whatever the thread runs next
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id), None)
+
+    def _arm(self, delay: float):
+        self._timer = threading.Timer(delay, self._expire, (self._run,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _expire(self, run: int):
+        with self._lock:
+            if self._thread_id is None or run != self._run:
+                return
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self._thread_id),
+                                                       ctypes.py_object(ScriptTimeout))
+            self._arm(SCRIPT_TIMEOUT_REPEAT)
+
+
+class _Call:
+    __slots__ = ("fn", "done", "result", "error")
+
+    def __init__(self, fn: Callable, reply: bool):
+        self.fn = fn
+        self.done = threading.Event() if reply else None
+        self.result = None
+        self.error = None
+
+
+# Carries a script's DOM accesses over to the Tk thread, which owns the tree.
+# Reads wait for their answer; writes are queued and applied in order, one batch
+# per frame or right before the next read. Events for the listeners scripts add
+# come back the other way, through inbox (see _ScriptListener).
+class _UiBridge:
+    def __init__(self, root: tk.Misc, ui_thread: int, token: 'LoadToken', on_error: Callable[[str], None],
+                 inbox: queue.SimpleQueue):
+        self.root = root
+        self.ui_thread = ui_thread
+        self.token = token
+        self.on_error = on_error
+        self.inbox = inbox
+        # set once a script adds an event listener: the script thread then stays to run it
+        self.listening = False
+        self._queue: List[_Call] = []
+        self._lock = threading.Lock()
+
+    def read(self, fn: Callable, *args, **kwargs):
+        if threading.get_ident() == self.ui_thread:
+            self._apply()
+            return self.wrap(fn(*args, **kwargs))
+        call = _Call(lambda: self.wrap(fn(*args, **kwargs)), True)
+        self._enqueue(call, 0)
+        # short waits: the watchdog's ScriptTimeout is only raised between bytecodes
+        while not call.done.wait(BRIDGE_POLL):
+            if self.token.cancelled:
+                raise ScriptCancelled()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def write(self, fn: Callable, *args, **kwargs):
+        if threading.get_ident() == self.ui_thread:
+            self._apply()
+            fn(*args, **kwargs)
+            return
+        self._enqueue(_Call(functools.partial(fn, *args, **kwargs), False), REMOTE_BATCH_MS)
+
+    def wrap(self, value):
+        # Tk thread only: lists and attribute maps are copied before they leave it
+        if isinstance(value, (Element, Document)):
+            return _Remote(value, self)
+        if isinstance(value, list):
+            return [self.wrap(item) for item in value]
+        if isinstance(value, Mapping):
+            return dict(value)
+        return value
+
+    def listener(self, handler: Callable, added: bool) -> '_ScriptListener':
+        if added:
+            self.listening = True
+        return _ScriptListener(handler, self)
+
+    def _enqueue(self, call: _Call, delay: int):
+        with self._lock:
+            first = not self._queue
+            self._queue.append(call)
+        if first or not delay:
+            self.root.after(delay, self._apply)
+
+    def _apply(self):
+        with self._lock:
+            calls, self._queue = self._queue, []
+        for call in calls:
+            if self.token.cancelled:
+                return
+            try:
+                call.result = call.fn()
+            except Exception as e:
+                if call.done is None:
+                    self.on_error(f"script: {type(e).__name__}: {e}")
+                if isinstance(e, AttributeError):
+                    e.obj = None  # the object whose attribute was missing, unwrapped
+                call.error = e
+            if call.done is not None:
+                call.done.set()
+
+
+# What a script's event listener is called with.
+class _ScriptEvent:
+    __slots__ = ("type", "target", "current_target")
+
+    def __init__(self, type_: str, target, current_target):
+        self.type = type_
+        self.target = target
+        self.current_target = current_target
+
+
+# Stands in for a script's event listener on the element. Dispatch calls it on the
+# Tk thread, and it only hands the event to the page's script thread, which runs
+# the listener under the same time budget as the scripts. The dispatch is over by
+# then: a script listener cannot stop propagation or prevent the default action.
+class _ScriptListener:
+    __slots__ = ("_handler", "_bridge")
+
+    def __init__(self, handler: Callable, bridge: _UiBridge):
+        self._handler = handler
+        self._bridge = bridge
+
+    def __call__(self, event):
+        bridge = self._bridge
+        bridge.inbox.put((self._handler, _ScriptEvent(event.type, bridge.wrap(event.target),
+                                                      bridge.wrap(event.current_target))))
+
+    # remove_event_listener passes a fresh one; never calls into the script's own __eq__
+    def __eq__(self, other):
+        return isinstance(other, _ScriptListener) and other._handler is self._handler
+
+    def __hash__(self):
+        return id(self._handler)
+
+
+def _unwrap(value):
+    return object.__getattribute__(value, "_target") if isinstance(value, _Remote) else value
+
+
+def _to_ui(value):
+    # what a script hands to the Tk thread: DOM proxies unwrapped and plain data copied.
+    # Anything else could run script code there (its __eq__, __hash__, __str__...)
+    kind = type(value)
+    if kind is _Remote:
+        return _unwrap(value)
+    if value is None or kind in (str, Text, int, float, bool, _ScriptListener):
+        return value
+    if kind in (list, tuple):
+        return kind(_to_ui(item) for item in value)
+    if kind is dict:
+        return {_to_ui(key): _to_ui(item) for key, item in value.items()}
+    raise TypeError(f"{kind.__name__} cannot be passed to the page")
+
+
+# An Element or Document as scripts see it, see _UiBridge. Private members, and
+# the listeners other code added, are not reachable through it.
+class _Remote:
+    __slots__ = ("_target", "_bridge")
+
+    def __init__(self, target, bridge: _UiBridge):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_bridge", bridge)
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name == "listeners":
+            raise AttributeError(name)
+        target, bridge = self._target, self._bridge
+        if not isinstance(getattr(type(target), name, None), types.FunctionType):
+            return bridge.read(getattr, target, name)  # a property or plain attribute
+        method = getattr(target, name)
+        if name not in WRITE_METHODS:
+            return lambda *args, **kwargs: bridge.read(method, *map(_to_ui, args),
+                                                       **{key: _to_ui(item) for key, item in kwargs.items()})
+
+        def write(*args, **kwargs):
+            if name in ("add_event_listener", "remove_event_listener"):
+                # the listener itself stays on the script thread
+                added = name == "add_event_listener"
+                if len(args) > 1:
+                    args = (args[0], bridge.listener(args[1], added)) + args[2:]
+                elif "handler" in kwargs:
+                    kwargs["handler"] = bridge.listener(kwargs["handler"], added)
+            bridge.write(method, *map(_to_ui, args), **{key: _to_ui(item) for key, item in kwargs.items()})
+            # append_child / remove_child return their argument
+            return args[0] if name in ("append_child", "remove_child") else None
+        return write
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        self._bridge.write(setattr, self._target, name, _to_ui(value))
+
+    def __eq__(self, other):
+        return self._target is _unwrap(other)
+
+    def __hash__(self):
+        return id(self._target)
+
+    def __repr__(self):
+        return self._bridge.read(repr, self._target)
+
+
+# Runs a page's <script type="text/python"> blocks in document order on a thread
+# of their own, so slow scripts never block the Tk loop. Scripts share one global
+# namespace per page and get `from pyweb import Document, Window`; every DOM
+# access they make runs on the Tk thread (see _UiBridge), and the event listeners
+# they add run back on the script thread, which stays until the page is left.
+# Only pages from allowed origins run scripts (see ScriptOrigins), and then in a
+# restricted environment: builtins and imports cut down to allow-lists, and code
+# that names private or frame attributes rejected before it is compiled.
+class ScriptEngine:
+    def __init__(self, cl: 'PyWebClient', budget: float = SCRIPT_TIME_BUDGET, cache: CodeCache = code_cache,
+                 origins: ScriptOrigins = script_origins):
+        self.cl = cl
+        self.budget = budget
+        self.cache = cache
+        self.origins = origins
+        self._ui_thread = threading.get_ident()
+
+    def run(self, scripts: List[Element], document: Document):
+        if not scripts:
+            return
+        url = self.cl.url or ""
+        if not self.origins.allows(url):
+            self.cl.console.warn(f"{len(scripts)} script(s) not run: scripts are off for {script_origin(url)} "
+                                 f"(View > Allow Scripts on This Site)")
+            return
+        sources = [script_source(script) for script in scripts]
+        # not a loader worker: the thread stays for the page's event listeners
+        threading.Thread(target=self._run_page, args=(self.cl.loader.token(), sources, document),
+                         name="pyweb-script", daemon=True).start()
+
+    def _run_page(self, token: 'LoadToken', sources: List[str], document: Document):
+        console = Console(lambda level, message: token.post(self.cl._render_log, level, message))
+        bridge = _UiBridge(self.cl.root, self._ui_thread, token, console.error, queue.SimpleQueue())
+        remote_document = bridge.wrap(document)
+        window = Window(remote_document, console, alert=lambda message: token.post(self.cl.alert, message))
+        module = types.ModuleType("pyweb")
+        module.Document = remote_document
+        module.Window = window
+        namespace = {"__name__": "__pyweb__", "__builtins__": self._builtins(module)}
+
+        watchdog = _Watchdog(self.budget)
+        for index, source in enumerate(sources):
+            if token.cancelled:
+                return
+            try:
+                code = self.cache.compile(source)
+            except SyntaxError as e:
+                console.error(f"script {index}: {e}")
+                continue
+            if not self._call(watchdog, console, f"script {index}", exec, code, namespace):
+                return
+        while bridge.listening and not token.cancelled:
+            try:
+                handler, event = bridge.inbox.get(timeout=SCRIPT_IDLE_POLL)
+            except queue.Empty:
+                continue
+            if not self._call(watchdog, console, f"{event.type} listener", handler, event):
+                return
+
+    def _call(self, watchdog: _Watchdog, console: Console, label: str, fn: Callable, *args) -> bool:
+        # one script or listener under the time budget; False once the page is gone
+        started = time.perf_counter()
+        try:
+            try:
+                watchdog.start()
+                with tracing.span("script", script=label):
+                    fn(*args)
+            finally:
+                watchdog.stop()
+        except ScriptCancelled:
+            return False
+        except ScriptTimeout:
+            watchdog.stop()  # in case it struck inside the first stop()
+            console.error(f"{label}: stopped after {time.perf_counter() - started:.1f}s (budget {self.budget}s)")
+        except Exception:
+            console.error(f"{label}: {traceback.format_exc(limit=-1).strip()}")
+        return True
+
+    @staticmethod
+    def _builtins(module: types.ModuleType) -> dict:
+        def import_(name, globals_=None, locals_=None, fromlist=(), level=0):
+            if name == "pyweb":
+                return module
+            if level == 0 and name in SCRIPT_MODULES:
+                return _script_module(name)
+            raise ImportError(f"scripts cannot import {name!r}")
+
+        scope = {name: getattr(builtins, name) for name in SCRIPT_BUILTINS}
+        scope["__import__"] = import_
+        return scope
@@ -0,0 +1,270 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, List
+
+from pyweb_api.CSS import StyleSheet
+from pyweb_api.DOM import Element, Text, TAG_MAP
+from pyweb_api.Window import Document
+from pyweb_client import tracing
+from pyweb_client.html_parser import PyHTMLParser, PARSER_VERSION
+from pyweb_client.scripts import is_python_script
+
+SNAPSHOT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pyweb", "dom")
+SNAPSHOT_MAX_DISK_BYTES = 256 * 1024 * 1024
+SNAPSHOT_MIN_SOURCE_BYTES = 32 * 1024  # smaller pages parse faster than a snapshot round trip
+
+# Layout, all integers little endian:
+#   header   magic, version, string count, node count, attribute count, string blob length
+#   offsets  uint32 * (strings + 1) into the blob
+#   blob     utf-8 strings, padded to 4 bytes
+#   tags     int32 * nodes, preorder; a string id for elements, -1 - string id for text nodes
+#   children int32 * nodes, number of children of each node
+#   nattrs   int32 * nodes, number of attributes of each node
+#   attrs    int32 * 2 * attributes, (name id, value id) pairs in node order
+MAGIC = b"PWDS"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHIIII")
+
+
+def source_hash(encoding: str | None = "utf-8"):
+    # a sha256 to feed the page source to. The same bytes can parse differently under another
+    # parser or another (or a sniffed, None) encoding, so both are part of the key
+    return hashlib.sha256(f"{PARSER_VERSION}\0{encoding}\0".encode())
+
+
+def source_key(data: bytes, encoding: str | None = "utf-8") -> str:
+    digest = source_hash(encoding)
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def _int_array(values: List[int], typecode: str = "i") -> bytes:
+    arr = array(typecode, values)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def dump_tree(root: Element) -> bytes:
+    strings: Dict[str, int] = {}
+    tags, children, nattrs, attrs = [], [], [], []
+
+    def sid(s: str) -> int:
+        index = strings.get(s)
+        if index is None:
+            index = strings[s] = len(strings)
+        return index
+
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            tags.append(-1 - sid(node))
+            children.append(0)
+            nattrs.append(0)
+            continue
+        tags.append(sid(node.tag))
+        children.append(len(node.children))
+        node_attrs = node.attrs
+        nattrs.append(len(node_attrs))
+        for name, value in node_attrs.items():
+            attrs.append(sid(name))
+            attrs.append(sid(value if value is not None else ""))
+        stack.extend(reversed(node.children))
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = [0]
+    for b in encoded:
+        offsets.append(offsets[-1] + len(b))
+    blob = b"".join(encoded)
+    blob += b"\0" * (-len(blob) % 4)
+    return b"".join((_HEADER.pack(MAGIC, FORMAT_VERSION, len(encoded), len(tags), len(attrs) // 2, len(blob)),
+                     _int_array(offsets, "I"), blob, _int_array(tags), _int_array(children), _int_array(nattrs),
+                     _int_array(attrs)))
+
+
+def load_tree(buffer) -> Element:
+    # buffer is anything supporting the buffer protocol, typically an mmap of a snapshot file
+    if sys.byteorder != "little":
+        raise ValueError("DOM snapshots are only read on little endian hosts")
+    view = memoryview(buffer)
+    if len(view) < _HEADER.size:
+        view.release()
+        raise ValueError("not a DOM snapshot")
+    magic, version, n_strings, n_nodes, n_attrs, blob_len = _HEADER.unpack_from(view, 0)
+    expected = _HEADER.size + 4 * (n_strings + 1) + blob_len + 12 * n_nodes + 8 * n_attrs
+    if magic != MAGIC or version != FORMAT_VERSION or len(view) < expected:
+        view.release()
+        raise ValueError("not a DOM snapshot")
+    pos = _HEADER.size
+    # every view into the buffer is released before returning, so an mmap can be closed right after
+    views = []
+
+    def take(size: int, typecode: str | None = None) -> memoryview:
+        nonlocal pos
+        part = view[pos:pos + size]
+        views.append(part)
+        if typecode is not None:
+            part = part.cast(typecode)
+            views.append(part)
+        pos += size
+        return part
+
+    try:
+        # the int arrays are copied out in one go each, indexing a list is cheaper than a memoryview
+        offsets = take(4 * (n_strings + 1), "I").tolist()
+        blob = take(blob_len)
+        tags, children = take(4 * n_nodes, "i").tolist(), take(4 * n_nodes, "i").tolist()
+        nattrs, attrs = take(4 * n_nodes, "i").tolist(), take(8 * n_attrs, "i").tolist()
+
+        # strings are decoded once each, on first use
+        decoded: List[str | None] = [None] * n_strings
+
+        def string(index: int) -> str:
+            s = decoded[index]
+            if s is None:
+                s = decoded[index] = str(blob[offsets[index]:offsets[index + 1]], "utf-8")
+            return s
+
+        root = None
+        # open elements with the number of children still to read
+        stack: List[list] = []
+        attr_pos = 0
+        for i in range(n_nodes):
+            parent = stack[-1][0] if stack else None
+            tag = tags[i]
+            if tag < 0:
+                node = Text(string(-1 - tag))
+            else:
+                count = nattrs[i]
+                node_attrs = None
+                if count:
+                    node_attrs = {string(attrs[j]): string(attrs[j + 1])
+                                  for j in range(2 * attr_pos, 2 * (attr_pos + count), 2)}
+                    attr_pos += count
+                tag_name = string(tag)
+                element_cls = TAG_MAP.get(tag_name)
+                if element_cls is None:
+                    node = Element(tag_name, node_attrs, parent=parent)
+                else:
+                    node = element_cls(node_attrs, parent=parent)
+            if parent is None:
+                root = node
+            else:
+                parent.children.append(node)
+                stack[-1][1] -= 1
+            if tag >= 0 and children[i]:
+                stack.append([node, children[i]])
+            while stack and stack[-1][1] == 0:
+                stack.pop()
+        return root
+    finally:
+        for part in reversed(views):
+            part.release()
+        view.release()
+
+
+# Snapshots of parsed pages on disk, keyed by source_key.
+class SnapshotCache:
+    def __init__(self, cache_dir: str | None = SNAPSHOT_DIR, max_disk_bytes: int = SNAPSHOT_MAX_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.v{FORMAT_VERSION}.dom")
+
+    def load(self, key: str) -> Element | None:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return load_tree(mm)
+        except (OSError, ValueError, IndexError, struct.error):
+            return None
+
+    def store(self, key: str, root: Element):
+        if self.cache_dir:
+            self.write(key, dump_tree(root))
+
+    def write(self, key: str, data: bytes):
+        # data: a tree already serialized by dump_tree
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            return
+        self._trim()
+
+    def _trim(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+snapshot_cache = SnapshotCache()
+
+
+# What the client needs from a parsed page; PyHTMLParser has the same attributes.
+class ParsedPage:
+    def __init__(self, root: Element, stylesheet: StyleSheet, document: Document, scripts: List[Element]):
+        self.root = root
+        self.stylesheet = stylesheet
+        self.document = document
+        self.scripts = scripts
+
+
+def page_from_tree(root: Element) -> ParsedPage:
+    stylesheet = StyleSheet()
+    scripts = []
+    stack = [root]
+    while stack:
+        el = stack.pop()
+        if el.tag == "style":
+            stylesheet.add("".join(c for c in el.children if isinstance(c, str)))
+        elif is_python_script(el):
+            scripts.append(el)
+        stack.extend(c for c in reversed(el.children) if isinstance(c, Element))
+    return ParsedPage(root, stylesheet, Document(root), scripts)
+
+
+def load_page(data: bytes, cache: SnapshotCache = snapshot_cache,
+              min_bytes: int = SNAPSHOT_MIN_SOURCE_BYTES, encoding: str | None = "utf-8") -> ParsedPage:
+    # parses data, or skips parsing altogether when this exact source was parsed before
+    key = source_key(data, encoding) if len(data) >= min_bytes else None
+    if key is not None:
+        with tracing.span("snapshot.load"):
+            root = cache.load(key)
+            page = page_from_tree(root) if root is not None else None
+        if page is not None:
+            tracing.count("snapshot.hits")
+            return page
+    parser = PyHTMLParser(encoding)
+    parser.feed(data)
+    parser.close()
+    if key is not None:
+        with tracing.span("snapshot.store"):
+            cache.store(key, parser.root)
+    return ParsedPage(parser.root, parser.stylesheet, parser.document, parser.scripts)
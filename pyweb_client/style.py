@@ -0,0 +1,169 @@
+from functools import lru_cache
+from typing import Dict, Tuple
+
+from pyweb_api.CSS import StyleSheet
+from pyweb_api.DOM import Element, DIRTY_ATTRS, DIRTY_CHILDREN
+from pyweb_client import tracing
+
+RELIEF_MAP = {
+    "solid": "ridge",
+    "inset": "sunken",
+    "outset": "raised",
+    "none": "flat",
+    "groove": "groove",
+    "ridge": "ridge",
+}
+
+WIDGET_OPTIONS = {
+    "frame": {"bg", "bd", "relief", "width", "height"},
+    "label": {"text", "bg", "fg", "font", "justify", "anchor", "wraplength", "width", "height"},
+    "button": {"text", "bg", "fg", "font", "width", "height", "state"},
+    "entry": {"bg", "fg", "font", "width", "state"},
+}
+
+WIDGET_TYPES = {
+    "div": "frame",
+    "p": "label",
+    "a": "label",
+    "h1": "label",
+    "h2": "label",
+    "h3": "label",
+    "button": "button",
+    "input": "entry"
+}
+
+StyleKey = Tuple[Tuple[str, str], ...]
+
+
+@lru_cache(maxsize=1024)
+def _px(value: str) -> int | None:
+    try:
+        return int(value.replace("px", "").strip())
+    except ValueError:
+        return None
+
+
+def parse_style_to_tk(style: Dict[str, str]) -> Dict[str, Dict[str, any]]:
+    widget_opts = {}
+    pack_opts = {}
+
+    if "color" in style:
+        widget_opts["fg"] = style["color"]
+    if "background-color" in style:
+        widget_opts["bg"] = style["background-color"]
+
+    font_family = style.get("font-family", "Arial")
+    font_size = 12
+    if "font-size" in style:
+        font_size = _px(style["font-size"]) or font_size
+    font_weight = "bold" if style.get("font-weight", "") == "bold" else "normal"
+    font_slant = "italic" if style.get("font-style", "") == "italic" else "roman"
+    widget_opts["font"] = (font_family, font_size, font_weight, font_slant)
+
+    if "text-align" in style:
+        align = style["text-align"].strip()
+        if align in ["left", "center", "right"]:
+            widget_opts["justify"] = align
+
+    if "border-style" in style:
+        css_relief = style["border-style"].strip()
+        if css_relief in RELIEF_MAP:
+            widget_opts["relief"] = RELIEF_MAP[css_relief]
+
+    for css_key, tk_key in (("border-width", "bd"), ("width", "width"), ("height", "height"),
+                            ("wrap-length", "wraplength")):
+        if css_key in style:
+            value = _px(style[css_key])
+            if value is not None:
+                widget_opts[tk_key] = value
+
+    for side in ["top", "right", "bottom", "left"]:
+        key = f"margin-{side}"
+        if key in style:
+            val = _px(style[key])
+            if val is None:
+                continue
+            if side in ["left", "right"]:
+                pack_opts["padx"] = val
+            else:
+                pack_opts["pady"] = val
+
+    # shorthand: margin
+    if "margin" in style:
+        val = _px(style["margin"])
+        if val is not None:
+            pack_opts["padx"] = val
+            pack_opts["pady"] = val
+
+    return {
+        "widget": widget_opts,
+        "pack": pack_opts
+    }
+
+
+def filter_widget_options(tag: str, options: Dict[str, any]) -> Dict[str, any]:
+    allowed_keys = WIDGET_OPTIONS[WIDGET_TYPES.get(tag, "frame")]
+    return {k: v for k, v in options.items() if k in allowed_keys}
+
+
+@lru_cache(maxsize=4096)
+def _tk_style(style_key: StyleKey) -> Dict[str, Dict[str, any]]:
+    return parse_style_to_tk(dict(style_key))
+
+
+@lru_cache(maxsize=8192)
+def _widget_options(tag: str, style_key: StyleKey) -> Dict[str, any]:
+    return filter_widget_options(tag, _tk_style(style_key)["widget"])
+
+
+tracing.register_counter_source("style_cache.hits", lambda: _tk_style.cache_info().hits)
+tracing.register_counter_source("style_cache.misses", lambda: _tk_style.cache_info().misses)
+
+
+# Resolves the computed style of elements against the page's <style> rules and
+# caches the derived Tk options per unique declaration set. The style of each
+# element is kept until the Reconciler reports it changed (see invalidate) or a
+# <style> block adds rules. The cached dicts are shared, so everything returned
+# here is a copy the caller may modify.
+class StyleResolver:
+    def __init__(self, stylesheet: StyleSheet | None = None):
+        self.stylesheet = stylesheet or StyleSheet()
+        self._keys: Dict[Element, StyleKey] = {}
+        self._rules = len(self.stylesheet)
+
+    def computed_style(self, element: Element) -> Dict[str, str]:
+        return dict(self.style_key(element))
+
+    def style_key(self, element: Element) -> StyleKey:
+        if len(self.stylesheet) != self._rules:
+            self._rules = len(self.stylesheet)
+            self._keys.clear()
+        key = self._keys.get(element)
+        if key is None:
+            # presentational attributes < <style> rules < inline style
+            style = element._get_presentational_style()
+            if self._rules:
+                style.update(self.stylesheet.match(element))
+            style.update(element._get_inline_style())
+            key = self._keys[element] = tuple(style.items())
+        return key
+
+    def invalidate(self, element: Element, flags: int):
+        # element's dirty flags, as the Reconciler takes them: new attributes or children can
+        # change which rules match anywhere below element
+        if not flags & (DIRTY_ATTRS | DIRTY_CHILDREN) or not self._keys:
+            return
+        stack = [element]
+        while stack:
+            el = stack.pop()
+            self._keys.pop(el, None)
+            stack.extend(c for c in el.children if isinstance(c, Element))
+
+    def tk_style(self, element: Element) -> Dict[str, Dict[str, any]]:
+        tk_style = _tk_style(self.style_key(element))
+        return {"widget": dict(tk_style["widget"]), "pack": dict(tk_style["pack"])}
+
+    def widget_options(self, element: Element) -> Tuple[Dict[str, any], Dict[str, any]]:
+        # filtered widget options and pack options
+        key = self.style_key(element)
+        return dict(_widget_options(element.tag, key)), dict(_tk_style(key)["pack"])
@@ -0,0 +1,457 @@
+import time
+import tkinter as tk
+from itertools import chain
+from urllib.parse import urljoin
+
+from pyweb_api.DOM import Div, Element, P
+from pyweb_api.Window import Location, Document
+from pyweb_client import tracing
+from pyweb_client.html_parser import PyHTMLParser
+from pyweb_client.loader import PageLoader
+from pyweb_client.network import stream_html, cached_html, fetch_all, http_cache
+from pyweb_client.images import decode_image, show_photo, show_image_error
+from pyweb_client.render import render_element, ProgressiveRenderer
+from pyweb_client.virtual import VirtualRenderer
+from pyweb_client.canvas_render import CanvasRenderer, CanvasItem
+from pyweb_client.reconcile import Reconciler
+from pyweb_client.reflow import Reflow, viewport_width
+from pyweb_client.style import StyleResolver
+from pyweb_client.bfcache import BackForwardCache, PageEntry, estimate_bytes, count_widgets
+from pyweb_client.scripts import ScriptEngine
+from pyweb_client.snapshot import snapshot_cache, source_hash, ParsedPage, SNAPSHOT_MIN_SOURCE_BYTES
+from pyweb_client.parse_pool import parse_page, load_file
+from pyweb_client.app_pages import APP_PAGES, HOME_BUTTON_ID, load_app_page
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pyweb_client.main import PyWebClient
+
+LAZY_IMAGE_MARGIN = 1000  # px above and below the viewport in which images are loaded
+
+# Tab.state
+LIVE = "live"
+FROZEN = "frozen"  # widgets destroyed, DOM kept; rendered again when the tab is shown
+DISCARDED = "discarded"  # only the history is kept; the page is reloaded when the tab is shown
+
+
+# One browsing context: its own Location, Document, render area, loader and
+# back/forward cache. Tabs are passed to render.py and the renderers as `cl`, so
+# they carry the client-wide services (console, image cache, frames, prefetcher)
+# along with their own page state.
+class Tab:
+    def __init__(self, cl: 'PyWebClient', master: tk.Misc):
+        self.cl = cl
+        self.root = cl.root
+        self.console = cl.console
+        self.image_cache = cl.image_cache
+        self.fonts = cl.fonts
+        self.text_metrics = cl.text_metrics
+        self.frames = cl.frames
+        self.prefetcher = cl.prefetcher
+        self.render_engine = cl.render_engine
+        self.virtualize = cl.virtualize
+        self._render_log = cl._render_log
+        self.alert = cl.alert
+
+        self.location = Location(self._on_location_change)
+        self.loader = PageLoader(self.root)
+        self._pending_images = []
+        self.block_renderer = None
+        self.reflow = Reflow(self)
+        self.styles = StyleResolver()
+        self.document = Document()
+        self.reconciler = Reconciler(self)
+        self.bfcache = BackForwardCache()
+        self.scripts = ScriptEngine(self)
+        # the page on screen: its history index, url and, once fully loaded, its root elements
+        self._page_index = -1
+        self._page_url = None
+        self._page_roots = None
+        self._page_bytes = 0  # estimated when the page finished loading, see memory_bytes
+        self.state = LIVE
+        self.last_active = time.monotonic()
+        self._frozen_scroll = 0.0
+
+        self.container = tk.Frame(master)
+        self.render_area_canvas = tk.Canvas(self.container, borderwidth=0)
+        self.render_area = tk.Frame(self.render_area_canvas)
+        self.vsb = tk.Scrollbar(self.container, orient="vertical", command=self.render_area_canvas.yview)
+        self.render_area_canvas.configure(yscrollcommand=self._on_canvas_scroll)
+        self.vsb.pack(side="right", fill="y")
+        self.render_area_canvas.pack(side="left", fill="both", expand=True)
+        self._render_area_item = self.render_area_canvas.create_window((0, 0), window=self.render_area, anchor="nw")
+        self.render_area.bind("<Configure>", self._on_render_area_conf)
+        self.render_area_canvas.bind("<Configure>", self._on_canvas_conf)
+
+    @property
+    def url(self) -> str | None:
+        return self._page_url
+
+    @property
+    def active(self) -> bool:
+        return self.cl.tab is self
+
+    def renders(self, root: Element) -> bool:
+        # whether root is the root of a tree this tab has on screen
+        if root is self.document.root or root in (self._page_roots or ()):
+            return True
+        return self.block_renderer is not None and root in self.block_renderer.roots
+
+    def activate(self):
+        self.last_active = time.monotonic()
+        if self.state == FROZEN:
+            self.state = LIVE
+            for root in self._page_roots:
+                self._render_document(root)
+            self._page_loaded(*self._page_roots)
+            self.root.after_idle(self.render_area_canvas.yview_moveto, self._frozen_scroll)
+        elif self.state == DISCARDED:
+            self.state = LIVE
+            self.reload()
+
+    def reload(self):
+        if self._page_url is not None:
+            self._on_location_change(self._page_url)
+
+    def freeze(self):
+        # only fully loaded pages: there is nothing to render again from otherwise
+        if self.state != LIVE or self._page_roots is None:
+            return
+        self._frozen_scroll = self.render_area_canvas.yview()[0]
+        self.bfcache.drop_widgets()
+        self._pending_images = []
+        self.clear_render_area()
+        self._page_bytes = estimate_bytes(self._page_roots, 0)
+        self.state = FROZEN
+
+    def discard(self):
+        if self.state == DISCARDED:
+            return
+        self.loader.cancel()
+        self.bfcache.clear()
+        self._pending_images = []
+        self.clear_render_area()
+        self.document = Document()
+        self.styles = StyleResolver()
+        self._page_roots = None
+        self._page_bytes = 0
+        self.state = DISCARDED
+
+    def memory_bytes(self) -> int:
+        # estimated size of the page on screen (tree and widgets) plus the back/forward cache
+        return self._page_bytes + self.bfcache.size
+
+    def close(self):
+        for key in ("images", "scrollregion", "resize"):
+            self.frames.cancel((self, key))
+        self.loader.shutdown()
+        self.bfcache.clear()
+        self.clear_render_area()
+        self.container.destroy()
+
+    def _on_location_change(self, url):
+        if url is None:
+            return
+        if url.startswith("/") and self._page_url is not None:
+            # relative to the page this tab shows; history keeps the absolute url
+            url = urljoin(self._page_url, url)
+            self.location.replace(url)
+        # drop whatever the previous page still has in flight
+        self.loader.cancel()
+        tracing.begin_navigation(url)
+        self.prefetcher.page_changed()
+        self._stash_page()
+        self._pending_images = []
+        self.styles = StyleResolver()
+        self.console.log(f"Navigating to: {url}")
+        self.clear_render_area()
+        self.cl.tab_navigated(self, url)
+        self._page_index = self.location.current_index
+        self._page_url = url
+
+        entry = None
+        if self.location.navigation_type == "navigate":
+            self.bfcache.discard_from(self._page_index)
+        else:
+            entry = self.bfcache.take(self._page_index, url)
+
+        if entry is not None:
+            self._restore_page(entry)
+            self.console.log(f"{url} restored from the back/forward cache.")
+
+        elif url in APP_PAGES:
+            self._show_app_page(url)
+
+        elif url.startswith("file://"):
+            file_path = url[len("file://"):]
+            self._load_html_file(file_path)
+
+        elif url.startswith("http"):
+            self._load_url(url)
+
+        else:
+            self.console.error(f"Unknown URL scheme or page: {url}")
+            root_dom_element = Div()
+            root_dom_element.append_child(P())
+            root_dom_element.children[-1].append_child(f"שגיאה: לא ניתן לטעון את הכתובת: {url}")
+            self._render_document(root_dom_element)
+
+    def _load_url(self, url):
+        # a prefetched page or a fresh cached response can come straight from its DOM snapshot,
+        # anything else is streamed
+        def work(token):
+            page = self.prefetcher.take(url)
+            if page is not None:
+                return page
+            text = cached_html(url)
+            return parse_page(text.encode("utf-8")) if text is not None else None
+
+        def on_done(page):
+            if page is None:
+                self._stream_url(url)
+            else:
+                self._show_page(page, f"{url} rendered from cache!")
+
+        self.loader.submit(work, on_done, self._render_error)
+
+    def _stream_url(self, url):
+        parser = PyHTMLParser()
+        self.styles = StyleResolver(parser.stylesheet)
+        renderer = ProgressiveRenderer(self.render_area, parser, self, self._start_block_renderer())
+
+        def work(token):
+            source = source_hash()
+            size = 0
+            for chunk in stream_html(url):
+                if token.cancelled:
+                    return None
+                parser.feed(chunk)
+                token.post(renderer.flush, parser.open_elements())
+                encoded = chunk.encode("utf-8")
+                source.update(encoded)
+                size += len(encoded)
+            parser.close()
+            # snapshot what the HTTP cache kept, so the next fresh hit skips the parser
+            if size >= SNAPSHOT_MIN_SOURCE_BYTES and http_cache.get(url) is not None:
+                snapshot_cache.store(source.hexdigest(), parser.root)
+            return parser.root
+
+        def on_done(_):
+            self.document = parser.document
+            renderer.finish()
+            self._page_loaded(parser.root)
+            self.console.log(f"{url} rendered!")
+            self.scripts.run(parser.scripts, self.document)
+
+        self.loader.submit(work, on_done, self._render_error)
+
+    def _load_html_file(self, file_path):
+        self.console.log(f"Selected file: {file_path}")
+
+        def work(token):
+            return load_file(file_path)
+
+        self.loader.submit(work, lambda page: self._show_page(page, f'file {file_path} rendered!'),
+                           self.console.error)
+
+    def _show_page(self, page: ParsedPage, message: str):
+        self.styles = StyleResolver(page.stylesheet)
+        self.document = page.document
+        self._render_document(page.root)
+        self._page_loaded(page.root)
+        self.console.log(message)
+        self.scripts.run(page.scripts, self.document)
+
+    def _show_app_page(self, url):
+        page = load_app_page(url)
+        root_dom_element = page.root.children[0]
+        if url == "app://home":
+            btn = page.document.get_element_by_id(HOME_BUTTON_ID)
+
+            def click_test(event):
+                self.console.log(event)
+                btn.set_text("Clicked!")
+
+            btn.add_event_listener("click", click_test)
+
+        self.document = page.document
+        self._render_document(root_dom_element)
+        self._page_loaded(root_dom_element)
+        self.console.log(f"{url} rendered.")
+
+    def _page_loaded(self, *roots):
+        self._page_roots = list(roots)
+        canvas = self.render_area_canvas
+        widgets = count_widgets(self.render_area.pack_slaves())
+        widgets += count_widgets([w for w in canvas.winfo_children() if w is not self.render_area])
+        self._page_bytes = estimate_bytes(self._page_roots, widgets)
+        if self.active:
+            self.prefetcher.schedule_idle(self.document.get_elements_by_tag_name("a"))
+        self.cl.enforce_tab_memory()
+
+    def _stash_page(self):
+        # keeps the page being left in the back/forward cache, unless it never finished loading
+        roots, self._page_roots = self._page_roots, None
+        self._page_bytes = 0
+        if roots is None:
+            return
+        widgets = None
+        if self.block_renderer is None:
+            widgets = []
+            for widget in self.render_area.pack_slaves():
+                info = widget.pack_info()
+                info.pop("in", None)
+                widget.pack_forget()
+                widgets.append((widget, info))
+        entry = PageEntry(self._page_url, roots, self.document, self.styles,
+                          (self.render_engine.get(), self.virtualize.get()),
+                          self.render_area_canvas.yview()[0], widgets,
+                          self._pending_images if widgets is not None else None,
+                          self.reflow if widgets is not None else None)
+        self.bfcache.put(self._page_index, entry)
+
+    def _restore_page(self, entry: PageEntry):
+        self.document = entry.document
+        self.styles = entry.styles
+        if entry.widgets and entry.engine == (self.render_engine.get(), self.virtualize.get()):
+            for widget, info in entry.widgets:
+                widget.pack(**info)
+            self._pending_images = entry.images
+            self.reflow = entry.reflow
+            entry.widgets = None
+            entry.images = []
+            entry.reflow = None
+            # the window may have been resized since
+            self.reflow.resize(self._content_width())
+            self.load_pending_images()
+        else:
+            entry.drop_widgets()
+            for root in entry.roots:
+                self._render_document(root)
+        self._page_loaded(*entry.roots)
+        self.root.after_idle(self.render_area_canvas.yview_moveto, entry.scroll)
+
+    def request_image(self, widget, src, size):
+        self._pending_images.append((widget, src, size))
+
+    def load_pending_images(self):
+        # images are fetched once they come within LAZY_IMAGE_MARGIN of the viewport; scrolling
+        # and resizing check again
+        if self._pending_images:
+            self.frames.schedule((self, "images"), self._load_images_in_view)
+
+    def _load_images_in_view(self):
+        canvas = self.render_area_canvas
+        canvas.update_idletasks()
+        top, bottom = -LAZY_IMAGE_MARGIN, canvas.winfo_height() + LAZY_IMAGE_MARGIN
+        visible, pending = [], []
+        for request in self._pending_images:
+            widget, _, (_, height) = request
+            if not widget.winfo_exists():
+                continue
+            y = self._viewport_y(widget)
+            (visible if y + height >= top and y <= bottom else pending).append(request)
+        self._pending_images = pending
+        if visible:
+            self._load_images(visible)
+
+    def _viewport_y(self, widget) -> int:
+        # y of an image target relative to the top of the visible part of the page
+        canvas = self.render_area_canvas
+        if isinstance(widget, CanvasItem):
+            return int(canvas.coords(widget.item)[1] - canvas.canvasy(0))
+        return widget.winfo_rooty() - canvas.winfo_rooty()
+
+    def _load_images(self, requests):
+        widgets_by_key = {}
+        for widget, src, size in requests:
+            widgets_by_key.setdefault((src, size), []).append(widget)
+        sizes_by_src = {}
+        for src, size in widgets_by_key:
+            sizes_by_src.setdefault(src, []).append(size)
+
+        def on_decoded(src, size, im):
+            photo = self.image_cache.put(src, size, im)
+            for widget in widgets_by_key[(src, size)]:
+                if widget.winfo_exists():
+                    show_photo(widget, photo)
+
+        def work(token):
+            remote = [src for src in sizes_by_src if src.startswith("http")]
+            local = [(src, src) for src in sizes_by_src if not src.startswith("http")]
+            for src, data in chain(local, fetch_all(remote)):
+                if token.cancelled:
+                    return
+                for size in sizes_by_src[src]:
+                    try:
+                        if isinstance(data, Exception):
+                            raise data
+                        im = decode_image(data, size)
+                    except Exception as e:
+                        for widget in widgets_by_key[(src, size)]:
+                            token.post(show_image_error, widget, e)
+                        continue
+                    token.post(on_decoded, src, size, im)
+
+        self.loader.submit(work, lambda _: None, self.console.error)
+
+    def _start_block_renderer(self):
+        if self.render_engine.get() == "canvas":
+            self.block_renderer = CanvasRenderer(self.render_area_canvas, self)
+        elif self.virtualize.get():
+            self.block_renderer = VirtualRenderer(self.render_area_canvas, self)
+        return self.block_renderer
+
+    def _render_document(self, root_dom_element):
+        blocks = self.block_renderer or self._start_block_renderer()
+        if blocks:
+            with tracing.span("render.blocks"):
+                blocks.append(root_dom_element)
+                blocks.refresh()
+        else:
+            render_element(self.render_area, root_dom_element, self)
+
+    def _render_error(self, e):
+        content = P()
+        content.children.append(f"ERROR: {e}")
+        self._render_document(content)
+
+    def clear_render_area(self):
+        if self.block_renderer:
+            self.block_renderer.destroy()
+            self.block_renderer = None
+        # unpacked children belong to pages in the back/forward cache
+        for widget in self.render_area.pack_slaves():
+            widget.destroy()
+        self.reflow = Reflow(self, self._content_width())
+
+    def _on_render_area_conf(self, event):
+        if not self.block_renderer:
+            self.frames.schedule((self, "scrollregion"), self._update_scrollregion)
+
+    def _update_scrollregion(self):
+        if not self.block_renderer:
+            self.render_area_canvas.configure(scrollregion=self.render_area_canvas.bbox("all"))
+
+    def _on_canvas_conf(self, event):
+        # a window resize fires many of these, the layout follows once per frame
+        self.frames.schedule((self, "resize"), self._resize)
+
+    def _resize(self):
+        if self.block_renderer:
+            self.block_renderer.resize()
+            return
+        width = self._content_width()
+        # the page is as wide as the viewport, so its Labels can wrap to it
+        self.render_area_canvas.itemconfigure(self._render_area_item, width=width)
+        with tracing.span("reflow", width=width):
+            self.reflow.resize(width)
+
+    def _content_width(self) -> int:
+        return viewport_width(self.render_area_canvas)
+
+    def _on_canvas_scroll(self, first, last):
+        self.vsb.set(first, last)
+        if self.block_renderer:
+            self.block_renderer.update()
+        self.load_pending_images()
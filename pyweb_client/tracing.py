@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List
+
+# Spans and counters for the page-load pipeline. Everything is a no-op until
+# enable() is called: span() hands out one shared do-nothing context manager
+# and count() returns after a single flag check.
+
+MAX_EVENTS = 100_000
+
+_enabled = False
+_lock = threading.Lock()
+_events: List[dict] = []
+_counters: Dict[str, int] = {}
+# counters owned by other modules (e.g. lru_cache statistics), read on demand
+_counter_sources: Dict[str, Callable[[], int]] = {}
+_source_baseline: Dict[str, int] = {}
+_navigation_start = time.perf_counter()
+_navigation_url = None
+_epoch = time.perf_counter()
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("name", "category", "args", "start")
+
+    def __init__(self, name: str, category: str, args: dict):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        _record({"name": self.name, "cat": self.category, "ph": "X", "ts": _micros(self.start),
+                 "dur": (end - self.start) * 1e6, "pid": os.getpid(), "tid": threading.get_ident(),
+                 "args": self.args})
+        return False
+
+
+def _micros(t: float) -> float:
+    return (t - _epoch) * 1e6
+
+
+def _record(event: dict):
+    with _lock:
+        if len(_events) < MAX_EVENTS:
+            _events.append(event)
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, category: str = "pipeline", **args):
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(name, category, args)
+
+
+def count(name: str, value: int = 1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def register_counter_source(name: str, source: Callable[[], int]):
+    _counter_sources[name] = source
+    _source_baseline[name] = source()
+
+
+def begin_navigation(url: str):
+    # counters and the timeline restart with every navigation; the trace keeps everything
+    global _navigation_start, _navigation_url
+    if not _enabled:
+        return
+    now = time.perf_counter()
+    with _lock:
+        _navigation_start = now
+        _navigation_url = url
+        _counters.clear()
+        for name, source in _counter_sources.items():
+            _source_baseline[name] = source()
+    _record({"name": "navigate", "cat": "navigation", "ph": "i", "s": "g", "ts": _micros(now),
+             "pid": os.getpid(), "tid": threading.get_ident(), "args": {"url": url}})
+
+
+def counters() -> Dict[str, int]:
+    with _lock:
+        result = dict(_counters)
+    for name, source in _counter_sources.items():
+        result[name] = source() - _source_baseline.get(name, 0)
+    return result
+
+
+def timeline() -> List[dict]:
+    # spans of the current navigation: name, start and duration in ms relative to its start, thread
+    start = _micros(_navigation_start)
+    with _lock:
+        events = [e for e in _events if e["ph"] == "X" and e["ts"] >= start]
+    return [{"name": e["name"], "start_ms": (e["ts"] - start) / 1000, "duration_ms": e["dur"] / 1000,
+             "tid": e["tid"], "args": e["args"]} for e in events]
+
+
+def navigation_url() -> str | None:
+    return _navigation_url
+
+
+def reset():
+    with _lock:
+        _events.clear()
+        _counters.clear()
+
+
+def chrome_trace() -> dict:
+    # the Trace Event Format read by chrome://tracing and Perfetto
+    now = _micros(time.perf_counter())
+    with _lock:
+        events = list(_events)
+    events.extend({"name": name, "ph": "C", "ts": now, "pid": os.getpid(), "tid": 0, "args": {"value": value}}
+                  for name, value in counters().items())
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export_chrome_trace(path: str):
+    with open(path, "w") as f:
+        json.dump(chrome_trace(), f)
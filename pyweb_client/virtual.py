@@ -0,0 +1,380 @@
+import tkinter as tk
+from typing import Dict, List
+
+from pyweb_api.DOM import Element
+from pyweb_client.images import image_size
+from pyweb_client.reflow import LABEL_CHROME, rewraps, viewport_width
+from pyweb_client.render import (SKIPPED_TAGS, TEXT_TAGS, is_container, in_subtree, render_element,
+                                 text_label_options, list_item_texts)
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from pyweb_client.main import PyWebClient
+
+OVERSCAN = 600  # px materialized above and below the visible region
+CONTAINER_BLOCK_LIMIT = 32  # smaller containers are rendered as one block, bigger ones are flattened
+LABEL_POOL_SIZE = 128
+TREE_BLOCK_ESTIMATE = 30  # px per element of a block that has not been measured yet
+LIST_ITEM_PADX = 10
+LABEL_RESET_OPTIONS = ("text", "background", "foreground", "font", "justify", "anchor", "wraplength",
+                       "width", "height", "borderwidth", "relief")
+
+
+class Block:
+    __slots__ = ("element", "text", "label_opts", "padx", "pady", "height", "item", "widget", "wraplength")
+
+    def __init__(self, element: Element, text: str | None = None, label_opts=None, padx=0, pady=0):
+        self.element = element
+        # blocks with text are drawn with a single (recyclable) Label, the rest with render_element
+        self.text = text
+        self.label_opts = label_opts
+        self.padx = padx
+        self.pady = pady
+        self.height = 0
+        self.item = None
+        self.widget = None
+        self.wraplength = 0  # of the Label while it is materialized
+
+
+# Block heights in a Fenwick tree: the y of a block, the block at a y and a change
+# to one block's height each cost O(log n), however long the page is.
+class Heights:
+    def __init__(self, heights: List[int] = ()):
+        self._heights = list(heights)
+        self._tree = [0] + self._heights
+        size = len(self._tree)
+        for i in range(1, size):
+            parent = i + (i & -i)
+            if parent < size:
+                self._tree[parent] += self._tree[i]
+        self.total = sum(self._heights)
+
+    def __len__(self) -> int:
+        return len(self._heights)
+
+    def append(self, height: int):
+        self._heights.append(height)
+        self.total += height
+        i = len(self._heights)
+        # node i sums the heights (i - lowbit(i), i]
+        self._tree.append(self.total - self.top(i - (i & -i)))
+
+    def set(self, index: int, height: int):
+        delta = height - self._heights[index]
+        if not delta:
+            return
+        self._heights[index] = height
+        self.total += delta
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def top(self, index: int) -> int:
+        # y of block index: the heights of the blocks above it
+        y = 0
+        while index > 0:
+            y += self._tree[index]
+            index -= index & -index
+        return y
+
+    def index_at(self, y: float) -> int:
+        # the block covering y, len(self) below the last one
+        index = 0
+        step = 1 << len(self._tree).bit_length()
+        while step:
+            if index + step < len(self._tree) and self._tree[index + step] <= y:
+                index += step
+                y -= self._tree[index]
+            step >>= 1
+        return index
+
+
+def _count_elements(element: Element, limit: int) -> int:
+    count = 0
+    stack = [element]
+    while stack and count < limit:
+        el = stack.pop()
+        count += 1
+        stack.extend(c for c in el.children if isinstance(c, Element))
+    return count
+
+
+def flatten_blocks(element: Element, cl: 'PyWebClient') -> List[Block]:
+    blocks = []
+    _flatten(element, cl, blocks)
+    return blocks
+
+
+def _flatten(element: Element, cl: 'PyWebClient', blocks: List[Block]):
+    if isinstance(element, str) or element.tag in SKIPPED_TAGS:
+        return
+    tag = element.tag
+    if tag in ("ul", "ol"):
+        for li, li_text in list_item_texts(element):
+            blocks.append(Block(li, li_text, {"anchor": "w", "justify": "left"}, padx=LIST_ITEM_PADX))
+    elif tag in TEXT_TAGS:
+        text, widget_opts, pack_opts = text_label_options(element, cl)
+        blocks.append(Block(element, text, widget_opts, pack_opts.get("padx", 0), pack_opts.get("pady", 0)))
+    elif is_container(tag) and _count_elements(element, CONTAINER_BLOCK_LIMIT) >= CONTAINER_BLOCK_LIMIT:
+        for child in element.children:
+            if isinstance(child, Element):
+                _flatten(child, cl, blocks)
+    elif tag != "li":
+        blocks.append(Block(element))
+
+
+class VirtualRenderer:
+    def __init__(self, canvas: tk.Canvas, cl: 'PyWebClient'):
+        self.canvas = canvas
+        self.cl = cl
+        self.roots: List[Element] = []
+        self.blocks: List[Block] = []
+        self._heights = Heights()
+        self._live: Dict[int, Block] = {}
+        self._label_pool: List[tk.Label] = []
+        self._label_defaults = None
+        self._updating = False
+        self._width = 0
+        # element -> the block that draws it, for relayout_elements
+        self._by_element: Dict[Element, Block] = {}
+
+    def append(self, element: Element):
+        self.roots.append(element)
+        self._width = viewport_width(self.canvas)
+        for block in flatten_blocks(element, self.cl):
+            block.height = self._estimate_height(block)
+            self.blocks.append(block)
+            self._heights.append(block.height)
+            self._by_element[block.element] = block
+
+    @property
+    def total_height(self) -> int:
+        return self._heights.total
+
+    def refresh(self):
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), self.total_height))
+        self.update()
+
+    def update(self):
+        if self._updating:
+            return
+        self._updating = True
+        try:
+            # measuring can move blocks in or out of view, so settle for a few passes
+            for _ in range(3):
+                if not self._update():
+                    break
+        finally:
+            self._updating = False
+
+    def _update(self) -> bool:
+        canvas = self.canvas
+        top = canvas.canvasy(0) - OVERSCAN
+        bottom = canvas.canvasy(canvas.winfo_height()) + OVERSCAN
+        first = self._heights.index_at(max(0, top))
+        last = min(len(self.blocks), self._heights.index_at(bottom) + 1)
+
+        for index in [i for i in self._live if not first <= i < last]:
+            self._release(index)
+
+        created = [i for i in range(first, last) if i not in self._live]
+        for index in created:
+            self._materialize(index)
+        # Labels know their size once configured; trees only after pack has run, see _on_tree_configure
+        return self._measure([i for i in created if self.blocks[i].text is not None])
+
+    def resize(self):
+        width = viewport_width(self.canvas)
+        if width != self._width:
+            self._width = width
+            # only what is on screen is laid out again, the rest is measured once it scrolls into view
+            rewrapped = []
+            for index, block in list(self._live.items()):
+                if block.text is None:
+                    self._release(index)  # rendered again at the new width by update()
+                    continue
+                self.canvas.itemconfigure(block.item, width=max(1, width - 2 * block.padx))
+                wraplength = self._wraplength(block)
+                if rewraps(self.cl.text_metrics, block.text, block.label_opts.get("font", "TkDefaultFont"),
+                           block.wraplength, wraplength):
+                    block.widget.configure(wraplength=wraplength)
+                    block.wraplength = wraplength
+                    rewrapped.append(index)
+            if rewrapped:
+                self._measure(rewrapped)
+        self.refresh()
+
+    def relayout(self):
+        roots = self.roots
+        self.destroy()
+        for root in roots:
+            self.append(root)
+        self.refresh()
+
+    def relayout_elements(self, dirty: Dict[Element, int]):
+        # flattens again only the blocks that draw a changed element (dirty: element -> its dirty
+        # flags): a block's element, or for list items and flattened containers the element whose
+        # blocks they are
+        units = {}
+        for element in dirty:
+            if not any(in_subtree(element, root) for root in self.roots):
+                continue  # not on this page
+            unit = element
+            while unit is not None and unit not in self._by_element:
+                unit = unit.parent
+            if unit is None:
+                unit = element  # a flattened container: all blocks below it
+            elif unit.tag == "li" and unit.parent is not None:
+                unit = unit.parent
+            units[unit] = None
+        # outermost units only, last first so earlier indexes stay valid while splicing
+        spans = []
+        for unit in units:
+            if any(other is not unit and in_subtree(unit, other) for other in units):
+                continue
+            span = self._span(unit)
+            if span is None:
+                self.relayout()  # no blocks to tell where the new ones go
+                return
+            spans.append((span, unit))
+        if not spans:
+            return
+        for (start, stop), unit in sorted(spans, key=lambda s: s[0], reverse=True):
+            for index in range(start, stop):
+                if index in self._live:
+                    self._release(index)
+                self._by_element.pop(self.blocks[index].element, None)
+            blocks = flatten_blocks(unit, self.cl)
+            for block in blocks:
+                block.height = self._estimate_height(block)
+                self._by_element[block.element] = block
+            self.blocks[start:stop] = blocks
+        # the live blocks have moved, as has everything below the first change
+        self._live = {i: block for i, block in enumerate(self.blocks) if block.item is not None}
+        self._heights = Heights([block.height for block in self.blocks])
+        self._place_live()
+        self.refresh()
+
+    def destroy(self):
+        for index in list(self._live):
+            self._release(index)
+        for label in self._label_pool:
+            label.destroy()
+        self._label_pool = []
+        self.roots = []
+        self.blocks = []
+        self._heights = Heights()
+        self._by_element = {}
+
+    def element_at(self, x: int, y: int) -> Element | None:
+        # everything on screen is a real widget, which EventDelegator maps by itself
+        return None
+
+    def _span(self, unit: Element) -> tuple | None:
+        # [start, stop) of the blocks drawing unit and its descendants
+        block = self._by_element.get(unit)
+        if block is not None:
+            start = self.blocks.index(block)
+            return start, start + 1
+        start = next((i for i, b in enumerate(self.blocks) if in_subtree(b.element, unit)), None)
+        if start is None:
+            return None
+        stop = start + 1
+        while stop < len(self.blocks) and in_subtree(self.blocks[stop].element, unit):
+            stop += 1
+        return start, stop
+
+    def _estimate_height(self, block: Block) -> int:
+        if block.element.tag == "img":
+            return image_size(block.element)[1] + LABEL_CHROME + 2 * block.pady
+        if block.text is None:
+            return _count_elements(block.element, CONTAINER_BLOCK_LIMIT) * TREE_BLOCK_ESTIMATE
+        # from the width of each paragraph rather than its line breaks: every block is estimated on append
+        font = block.label_opts.get("font", "TkDefaultFont")
+        measure = self.cl.text_metrics
+        wraplength = self._wraplength(block)
+        lines = sum(max(1, -(-measure.text_width(line, font) // wraplength)) for line in block.text.split("\n"))
+        return lines * measure.linespace(font) + LABEL_CHROME + 2 * block.pady
+
+    def _wraplength(self, block: Block) -> int:
+        # the page's own wraplength, otherwise the width of the canvas
+        if "wraplength" in block.label_opts:
+            return block.label_opts["wraplength"]
+        return max(1, self._width - 2 * block.padx - LABEL_CHROME)
+
+    def _materialize(self, index: int):
+        block = self.blocks[index]
+        if block.text is not None:
+            widget = self._take_label()
+            block.wraplength = self._wraplength(block)
+            widget.configure(text=block.text, **{**block.label_opts, "wraplength": block.wraplength})
+            widget._dom_element = block.element
+            block.element._tk_widget = widget
+        else:
+            # render_element packs into its parent, which must not be the canvas itself
+            widget = tk.Frame(self.canvas)
+            render_element(widget, block.element, self.cl)
+            widget.bind("<Configure>", lambda event, b=block: self._on_tree_configure(b, event.height))
+        block.widget = widget
+        block.item = self.canvas.create_window(block.padx, self._heights.top(index) + block.pady, window=widget,
+                                               anchor="nw", width=max(1, self._width - 2 * block.padx))
+        self._live[index] = block
+
+    def _release(self, index: int):
+        block = self._live.pop(index)
+        self.canvas.delete(block.item)
+        if block.text is not None:
+            block.element._tk_widget = None
+            block.widget._dom_element = None
+            if len(self._label_pool) < LABEL_POOL_SIZE:
+                self._label_pool.append(block.widget)
+            else:
+                block.widget.destroy()
+        else:
+            block.widget.destroy()
+        block.item = None
+        block.widget = None
+
+    def _take_label(self) -> tk.Label:
+        if self._label_pool:
+            label = self._label_pool.pop()
+            label.configure(**self._label_defaults)
+            return label
+        label = tk.Label(self.canvas)
+        if self._label_defaults is None:
+            config = label.configure()
+            self._label_defaults = {k: config[k][3] for k in LABEL_RESET_OPTIONS}
+        return label
+
+    def _measure(self, indexes: List[int]) -> bool:
+        # replace estimates with the requested sizes of materialized Labels, which are up to date
+        # without running pending idle tasks
+        return self._set_heights({index: self.blocks[index].widget.winfo_reqheight() + 2 * self.blocks[index].pady
+                                  for index in indexes})
+
+    def _on_tree_configure(self, block: Block, height: int):
+        # the canvas sizes a tree block's window once pack has laid it out, which is its measurement
+        if block.widget is None or height <= 1:
+            return
+        index = next((i for i, live in self._live.items() if live is block), None)
+        if index is not None and self._set_heights({index: height + 2 * block.pady}):
+            self.update()
+
+    def _set_heights(self, heights: Dict[int, int]) -> bool:
+        changed = False
+        for index, height in heights.items():
+            block = self.blocks[index]
+            if height != block.height:
+                block.height = height
+                self._heights.set(index, height)
+                changed = True
+        if changed:
+            # only what is materialized has a position on the canvas; the rest is placed when it is
+            self._place_live()
+            self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), self.total_height))
+        return changed
+
+    def _place_live(self):
+        for index, block in self._live.items():
+            self.canvas.coords(block.item, block.padx, self._heights.top(index) + block.pady)
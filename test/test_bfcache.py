@@ -0,0 +1,104 @@
+# Back/forward cache: entries come back for their own history index and URL
+# only, are evicted oldest first by count and by estimated size, and every entry
+# that leaves the cache has its kept widgets destroyed. Widgets are fakes.
+#
+#     python -m pytest test
+import unittest
+
+from pyweb_api.DOM import Element, Text
+from pyweb_api.Window import Document
+from pyweb_client.bfcache import BackForwardCache, PageEntry, estimate_bytes, NODE_BYTES, WIDGET_BYTES
+from pyweb_client.style import StyleResolver
+
+
+class _Widget:
+    def __init__(self, children=()):
+        self.children = list(children)
+        self.destroyed = False
+
+    def winfo_children(self):
+        return self.children
+
+    def destroy(self):
+        self.destroyed = True
+
+
+def _page(paragraphs: int = 1) -> Element:
+    root = Element("div")
+    for _ in range(paragraphs):
+        p = Element("p")
+        p.append_child(Text("text"))
+        root.append_child(p)
+    return root
+
+
+def _entry(url: str, paragraphs: int = 1, widgets: bool = True) -> PageEntry:
+    root = _page(paragraphs)
+    kept = [(_Widget([_Widget()]), {})] if widgets else None
+    return PageEntry(url, [root], Document(root), StyleResolver(), ("widgets", False), 0.0, kept)
+
+
+class BackForwardCacheTest(unittest.TestCase):
+    def test_estimate(self):
+        root = _page(2)
+        self.assertEqual(estimate_bytes([root], 3), 3 * NODE_BYTES + 2 * (50 + 4) + 3 * WIDGET_BYTES)
+        self.assertEqual(_entry("a").size, 2 * NODE_BYTES + 54 + 2 * WIDGET_BYTES)
+
+    def test_take_only_matches_the_same_entry(self):
+        cache = BackForwardCache()
+        first, second = _entry("a"), _entry("b")
+        cache.put(0, first)
+        cache.put(1, second)
+        self.assertIs(cache.take(0, "a"), first)
+        self.assertIsNone(cache.take(0, "a"))  # taken entries leave the cache
+        self.assertFalse(first.widgets[0][0].destroyed)
+
+        # the same index now holding another URL: the entry is stale
+        widget = second.widgets[0][0]
+        self.assertIsNone(cache.take(1, "c"))
+        self.assertTrue(widget.destroyed)
+        self.assertEqual((len(cache), cache.size), (0, 0))
+
+    def test_eviction_by_count_and_size(self):
+        cache = BackForwardCache(max_entries=2)
+        entries = [_entry(str(index)) for index in range(3)]
+        for index, entry in enumerate(entries):
+            cache.put(index, entry)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.take(0, "0"))
+        self.assertIsNone(entries[0].widgets)
+
+        small, large = _entry("small"), _entry("large", paragraphs=20)
+        cache = BackForwardCache(max_bytes=large.size + small.size - 1)
+        cache.put(0, small)
+        cache.put(1, large)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.size, large.size)
+
+        # an entry larger than the whole cache is not kept at all
+        huge = _entry("huge", paragraphs=100)
+        widget = huge.widgets[0][0]
+        cache.put(2, huge)
+        self.assertTrue(widget.destroyed)
+        self.assertIsNone(cache.take(2, "huge"))
+
+    def test_drop_widgets_and_discard(self):
+        cache = BackForwardCache()
+        entries = [_entry(str(index)) for index in range(4)]
+        for index, entry in enumerate(entries):
+            cache.put(index, entry)
+        cache.drop_widgets()
+        self.assertEqual(len(cache), 4)
+        self.assertTrue(all(entry.widgets is None for entry in entries))
+        self.assertEqual(cache.size, sum(estimate_bytes(entry.roots, 0) for entry in entries))
+
+        # navigating from history entry 2 replaces entries 2 and 3
+        cache.discard_from(2)
+        self.assertEqual(len(cache), 2)
+        self.assertIs(cache.take(1, "1"), entries[1])
+        cache.clear()
+        self.assertEqual((len(cache), cache.size), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
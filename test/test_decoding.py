@@ -0,0 +1,136 @@
+# Turning bytes into text: encodings sniffed from the BOM and <meta charset>, the
+# windows-1252 fallback for undeclared documents, Content-Encoding decompression,
+# and HTTP bodies served by a local http.server stand-in.
+#
+#     python -m pytest test
+import codecs
+import gzip
+import threading
+import unittest
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pyweb_client import network
+from pyweb_client.decoding import SNIFF_BYTES, StreamDecoder, decompress, decompressor
+
+PAGE = "<html><body><p>café</p></body></html>"
+
+
+def _decode_in_chunks(data: bytes, size: int, encoding: str | None = None) -> StreamDecoder:
+    decoder = StreamDecoder(encoding)
+    decoder.text = "".join(decoder.decode(data[start:start + size]) for start in range(0, len(data), size))
+    decoder.text += decoder.decode(b"", final=True)
+    return decoder
+
+
+class StreamDecoderTest(unittest.TestCase):
+    def test_declared_encodings(self):
+        meta = '<meta charset="iso-8859-7"><p>αβγ</p>'
+        for data, text, encoding in [
+            (codecs.BOM_UTF8 + PAGE.encode("utf-8"), PAGE, "utf-8-sig"),
+            (PAGE.encode("utf-16"), PAGE, "utf-16"),
+            (meta.encode("iso-8859-7"), meta, "iso8859-7"),
+        ]:
+            for size in (1, 7, 4096):
+                decoder = _decode_in_chunks(data, size)
+                self.assertEqual(decoder.text, text)
+                self.assertEqual(decoder.encoding, encoding)
+                self.assertFalse(decoder.guessed)
+
+    def test_undeclared_documents_fall_back_to_windows_1252(self):
+        # the first non-UTF-8 byte comes after the sniffed head, once text was already decoded
+        text = "a" * (2 * SNIFF_BYTES) + "café – 10€"
+        for size in (1, 100, 100000):
+            decoder = _decode_in_chunks(text.encode("cp1252"), size)
+            self.assertEqual(decoder.text, text)
+            self.assertEqual(decoder.encoding, "cp1252")
+            self.assertTrue(decoder.guessed)
+
+        decoder = _decode_in_chunks(text.encode("utf-8"), 3)
+        self.assertEqual(decoder.text, text)
+        self.assertEqual(decoder.encoding, "utf-8")
+        self.assertTrue(decoder.guessed)
+
+    def test_given_encoding_wins(self):
+        data = '<meta charset="utf-8">café'.encode("cp1252")
+        self.assertEqual(_decode_in_chunks(data, 5, "cp1252").text, '<meta charset="utf-8">café')
+
+
+class DecompressTest(unittest.TestCase):
+    def test_content_encodings(self):
+        data = PAGE.encode() * 50
+        raw = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        for encoding, body in [("gzip", gzip.compress(data)),
+                               ("deflate", zlib.compress(data)),
+                               ("deflate", raw.compress(data) + raw.flush()),
+                               (None, data)]:
+            self.assertEqual(decompress(body, encoding), data)
+            inflate = decompressor(encoding)
+            if inflate is not None:
+                chunks = [inflate.decompress(body[start:start + 3]) for start in range(0, len(body), 3)]
+                self.assertEqual(b"".join(chunks) + inflate.flush(), data)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/gzip":
+            self._send(gzip.compress(PAGE.encode()), {"Content-Encoding": "gzip", "Content-Type": "text/html"})
+        elif self.path == "/latin":
+            # no charset anywhere, and not UTF-8
+            self._send(PAGE.encode("cp1252"), {"Content-Type": "text/html"})
+        else:
+            self.send_error(404)
+
+    def _send(self, body: bytes, headers: dict):
+        self.send_response(200)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HttpBodyTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.daemon_threads = True
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        cache = network.http_cache
+        network.http_cache = network.HttpCache()
+        self.addCleanup(setattr, network, "http_cache", cache)
+        network.close_session()
+        self.addCleanup(network.close_session)
+
+    def test_gzip_body_is_cached_compressed(self):
+        url = f"{self.base}/gzip"
+        self.assertEqual(network.fetch_html(url), PAGE)
+        entry = network.http_cache.get(url)
+        self.assertEqual(entry.content_encoding, "gzip")
+        self.assertEqual(entry.body[:2], b"\x1f\x8b")
+        self.assertEqual(entry.text(), PAGE)
+        self.assertEqual("".join(entry.iter_text(chunk_size=8)), PAGE)
+
+    def test_undeclared_encoding_falls_back_to_windows_1252(self):
+        url = f"{self.base}/latin"
+        self.assertEqual(network.fetch_html(url), PAGE)
+        self.assertEqual(network.http_cache.get(url).text(), PAGE)
+        self.assertEqual("".join(network.stream_html(url)), PAGE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+# Document's live id/tag/class indexes: lookups stay in step with the tree
+# through every mutation, agree with a walk over the tree, and come back in
+# document order.
+#
+#     python -m pytest test
+import random
+import unittest
+
+from pyweb_api.DOM import Element
+from pyweb_api.Window import Document
+from pyweb_client.html_parser import PyHTMLParser
+
+
+def _parse(html: str) -> Document:
+    parser = PyHTMLParser()
+    parser.feed(html)
+    parser.close()
+    return parser.document
+
+
+def _walk(document: Document):
+    stack = [document.root]
+    while stack:
+        el = stack.pop()
+        yield el
+        stack.extend(reversed([c for c in el.children if isinstance(c, Element)]))
+
+
+class DocumentIndexTest(unittest.TestCase):
+    def assertIndexesMatchTree(self, document: Document):
+        elements = list(_walk(document))
+        for tag in {el.tag for el in elements}:
+            self.assertEqual(document.get_elements_by_tag_name(tag), [el for el in elements if el.tag == tag])
+        for name in {name for el in elements for name in el.class_list}:
+            self.assertEqual(document.get_elements_by_class_name(name),
+                             [el for el in elements if name in el.class_list])
+        for _id in {el.id for el in elements if el.id is not None}:
+            self.assertIs(document.get_element_by_id(_id), next(el for el in elements if el.id == _id))
+
+    def test_lookups(self):
+        document = _parse('<div id="a" class="x y"><p class="y">1</p><P ID="b" class="x">2</P></div><p id="a">3</p>')
+        div = document.get_element_by_id("a")
+        self.assertEqual(div.tag, "div")  # the first of two elements with the same id
+        self.assertEqual([el.get_attribute("class") for el in document.get_elements_by_class_name("y")],
+                         ["x y", "y"])
+        self.assertEqual(document.get_elements_by_class_name("y x"), [div])
+        self.assertEqual(document.get_elements_by_class_name(" "), [])
+        self.assertEqual(len(document.get_elements_by_tag_name("P")), 3)
+        self.assertIsNotNone(document.get_element_by_id("b"))
+        self.assertIsNone(document.get_element_by_id("missing"))
+
+    def test_mutations(self):
+        document = _parse('<div id="a"><p class="x">1</p></div>')
+        div = document.get_element_by_id("a")
+        p = div.children[0]
+
+        p.set_attribute("id", "p1")
+        p.add_class("y")
+        self.assertIs(document.get_element_by_id("p1"), p)
+        self.assertEqual(document.get_elements_by_class_name("y"), [p])
+        p.id = "p2"
+        p.remove_class("x")
+        self.assertIsNone(document.get_element_by_id("p1"))
+        self.assertEqual(document.get_elements_by_class_name("x"), [])
+
+        # a detached subtree leaves the indexes, and can be attached somewhere else
+        div.remove_child(p)
+        self.assertIsNone(document.get_element_by_id("p2"))
+        self.assertEqual(document.get_elements_by_tag_name("p"), [])
+        p.set_attribute("class", "z")
+        self.assertEqual(document.get_elements_by_class_name("z"), [])
+        span = Element("span", {"id": "s", "class": "z"})
+        p.append_child(span)
+        document.root.append_child(p)
+        self.assertEqual(document.get_elements_by_class_name("z"), [p, span])
+        self.assertIs(document.get_element_by_id("s"), span)
+
+        div.set_text("gone")
+        self.assertIsNone(document.get_element_by_id("nothing"))
+        self.assertIndexesMatchTree(document)
+
+    def test_random_mutations_keep_the_indexes_in_step(self):
+        rng = random.Random(4)
+        document = _parse("<div><p>x</p></div>")
+        for step in range(500):
+            elements = list(_walk(document))
+            el = rng.choice(elements)
+            action = rng.randrange(5)
+            if action == 0:
+                el.append_child(Element(rng.choice(["p", "div", "span"]),
+                                        {"class": rng.choice(["a", "b", "a b"]), "id": f"e{rng.randrange(20)}"}))
+            elif action == 1 and el is not document.root:
+                el.parent.remove_child(el)
+            elif action == 2:
+                el.set_attribute("class", rng.choice(["a", "b", "c", ""]))
+            elif action == 3:
+                el.id = f"e{rng.randrange(20)}"
+            elif action == 4 and el is not document.root:
+                # moves el under another element outside its own subtree
+                target = rng.choice([other for other in elements if other is not el
+                                     and el not in other._get_ancestry_path()])
+                target.append_child(el)
+        self.assertIndexesMatchTree(document)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+# Slotted DOM nodes: no per-instance __dict__, attributes and listeners only
+# allocated once used, a read-only attrs view, and Text nodes that stay strings.
+#
+#     python -m pytest test
+import unittest
+
+from pyweb_api.DOM import Element, Text, Event, TAG_MAP, DIRTY_ATTRS, set_mutation_observer
+from pyweb_api.Window import Document
+
+
+class ElementTest(unittest.TestCase):
+    def test_slots(self):
+        for cls in [Element, Text] + list(TAG_MAP.values()):
+            element = cls("x") if cls in (Element, Text) else cls()
+            self.assertFalse(hasattr(element, "__dict__"), cls)
+        with self.assertRaises(AttributeError):
+            Element("div").color = "red"
+
+    def test_attributes_are_allocated_on_first_write(self):
+        first, second = Element("div"), Element("p")
+        self.assertIsNone(first._attrs)
+        self.assertIsNone(first._listeners)
+        self.assertIs(first.attrs, second.attrs)  # the shared empty view
+        self.assertEqual(dict(first.attrs), {})
+        self.assertEqual(dict(first.listeners), {})
+
+        first.set_attribute("title", "t")
+        self.assertEqual(dict(first.attrs), {"title": "t"})
+        self.assertEqual(dict(second.attrs), {})
+        first.add_event_listener("click", print)
+        self.assertEqual(dict(second.listeners), {})
+
+    def test_attrs_view_is_read_only(self):
+        observed = []
+        set_mutation_observer(observed.append)
+        self.addCleanup(set_mutation_observer, None)
+        document = Document()
+        element = Element("div", {"id": "a", "class": "x"}, _id="b")
+        document.root.append_child(element)
+        element._dirty = 0
+        observed.clear()
+
+        with self.assertRaises(TypeError):
+            element.attrs["id"] = "c"
+        # assigning attrs goes through set_attribute / remove_attribute
+        element.attrs = {"id": "c", "title": "t"}
+        self.assertEqual(dict(element.attrs), {"id": "c", "title": "t"})
+        self.assertIs(document.get_element_by_id("c"), element)
+        self.assertEqual(document.get_elements_by_class_name("x"), [])
+        self.assertEqual(observed, [element])
+        self.assertTrue(element._dirty & DIRTY_ATTRS)
+
+    def test_constructor_id_and_given_attrs(self):
+        attrs = {"class": "x"}
+        element = Element("DIV", attrs, _id="main")
+        self.assertEqual(element.tag, "DIV")
+        self.assertEqual(element.id, "main")
+        self.assertEqual(attrs, {"class": "x"})  # copied, not taken over
+        self.assertIs(TAG_MAP["p"]({"id": "q"}).tag, "p")
+
+    def test_text_nodes(self):
+        text = Text("hello")
+        self.assertIsInstance(text, str)
+        self.assertEqual(text, "hello")
+        self.assertEqual(text.data, "hello")
+        self.assertEqual(repr(text), "<#text 'hello'>")
+        element = Element("p")
+        element.set_text("new")
+        self.assertIsInstance(element.children[0], Text)
+
+    def test_listeners_and_dispatch(self):
+        document = Document()
+        outer, inner = Element("div"), Element("p")
+        outer.append_child(inner)
+        document.root.append_child(outer)
+        calls = []
+        outer.add_event_listener("click", lambda e: calls.append(("capture", e.current_target.tag)), "capture")
+        outer.add_event_listener("click", lambda e: calls.append(("bubble", e.current_target.tag)))
+        inner.add_event_listener("click", lambda e: calls.append(("target", e.current_target.tag)))
+        self.assertTrue(document.has_listeners("click"))
+
+        inner.dispatch_event(Event("click", inner))
+        self.assertEqual(calls, [("capture", "div"), ("target", "p"), ("bubble", "div")])
+
+        # a detached subtree takes its listeners with it
+        document.root.remove_child(outer)
+        self.assertFalse(document.has_listeners("click"))
+
+
+if __name__ == "__main__":
+    unittest.main()
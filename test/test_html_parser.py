@@ -0,0 +1,119 @@
+# PyHTMLParser: tree construction (void elements, implied end tags, stray end
+# tags, raw text), attributes and entities, feeding in arbitrary chunks, and the
+# garbage collector being handed back as it was found.
+#
+#     python -m pytest test
+import gc
+import unittest
+
+from pyweb_api.DOM import Element, TAG_MAP
+from pyweb_client.html_parser import PyHTMLParser
+
+PAGE = """<!DOCTYPE html><html><head><title>A &amp; B</title>
+<style>p > a { color: red; }</style></head><body>
+<!-- a comment with <p> inside -->
+<div id=main class="a b" data-x='1 > 0'><p>one<p>two &lt;3 &copy;<br>three</p>
+<ul><li>x<li>y</ul><table><tr><td>1<td>2<tr><td>3</table>
+<input value="&quot;q&quot;" disabled><img src=x.png/>
+<script type="text/python">if a < b and "</p>" != "</div>":
+    pass</script><textarea>&lt;b&gt;</textarea></div></span></body></html>"""
+
+
+def _parse(*chunks) -> PyHTMLParser:
+    parser = PyHTMLParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    return parser
+
+
+def _shape(node):
+    if isinstance(node, str):
+        return str(node)
+    return node.tag, dict(node.attrs), [_shape(child) for child in node.children]
+
+
+def _tags(element: Element):
+    return [child.tag if isinstance(child, Element) else child for child in element.children]
+
+
+class HtmlParserTest(unittest.TestCase):
+    def test_tree(self):
+        parser = _parse(PAGE)
+        document = parser.document
+        div = document.get_element_by_id("main")
+        self.assertEqual(len(div.children), 8)
+        self.assertEqual([_tags(div)[index] for index in (0, 1, 2, 3, 5, 6, 7)],
+                         ["p", "p", "ul", "table", "img", "script", "textarea"])
+        self.assertIs(type(div.children[4]), TAG_MAP["input"])
+        self.assertEqual(dict(div.attrs), {"id": "main", "class": "a b", "data-x": "1 > 0"})
+
+        first, second = div.children[0], div.children[1]
+        self.assertEqual(_tags(first), ["one"])  # the second <p> closes the first
+        self.assertEqual(_tags(second), ["two <3 ©", "br", "three"])
+        self.assertEqual([_tags(li) for li in div.children[2].children], [["x"], ["y"]])
+        rows = div.children[3].children
+        self.assertEqual([[_tags(td) for td in row.children] for row in rows], [[["1"], ["2"]], [["3"]]])
+
+        input_, img = div.children[4], div.children[5]
+        self.assertEqual(dict(input_.attrs), {"value": '"q"', "disabled": ""})
+        self.assertEqual(input_.children, [])
+        self.assertEqual(dict(img.attrs), {"src": "x.png/"})
+
+        # raw text: markup-looking script text stays text, textarea decodes entities
+        script, textarea = div.children[6], div.children[7]
+        self.assertEqual(script.children, ['if a < b and "</p>" != "</div>":\n    pass'])
+        self.assertEqual(parser.scripts, [script])
+        self.assertEqual(textarea.children, ["<b>"])
+        self.assertEqual(document.get_elements_by_tag_name("title")[0].children, ["A & B"])
+        self.assertEqual(len(parser.stylesheet), 1)
+
+    def test_unterminated_markup(self):
+        parser = _parse('<p title="never closed>text</p><p>after</p>x < y <')
+        paragraphs = parser.root.children
+        self.assertEqual(dict(paragraphs[0].attrs), {"title": '"never', "closed": ""})
+        self.assertEqual(_tags(paragraphs[1]), ["after"])
+        self.assertEqual(paragraphs[-1], "x < y <")
+
+    def test_chunk_boundaries_do_not_matter(self):
+        expected = _shape(_parse(PAGE).root)
+        for size in (1, 2, 3, 7, 64):
+            chunks = [PAGE[start:start + size] for start in range(0, len(PAGE), size)]
+            self.assertEqual(_shape(_parse(*chunks).root), expected, size)
+        data = PAGE.encode("utf-8")
+        for size in (1, 5):
+            chunks = [data[start:start + size] for start in range(0, len(data), size)]
+            self.assertEqual(_shape(_parse(*chunks).root), expected, size)
+
+    def test_sniffed_encoding(self):
+        data = '<meta charset="iso-8859-7"><p>αβγ</p>'.encode("iso-8859-7")
+        parser = PyHTMLParser(encoding=None)
+        parser.feed(data)
+        parser.close()
+        self.assertEqual(parser.encoding, "iso8859-7")
+        self.assertEqual(parser.root.children[1].children, ["αβγ"])
+
+    def test_open_elements(self):
+        parser = PyHTMLParser()
+        parser.feed("<div><p>one</p><p>tw")
+        opened = {element.tag: count for element, count in parser.open_elements().items()}
+        self.assertEqual(opened, {"root": 1, "div": 2, "p": 0})
+
+    def test_collector_is_left_as_it_was(self):
+        self.assertTrue(gc.isenabled())
+        parser = PyHTMLParser()
+        parser.feed("<div>")
+        self.assertTrue(gc.isenabled())
+        parser.close()
+        self.assertTrue(gc.isenabled())
+
+        gc.disable()
+        try:
+            _parse(PAGE)
+            self.assertFalse(gc.isenabled())
+        finally:
+            gc.enable()
+
+
+if __name__ == "__main__":
+    unittest.main()
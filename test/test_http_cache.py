@@ -0,0 +1,123 @@
+# HTTP cache against a local http.server stand-in: fresh responses served without
+# a request, stale ones revalidated with their ETag, the disk cache, and the byte
+# accounting of the memory cache across revalidations.
+#
+#     python -m pytest test
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pyweb_client import network
+from pyweb_client.network import CacheEntry, HttpCache
+
+PAGE = "<html><body><p>café</p></body></html>"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append(self.path)
+        if self.path == "/revalidate":
+            if self.headers.get("If-None-Match") == '"v1"':
+                # a longer header than the one first sent, so the entry's size changes
+                self._send(304, b"", {"ETag": '"v1"', "Cache-Control": "no-cache, must-revalidate"})
+            else:
+                self._send(200, PAGE.encode(), {"ETag": '"v1"', "Cache-Control": "no-cache",
+                                                "Content-Type": "text/html; charset=utf-8"})
+        elif self.path == "/fresh":
+            self._send(200, PAGE.encode(), {"Cache-Control": "max-age=60", "Content-Type": "text/html"})
+        else:
+            self._send(404, b"", {})
+
+    def _send(self, status: int, body: bytes, headers: dict):
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HttpCacheTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.daemon_threads = True
+        cls.server.lock = threading.Lock()
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.disk_dir = directory.name
+        cache = network.http_cache
+        network.http_cache = HttpCache(disk_dir=self.disk_dir)
+        self.addCleanup(setattr, network, "http_cache", cache)
+        network.close_session()
+        self.addCleanup(network.close_session)
+        self.server.requests = []
+
+    def test_fresh_response_is_served_from_cache(self):
+        url = f"{self.base}/fresh"
+        self.assertEqual(network.fetch_html(url), PAGE)
+        self.assertEqual(network.fetch_html(url), PAGE)
+        self.assertEqual(network.cached_html(url), PAGE)
+        self.assertEqual(self.server.requests, ["/fresh"])
+
+    def test_stale_response_is_revalidated(self):
+        url = f"{self.base}/revalidate"
+        self.assertEqual(network.fetch_html(url), PAGE)
+        self.assertIsNone(network.cached_html(url))  # no-cache: never fresh
+        # the second fetch sends If-None-Match, gets a 304 and keeps the cached body
+        self.assertEqual(network.fetch_html(url), PAGE)
+        self.assertEqual(network.fetch_bytes(url), PAGE.encode())
+        self.assertEqual(self.server.requests, ["/revalidate"] * 3)
+        entry = network.http_cache.get(url)
+        self.assertEqual(entry.etag, '"v1"')
+        self.assertEqual(entry.headers["Cache-Control"], "no-cache, must-revalidate")
+
+    def test_revalidation_keeps_the_size_in_step(self):
+        url = f"{self.base}/revalidate"
+        for _ in range(3):
+            network.fetch_html(url)
+        cache = network.http_cache
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.size, cache.get(url).size)
+        cache.remove(url)
+        self.assertEqual(cache.size, 0)
+
+    def test_entries_outlive_the_memory_cache_on_disk(self):
+        url = f"{self.base}/fresh"
+        network.fetch_html(url)
+        network.http_cache = HttpCache(disk_dir=self.disk_dir)
+        self.assertEqual(network.fetch_html(url), PAGE)
+        self.assertEqual(self.server.requests, ["/fresh"])
+
+    def test_memory_cache_evicts_least_recently_used(self):
+        entries = {f"http://example.com/{index}": CacheEntry(f"http://example.com/{index}", {}, b"x" * 100, "utf-8")
+                   for index in range(3)}
+        cache = HttpCache(max_bytes=250)
+        for url, entry in entries.items():
+            cache.put(url, entry)
+            cache.get("http://example.com/0")  # keeps the first one in use
+        self.assertIsNotNone(cache.get("http://example.com/0"))
+        self.assertIsNone(cache.get("http://example.com/1"))
+        self.assertEqual(cache.size, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
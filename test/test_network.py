@@ -0,0 +1,110 @@
+# Network layer against a local http.server stand-in: connection pooling,
+# keep-alive and parallel subresource fetches.
+#
+#     python -m pytest test
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pyweb_client import network
+
+IMAGE_DELAY = 0.1  # s each image takes to serve, so parallel fetches overlap
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-alive needs HTTP/1.1 and a Content-Length on every response
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            self._respond()
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _respond(self):
+        if self.path.startswith("/img/"):
+            time.sleep(IMAGE_DELAY)
+            self._send(200, self.path.encode(), {"Content-Type": "image/png"})
+        else:
+            self._send(404, b"", {})
+
+    def _send(self, status: int, body: bytes, headers: dict):
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class NetworkTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.daemon_threads = True
+        cls.server.lock = threading.Lock()
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        # in memory only, see test_http_cache.py for the disk cache
+        cache = network.http_cache
+        network.http_cache = network.HttpCache()
+        self.addCleanup(setattr, network, "http_cache", cache)
+        network.close_session()
+        server = self.server
+        server.connections = 0
+        server.requests = []
+        server.in_flight = 0
+        server.max_in_flight = 0
+
+    def tearDown(self):
+        network.close_session()
+
+    def test_keep_alive(self):
+        for index in range(5):
+            network.fetch_bytes(f"{self.base}/img/{index}")
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_parallel_fetches_share_the_pool(self):
+        urls = [f"{self.base}/img/{index}" for index in range(3 * network.POOL_PER_HOST)]
+        started = time.perf_counter()
+        results = dict(network.fetch_all(urls + urls[:3]))
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(sorted(results), sorted(urls))
+        for url, body in results.items():
+            self.assertEqual(body, url[len(self.base):].encode())
+        # duplicates are fetched once, never more than POOL_PER_HOST at a time, over at most that many connections
+        self.assertEqual(len(self.server.requests), len(urls))
+        self.assertLessEqual(self.server.max_in_flight, network.POOL_PER_HOST)
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertLessEqual(self.server.connections, network.POOL_PER_HOST)
+        self.assertLess(elapsed, len(urls) * IMAGE_DELAY / 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+# Reconciler: DOM mutations batched into one flush per Tk idle callback, marks
+# from script threads handed over to the Tk thread, styles invalidated on flush,
+# and text changes patched into the existing widget. Tk is stood in for by fakes
+# that queue callbacks and record what is configured.
+#
+#     python -m pytest test
+import threading
+import unittest
+
+from pyweb_api.DOM import Element, DIRTY_ATTRS, DIRTY_CHILDREN, DIRTY_TEXT, set_mutation_observer
+from pyweb_api.Window import Document
+from pyweb_client.html_parser import PyHTMLParser
+from pyweb_client.reconcile import Reconciler, REMOTE_BATCH_MS
+from pyweb_client.style import StyleResolver
+
+
+class _Root:
+    def __init__(self):
+        self.idle = []
+        self.later = []
+        self.lock = threading.Lock()
+
+    def after_idle(self, callback, *args):
+        self.idle.append((callback, args))
+
+    def after(self, delay, callback, *args):
+        with self.lock:
+            self.later.append((delay, callback, args))
+
+    def run(self):
+        # one turn of the event loop: timers first, then idle callbacks
+        with self.lock:
+            later, self.later = self.later, []
+        for _, callback, args in later:
+            callback(*args)
+        idle, self.idle = self.idle, []
+        for callback, args in idle:
+            callback(*args)
+
+
+class _BlockRenderer:
+    def __init__(self):
+        self.relayouts = []
+
+    def relayout_elements(self, dirty):
+        self.relayouts.append(dict(dirty))
+
+
+class _Label:
+    def __init__(self):
+        self.options = {"text": ""}
+
+    def winfo_exists(self):
+        return True
+
+    def keys(self):
+        return list(self.options)
+
+    def config(self, **options):
+        self.options.update(options)
+
+
+class _Client:
+    def __init__(self, stylesheet=None, blocks: bool = True):
+        self.root = _Root()
+        self.styles = StyleResolver(stylesheet)
+        self.block_renderer = _BlockRenderer() if blocks else None
+
+
+class ReconcilerTest(unittest.TestCase):
+    def setUp(self):
+        parser = PyHTMLParser()
+        parser.feed('<style>.hot { color: red }</style><div id="d"><p id="p">x</p></div>')
+        parser.close()
+        self.document: Document = parser.document
+        self.div = self.document.get_element_by_id("d")
+        self.p = self.document.get_element_by_id("p")
+        self.cl = _Client(parser.stylesheet)
+        self.reconciler = Reconciler(self.cl)
+        set_mutation_observer(self.reconciler.mark)
+        self.addCleanup(set_mutation_observer, None)
+
+    def test_mutations_are_batched_per_idle_callback(self):
+        self.p.set_text("y")
+        self.p.set_attribute("title", "t")
+        self.div.append_child(Element("span"))
+        self.assertEqual(len(self.cl.root.idle), 1)
+        self.cl.root.run()
+        self.assertEqual(self.cl.block_renderer.relayouts,
+                         [{self.p: DIRTY_TEXT | DIRTY_ATTRS, self.div: DIRTY_CHILDREN}])
+        self.assertEqual((self.p._dirty, self.div._dirty), (0, 0))
+
+        self.p.set_text("z")
+        self.assertEqual(len(self.cl.root.idle), 1)
+        self.cl.root.run()
+        self.assertEqual(self.cl.block_renderer.relayouts[-1], {self.p: DIRTY_TEXT})
+
+    def test_appending_a_child_again_moves_it(self):
+        first, second = Element("span"), Element("b")
+        self.div.append_child(first)
+        self.div.append_child(second)
+        self.div.append_child(first)
+        self.assertEqual(self.div.children[1:], [second, first])
+        self.div.remove_child(first)
+        self.assertNotIn(first, self.div.children)
+        self.assertEqual(self.document.get_elements_by_tag_name("span"), [])
+
+    def test_marks_from_other_threads_go_through_the_tk_thread(self):
+        def script():
+            for index in range(10):
+                self.p.set_attribute("title", str(index))
+            self.div.set_attribute("class", "hot")
+
+        thread = threading.Thread(target=script)
+        thread.start()
+        thread.join()
+        self.assertEqual(self.cl.root.idle, [])
+        self.assertEqual([delay for delay, _, _ in self.cl.root.later], [REMOTE_BATCH_MS])
+        self.cl.root.run()  # hands the marks over and schedules the flush
+        self.cl.root.run()
+        self.assertEqual(self.cl.block_renderer.relayouts, [{self.p: DIRTY_ATTRS, self.div: DIRTY_ATTRS}])
+
+    def test_flush_invalidates_styles_below_the_change(self):
+        self.assertEqual(self.cl.styles.computed_style(self.p), {})
+        self.div.set_attribute("class", "hot")
+        self.p.set_attribute("class", "hot")
+        self.cl.root.run()
+        self.assertEqual(self.cl.styles.computed_style(self.div), {"color": "red"})
+        self.assertEqual(self.cl.styles.computed_style(self.p), {"color": "red"})
+
+    def test_text_is_patched_into_the_widget(self):
+        self.cl.block_renderer = None
+        label = self.p._tk_widget = _Label()
+        self.p.set_text("new text")
+        self.div.set_attribute("title", "off screen")  # no widget anywhere up the tree: skipped
+        self.cl.root.run()
+        self.assertEqual(label.options["text"], "new text")
+        self.assertIs(self.p._tk_widget, label)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+# Script engine: per-origin opt-in (against the hub page), the restricted script
+# environment, and event listeners running on the script thread under the time
+# budget. The Tk loop is stood in for by a queue the test thread drains.
+#
+#     python -m pytest test
+import os
+import queue
+import tempfile
+import time
+import unittest
+
+from pyweb_api.DOM import Event
+from pyweb_client.headless import MessageLog
+from pyweb_client.html_parser import PyHTMLParser
+from pyweb_client.loader import PageLoader
+from pyweb_client.scripts import ScriptEngine, ScriptOrigins, CodeCache
+
+HUB_PAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pyweb_hub", "index.html")
+HUB_URL = "http://hub.example:8000/index.html"
+
+
+class _Root:
+    # after() from any thread queues the callback until run_until runs it on the test thread
+    def __init__(self):
+        self.calls = queue.SimpleQueue()
+
+    def after(self, delay, callback, *args):
+        self.calls.put((callback, args))
+
+    def run_until(self, done, timeout: float = 5.0):
+        deadline = time.monotonic() + timeout
+        while not done():
+            if time.monotonic() > deadline:
+                raise AssertionError("timed out")
+            try:
+                callback, args = self.calls.get(timeout=0.01)
+            except queue.Empty:
+                continue
+            callback(*args)
+
+
+class _Tab:
+    def __init__(self, url: str):
+        self.url = url
+        self.root = _Root()
+        self.loader = PageLoader(self.root)
+        self.console = MessageLog()
+        self.log = []  # what the page's scripts wrote to the console
+        self.alerts = []
+
+    def _render_log(self, level, message):
+        self.log.append((level, message))
+
+    def alert(self, message):
+        self.alerts.append(message)
+
+    def errors(self):
+        return [message for level, message in self.log if level == "error"]
+
+
+def _parse(html: str) -> PyHTMLParser:
+    parser = PyHTMLParser()
+    parser.feed(html)
+    parser.close()
+    return parser
+
+
+class ScriptEngineTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.origins = ScriptOrigins(os.path.join(directory.name, "script_origins"))
+        self.tabs = []
+
+    def tearDown(self):
+        for tab in self.tabs:
+            tab.loader.shutdown()  # lets the page's script thread go
+
+    def run_page(self, url: str, html: str, budget: float = 2.0):
+        tab = _Tab(url)
+        self.tabs.append(tab)
+        parser = _parse(html)
+        engine = ScriptEngine(tab, budget=budget, cache=CodeCache(cache_dir=None), origins=self.origins)
+        engine.run(parser.scripts, parser.document)
+        return tab, parser.document
+
+    def test_hub_scripts_run_once_their_origin_is_allowed(self):
+        with open(HUB_PAGE, encoding="utf-8") as f:
+            html = f.read()
+        tab, _ = self.run_page(HUB_URL, html)
+        self.assertEqual(tab.alerts, [])
+        self.assertIn("scripts are off for http://hub.example:8000", tab.console.messages[-1][1])
+
+        self.origins.allow(HUB_URL)
+        tab, document = self.run_page(HUB_URL, html)
+        items = document.get_element_by_id("include-list").children
+        tab.root.run_until(lambda: all("highlight" in item.class_list for item in items))
+        tab.root.run_until(lambda: tab.alerts)
+        self.assertEqual(tab.alerts, ["Welcome to PyWeb"])
+        self.assertEqual(tab.errors(), [])
+
+        # the opt-in is kept, and only covers that origin
+        origins = ScriptOrigins(self.origins.path)
+        self.assertTrue(origins.allows("http://hub.example:8000/other.html"))
+        self.assertFalse(origins.allows("http://hub.example:9000/index.html"))
+        self.assertFalse(origins.allows("file:///tmp/index.html"))
+        self.assertTrue(origins.allows("app://home"))
+
+    def test_scripts_cannot_reach_the_interpreter(self):
+        escapes = [
+            "object.__subclasses__()",
+            "().__class__.__base__.__subclasses__()",
+            "type(1)",
+            "getattr(1, 'real')",
+            "import os",
+            "import string",
+            "from json import decoder",
+            "import json\njson.codecs",
+            "import re\nre.enum",
+            "g = (x for x in [1])\ng.gi_frame",
+            "from pyweb import Document\nclass Evil:\n    def __hash__(self):\n        return 1\n"
+            "Document.root.set_attribute('x', Evil())",
+        ]
+        probe = ("from pyweb import Document, Window\ntry:\n    Document.root.missing\n"
+                 "except AttributeError as e:\n    Window.alert(e.obj is None)")
+        html = "".join(f'<script type="text/python">\n{source}\n</script>' for source in escapes + [probe])
+        self.origins.allow("file://")
+        tab, _ = self.run_page("file:///tmp/page.html", html)
+        tab.root.run_until(lambda: tab.alerts)
+        self.assertEqual(tab.alerts, ["True"])
+        errors = tab.errors()
+        self.assertEqual(len(errors), len(escapes), errors)
+        for index, error in enumerate(errors):
+            self.assertTrue(error.startswith(f"script {index}:"), error)
+
+    def test_listeners_run_on_the_script_thread_under_the_budget(self):
+        html = """<button id="b">Go</button>
+        <script type="text/python">
+            from pyweb import Document, Window
+            button = Document.get_element_by_id("b")
+
+            def spin(event):
+                while True:
+                    try:
+                        pass
+                    except Exception:
+                        pass
+
+            def clicked(event):
+                Window.alert(event.target.id)
+
+            button.add_event_listener("click", spin)
+            button.add_event_listener("click", clicked)
+        </script>"""
+        tab, document = self.run_page("app://test", html, budget=0.2)
+        button = document.get_element_by_id("b")
+        tab.root.run_until(lambda: len(button.listeners.get(("click", "bubble"), ())) == 2)
+
+        started = time.perf_counter()
+        button.dispatch_event(Event("click", button))
+        self.assertLess(time.perf_counter() - started, 0.05)  # the Tk thread only hands the event over
+
+        tab.root.run_until(lambda: tab.alerts)
+        self.assertEqual(tab.alerts, ["b"])
+        self.assertEqual(len(tab.errors()), 1)
+        self.assertTrue(tab.errors()[0].startswith("click listener: stopped after"), tab.errors())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# DOM snapshots: trees survive a dump_tree/load_tree round trip, load_page serves
+# a parsed source from the snapshot cache, and the cache key changes with the
+# encoding and the parser version.
+#
+#     python -m pytest test
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pyweb_api.DOM import Element, Text, TAG_MAP
+from pyweb_api.Window import Document
+from pyweb_client import snapshot
+from pyweb_client.html_parser import PyHTMLParser
+from pyweb_client.snapshot import SnapshotCache, dump_tree, load_tree, load_page, source_hash, source_key
+
+PAGE = """<html><head><style>p { color: red; }</style></head><body>
+<div id="main" class="a b"><p>café &amp; <span>naïve</span></p>
+<ul><li>one<li>two</ul><input disabled><img src="x.png" alt=""><custom-tag data-x="1">text</custom-tag>
+<script type="text/python">print("hi")</script></div></body></html>"""
+
+
+def _parse(data: bytes) -> Element:
+    parser = PyHTMLParser()
+    parser.feed(data)
+    parser.close()
+    return parser.root
+
+
+def _shape(node):
+    # everything a snapshot has to keep, parents checked along the way
+    if isinstance(node, str):
+        return "text", str(node)
+    for child in node.children:
+        if isinstance(child, Element):
+            assert child.parent is node
+    return node.tag, dict(node.attrs), [_shape(child) for child in node.children]
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = SnapshotCache(directory.name)
+
+    def test_round_trip(self):
+        root = _parse(PAGE.encode())
+        loaded = load_tree(dump_tree(root))
+        self.assertEqual(_shape(loaded), _shape(root))
+        div = Document(loaded).get_element_by_id("main")
+        self.assertIs(type(div), TAG_MAP["div"])
+        self.assertIsInstance(div.children[0].children[0], Text)
+
+    def test_load_page_uses_the_snapshot(self):
+        data = PAGE.encode()
+        parsed = load_page(data, self.cache, min_bytes=0)
+        self.assertTrue(os.listdir(self.cache.cache_dir))
+        with mock.patch.object(snapshot, "PyHTMLParser", side_effect=AssertionError("parsed again")):
+            page = load_page(data, self.cache, min_bytes=0)
+        self.assertEqual(_shape(page.root), _shape(parsed.root))
+        self.assertEqual(len(page.scripts), 1)
+        self.assertEqual(len(page.stylesheet), len(parsed.stylesheet))
+        self.assertEqual(len(page.stylesheet), 1)
+
+    def test_key_covers_encoding_and_parser_version(self):
+        data = PAGE.encode()
+        key = source_key(data)
+        self.assertNotEqual(source_key(data, None), key)
+        self.assertNotEqual(source_key(data, "cp1252"), key)
+        incremental = source_hash()
+        incremental.update(data[:10])
+        incremental.update(data[10:])
+        self.assertEqual(incremental.hexdigest(), key)
+
+        load_page(data, self.cache, min_bytes=0)
+        with mock.patch.object(snapshot, "PARSER_VERSION", snapshot.PARSER_VERSION + 1):
+            self.assertNotEqual(source_key(data), key)
+            self.assertIsNone(self.cache.load(source_key(data)))
+
+    def test_damaged_snapshots_are_ignored(self):
+        data = dump_tree(_parse(PAGE.encode()))
+        self.cache.write("damaged", data[:len(data) // 2])
+        self.assertIsNone(self.cache.load("damaged"))
+        self.cache.write("other", b"not a snapshot")
+        self.assertIsNone(self.cache.load("other"))
+        self.assertIsNone(self.cache.load("missing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+# Cold-start budget: the import time `-X importtime` reports for the client's entry
+# module, and the modules that must wait for first use. benchmarks/startup.py
+# prints the full breakdown.
+#
+#     python -m pytest test
+import statistics
+import unittest
+
+from benchmarks.startup import ENTRY_MODULE, IMPORT_BUDGET_MS, DEFERRED_MODULES, import_times
+
+RUNS = 3
+
+
+class StartupTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.runs = [import_times() for _ in range(RUNS)]
+
+    def test_import_time_is_within_budget(self):
+        import_ms = statistics.median(times[ENTRY_MODULE] for times in self.runs)
+        self.assertLessEqual(import_ms, IMPORT_BUDGET_MS,
+                             f"import {ENTRY_MODULE} took {import_ms:.1f}ms")
+
+    def test_deferred_modules_are_not_imported_at_startup(self):
+        eager = [name for name in DEFERRED_MODULES if name in self.runs[0]]
+        self.assertEqual(eager, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+# Style resolution: selector matching and specificity, <style> rules the selector
+# engine cannot match being dropped, and StyleResolver's per-element cache with
+# its invalidation.
+#
+#     python -m pytest test
+import unittest
+
+from pyweb_api.CSS import Selector, StyleSheet
+from pyweb_api.DOM import Element, DIRTY_ATTRS, DIRTY_TEXT
+from pyweb_client.html_parser import PyHTMLParser
+from pyweb_client.style import StyleResolver
+
+PAGE = """<div id="main" class="box wide"><p class="note">a <span>b</span></p>
+<section><p>c</p></section></div><p>d</p>"""
+
+
+def _parse(html: str) -> PyHTMLParser:
+    parser = PyHTMLParser()
+    parser.feed(html)
+    parser.close()
+    return parser
+
+
+class SelectorTest(unittest.TestCase):
+    def setUp(self):
+        self.document = _parse(PAGE).document
+        self.main = self.document.get_element_by_id("main")
+        self.note, self.section = [c for c in self.main.children if isinstance(c, Element)]
+        self.span = self.note.children[1]
+        self.nested = self.section.children[0]
+
+    def matching(self, selector: str):
+        return [el for el in (self.main, self.note, self.span, self.section, self.nested)
+                if Selector(selector).matches(el)]
+
+    def test_matching(self):
+        self.assertEqual(self.matching("p"), [self.note, self.nested])
+        self.assertEqual(self.matching("div p"), [self.note, self.nested])
+        self.assertEqual(self.matching("div > p"), [self.note])
+        self.assertEqual(self.matching("div>p"), [self.note])
+        self.assertEqual(self.matching("#main .note span"), [self.span])
+        self.assertEqual(self.matching("div.box.wide > *"), [self.note, self.section])
+        self.assertEqual(self.matching("div.box.narrow p"), [])
+        self.assertEqual(self.matching("section > p span"), [])
+
+    def test_query_selector_all(self):
+        self.assertEqual(self.document.query_selector_all("p, div > p"),
+                         [self.note, self.nested, self.document.get_elements_by_tag_name("p")[-1]])
+        self.assertEqual(self.document.query_selector(".note span"), self.span)
+        self.assertIsNone(self.document.query_selector("#missing"))
+
+    def test_unsupported_selectors(self):
+        for text in ("a:hover", "input[type=text]", "p + p", "p ~ p", "> p", "p >"):
+            with self.assertRaises(ValueError, msg=text):
+                Selector(text)
+        # one unsupported selector drops its whole rule, the rest of the sheet still applies
+        sheet = StyleSheet("a:hover, p { color: red } /* p { color: blue } */ p { font-size: 10px }")
+        self.assertEqual(len(sheet), 1)
+        self.assertEqual(sheet.match(self.note), {"font-size": "10px"})
+
+    def test_specificity_then_order(self):
+        sheet = StyleSheet("""
+            #main p { color: red }
+            .note { color: green; font-weight: bold }
+            div > p { color: blue }
+            p { color: gray; font-style: italic }
+        """)
+        self.assertEqual(sheet.match(self.note), {"color": "red", "font-weight": "bold", "font-style": "italic"})
+        self.assertEqual(sheet.match(self.nested)["color"], "red")
+        self.assertEqual(StyleSheet("p { color: red } p { color: blue }").match(self.note), {"color": "blue"})
+
+
+class StyleResolverTest(unittest.TestCase):
+    def test_precedence(self):
+        parser = _parse('<style>p { color: red; width: 10px }</style>'
+                        '<p id="x" width="5" height="7" style="width: 20px">x</p>')
+        styles = StyleResolver(parser.stylesheet)
+        p = parser.document.get_element_by_id("x")
+        # presentational attributes < <style> rules < inline style
+        self.assertEqual(styles.computed_style(p), {"width": "20px", "height": "7", "color": "red"})
+
+    def test_cache_and_invalidation(self):
+        parser = _parse('<style>.hot { color: red }</style><div><p id="x">x</p></div>')
+        styles = StyleResolver(parser.stylesheet)
+        p = parser.document.get_element_by_id("x")
+        div = p.parent
+        self.assertEqual(styles.computed_style(p), {})
+
+        p.set_attribute("class", "hot")
+        self.assertEqual(styles.computed_style(p), {})  # kept until the Reconciler reports the change
+        styles.invalidate(p, DIRTY_TEXT)
+        self.assertEqual(styles.computed_style(p), {})
+        styles.invalidate(div, DIRTY_ATTRS)  # reaches everything below the changed element
+        self.assertEqual(styles.computed_style(p), {"color": "red"})
+
+        parser.stylesheet.add("#x { font-size: 20px }")
+        self.assertEqual(styles.computed_style(p), {"color": "red", "font-size": "20px"})
+
+    def test_results_are_copies(self):
+        styles = StyleResolver(StyleSheet("p { color: red; margin: 4px }"))
+        p = Element("p")
+        widget_opts, pack_opts = styles.widget_options(p)
+        widget_opts["fg"] = "blue"
+        pack_opts["padx"] = 0
+        styles.tk_style(p)["widget"]["fg"] = "blue"
+        styles.computed_style(p)["color"] = "blue"
+        self.assertEqual(styles.widget_options(p)[0]["fg"], "red")
+        self.assertEqual(styles.widget_options(p)[1], {"padx": 4, "pady": 4})
+        self.assertEqual(styles.computed_style(p), {"color": "red", "margin": "4px"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+# Block positions of the virtualized renderer: Heights must agree with plain
+# prefix sums under appends and height changes.
+#
+#     python -m pytest test
+import random
+import unittest
+
+from pyweb_client.virtual import Heights
+
+
+class HeightsTest(unittest.TestCase):
+    def check(self, heights: Heights, plain: list):
+        tops = [sum(plain[:i]) for i in range(len(plain) + 1)]
+        self.assertEqual(heights.total, tops[-1])
+        for index in range(len(plain)):
+            self.assertEqual(heights.top(index), tops[index])
+        for y in range(-5, tops[-1] + 5):
+            # the first block whose bottom is below y, like a bisect over the tops
+            expected = next((i for i in range(len(plain)) if tops[i + 1] > y), len(plain))
+            self.assertEqual(heights.index_at(y), expected, y)
+
+    def test_matches_prefix_sums(self):
+        rng = random.Random(6)
+        plain = [rng.choice([0, 1, 7, 30]) for _ in range(37)]
+        heights = Heights(plain)
+        self.check(heights, plain)
+        for _ in range(20):
+            height = rng.randrange(40)
+            plain.append(height)
+            heights.append(height)
+            index = rng.randrange(len(plain))
+            plain[index] = rng.randrange(40)
+            heights.set(index, plain[index])
+            self.check(heights, plain)
+
+    def test_empty(self):
+        heights = Heights()
+        self.assertEqual(heights.total, 0)
+        self.assertEqual(heights.index_at(100), 0)
+        heights.append(10)
+        self.assertEqual(heights.index_at(5), 0)
+        self.assertEqual(heights.index_at(10), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()